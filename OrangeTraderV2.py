@@ -1,8 +1,15 @@
-import csv
 from dataclasses import dataclass
-from typing import List, Dict, Tuple, Any
+from typing import Dict, Tuple, Any
+
+import numpy as np
 from tqdm import tqdm
 
+import instrumentation
+import reporting
+from market_data import MarketData, load_market_data, refresh_market_data
+from reporting import logger
+from trade_outcomes import find_outcome, outcome_table
+
 #### UI improvements
 from colorama import init, Fore, Back, Style
 init()  # Initialize colorama
@@ -120,36 +127,17 @@ class TradeSettings:
 
 class ForexDataHandler:
     def __init__(self, file_name: str):
+        self.file_name = file_name
         self.data = self.load_data(file_name)
         
     @staticmethod
-    def load_data(file_name: str) -> List[Dict]:
-        with open(file_name, mode='r') as file:
-            reader = csv.DictReader(file)
-            expected_columns = {"timestamp", "close", "ATR"}
-            if not expected_columns.issubset(reader.fieldnames):
-                raise ValueError(f"Missing required columns: {expected_columns - set(reader.fieldnames)}")
-            return [
-                {
-                    "Time": row["timestamp"],
-                    "Price": float(row["close"]),
-                    "ATR": float(row["ATR"]),
-                    "Vol": float(row["volume"]),
-                    "LWPI": float(row["LWPI Value"]),
-                    "ALMA": float(row["ALMA Value"]),
-                    "VIX": float(row["VIXFIX"]),
-                    "Filt_Stoch": float(row["Filtered Stochastic"]),
-                    "Sig": float(row["Signal"]),
-                    "ATR_EMA": float(row["ATR_EMA"]),
-                    "PriceDiff": float(row["Price_Difference"]),
-                    "Grad": float(row["Gradient"]),
-                    "ALMA_Grad": float(row["ALMA_Gradient"]),
-                    "ATR_EMA_Grad": float(row["ATR_EMA_Gradient"]),
-                    "EMA13": float(row["EMA_13"]),
-                    "EMA_Grad": float(row["EMA_Gradient"])
-                }
-                for row in reader
-            ]
+    def load_data(file_name: str) -> MarketData:
+        return load_market_data(file_name)
+
+    def refresh(self) -> MarketData:
+        """Pick up bars appended to the CSV since it was loaded, extending the derived indexes."""
+        self.data = refresh_market_data(self.data, self.file_name)
+        return self.data
 
 class TradeCalculator:
     @staticmethod
@@ -165,15 +153,8 @@ class TradeCalculator:
         return buy_tp, buy_sl, sell_tp, sell_sl
 
     @staticmethod
-    def check_outcome(data: List[Dict], start_index: int, trade_action: str, tp: float, sl: float) -> Tuple[str, int]:
-        entry_price = data[start_index]["Price"]
-        for i in range(start_index + 1, len(data)):
-            current_price = data[i]["Price"]
-            if (trade_action == "BUY" and current_price >= tp) or (trade_action == "SELL" and current_price <= tp):
-                return "TP", i
-            if (trade_action == "BUY" and current_price <= sl) or (trade_action == "SELL" and current_price >= sl):
-                return "SL", i
-        return "No TP or SL", len(data) - 1
+    def check_outcome(data: MarketData, start_index: int, trade_action: str, tp: float, sl: float) -> Tuple[str, int]:
+        return find_outcome(data, start_index, trade_action, tp, sl)
 
 class GameState:
     def __init__(self):
@@ -206,6 +187,28 @@ class GameState:
             return True, f"You did not raise at least ${TradeSettings.required_raise} after {TradeSettings.batch_size * self.batch} rows!"
         return False, ""
 
+    def settle_trade(self, result: str, win_amount: float, rrr_multiplier: float, high_risk_setup: bool) -> Tuple[float, float]:
+        """Apply a resolved trade to balance, streak and score; returns (trade_result, reward)."""
+        # Calculate trade result as percentage of balance
+        trade_result = 0
+        if result == "TP":
+            trade_result = (win_amount / self.balance) * 100
+            self.update_balance(win_amount)
+            self.consecutive_wins += 1
+        elif result == "SL":
+            trade_result = (-1 / self.balance) * 100
+            self.update_balance(-1)
+            self.consecutive_wins = 0
+
+        # Calculate reward using new reward structure
+        reward = self.calculate_trade_reward(
+            trade_result=trade_result,
+            risk_to_reward=rrr_multiplier/2,
+            high_risk_setup=high_risk_setup
+        )
+        self.score += reward
+        return trade_result, reward
+
     def calculate_trade_reward(self, trade_result, risk_to_reward, high_risk_setup=False):
         reward = self.reward_calculator.calculate_reward(
             trade_result=trade_result,
@@ -228,6 +231,11 @@ class ForexGame:
         self.data = data_handler.data
         self.state = GameState()
         self.calculator = TradeCalculator()
+        self.outcomes = outcome_table(
+            self.data,
+            [multiplier for multiplier, _ in TradeSettings.rrr_multipliers.values()],
+            TradeSettings.default_sl_multiplier,
+        )
         self.ui = UIFormatter()  # Keep the UI formatter
 
     def display_state(self, current_data: Dict):
@@ -300,26 +308,36 @@ class ForexGame:
         print("• Watch your drawdown!")
         print("=" * 50)
         
-        with tqdm(total=len(self.data), desc="Trading Progress", ncols=80) as pbar:
+        rec = instrumentation.active()
+        show = reporting.enabled(reporting.NORMAL)
+        with tqdm(total=len(self.data), desc="Trading Progress", ncols=80, disable=not show) as pbar:
             i = 0
             while i < len(self.data) - 1:
-                current_data = self.data[i]
-                
-                if current_data["ATR"] == 0:
-                    print(f"\nWarning: ATR is 0 at time {current_data['Time']}. Skipping this row.")
+                if rec:
+                    rec.tick()
+                if self.data.atr[i] == 0:
+                    logger.debug("\nWarning: ATR is 0 at time %s. Skipping this row.", self.data.times[i])
                     i += 1
                     pbar.update(1)
                     continue
 
-                self.display_state(current_data)
+                current_data = self.data[i]
+                if show:
+                    self.display_state(current_data)
+                if rec:
+                    rec.lap("display")
                 action, rrr_choice = self.get_trade_input()
+                if rec:
+                    rec.lap("input")  # Time spent waiting on the player
 
                 if action in ["B", "S"]:
                     next_index = self.process_trade(action, rrr_choice, current_data, i)
                     i = next_index
                     pbar.update(next_index - i + 1)
                 else:
-                    print("You passed this round. No change in balance.")
+                    logger.info("You passed this round. No change in balance.")
+                    if rec:
+                        rec.lap("display")
                     i += 1
                     pbar.update(1)
 
@@ -331,38 +349,34 @@ class ForexGame:
         self.end_game()
 
     def process_trade(self, action: str, rrr_choice: str, current_data: Dict, current_index: int):
+        rec = instrumentation.active()
         rrr_multiplier, win_amount = TradeSettings.rrr_multipliers[rrr_choice]
         buy_tp, buy_sl, sell_tp, sell_sl = self.calculator.calculate_trade_levels(
-            current_data["Price"], current_data["ATR"], rrr_multiplier
+            float(self.data.price[current_index]), float(self.data.atr[current_index]), rrr_multiplier
         )
 
         trade_action = "BUY" if action == "B" else "SELL"
         tp = buy_tp if trade_action == "BUY" else sell_tp
         sl = buy_sl if trade_action == "BUY" else sell_sl
 
-        print(f"Trade action: {action} | TP: {tp} | SL: {sl}")
-        result, next_index = self.calculator.check_outcome(self.data, current_index, trade_action, tp, sl)
-
-        # Calculate trade result as percentage of balance
-        trade_result = 0
-        if result == "TP":
-            trade_result = (win_amount / self.state.balance) * 100
-            self.state.update_balance(win_amount)
-            self.state.consecutive_wins += 1
-        elif result == "SL":
-            trade_result = (-1 / self.state.balance) * 100
-            self.state.update_balance(-1)
-            self.state.consecutive_wins = 0
-
-        # Calculate reward using new reward structure
-        reward = self.state.calculate_trade_reward(
-            trade_result=trade_result,
-            risk_to_reward=rrr_multiplier/2,
-            high_risk_setup=current_data["VIX"] > 20
+        if rec:
+            rec.lap("trade_levels")
+        logger.info("Trade action: %s | TP: %s | SL: %s", action, tp, sl)
+        if rec:
+            rec.lap("display")
+        result, next_index = self.outcomes.lookup(current_index, trade_action, rrr_multiplier)
+        if rec:
+            rec.lap("check_outcome")
+            rec.trade(result, next_index - current_index)
+        _, reward = self.state.settle_trade(
+            result, win_amount, rrr_multiplier, bool(self.data.columns["VIX"][current_index] > 20)
         )
-        
-        self.state.score += reward
-        self.display_trade_result(result, trade_action, win_amount if result == "TP" else -1, reward)
+        if rec:
+            rec.lap("reward")
+        if reporting.enabled(reporting.NORMAL):
+            self.display_trade_result(result, trade_action, win_amount if result == "TP" else -1, reward)
+        if rec:
+            rec.lap("display")
         
         return next_index
 
@@ -501,6 +515,76 @@ class TradingRewardCalculator:
 
         return reward
 
+    # Periodic windows checked by _check_periodic_performance: (rows, attribute holding the window's start balance)
+    PERIODIC_WINDOWS = ((120, "weekly_start_balance"), (480, "monthly_start_balance"), (5760, "yearly_start_balance"))
+
+    def calculate_rewards(self, trade_results, balances, risk_to_rewards, streaks, high_risk_setups, drawdowns,
+                          include_periodic=False) -> np.ndarray:
+        """Vectorized calculate_reward + update_state over a whole sequence of trades.
+
+        Equivalent to calling calculate_reward(...) and then update_state(balance, ...)
+        for each trade in order, which is how GameState drives the calculator, and
+        leaves the calculator in the same state afterwards. Note that the scalar
+        _check_periodic_performance adjusts a local copy of the reward, so its
+        weekly/monthly/yearly bonuses never reach the returned value; pass
+        include_periodic=True to add them for shaping experiments.
+        """
+        trade_results = np.asarray(trade_results, dtype=np.float64)
+        balances = np.asarray(balances, dtype=np.float64)
+        risk_to_rewards = np.asarray(risk_to_rewards, dtype=np.float64)
+        streaks = np.asarray(streaks)
+        high_risk_setups = np.asarray(high_risk_setups, dtype=bool)
+        drawdowns = np.asarray(drawdowns, dtype=np.float64)
+        n = len(balances)
+
+        # Immediate outcome, risk-to-reward, streak and high-risk terms
+        reward = np.where(trade_results >= 0.02 * balances, 1, np.where(trade_results <= -0.02 * balances, -1, 0))
+        reward += np.where(risk_to_rewards > 2, 2, np.where(risk_to_rewards < 1, -2, 0))
+        reward += np.where(streaks == 2, 3, np.where(streaks >= 3, 5, np.where(streaks <= -3, -3, 0)))
+        reward += np.where(high_risk_setups, np.where(risk_to_rewards > 2, 3, -2), 0)
+
+        periodic = self._periodic_rewards(balances, drawdowns)
+        if include_periodic:
+            reward += periodic
+
+        # Risk management compares against the balance from two update_state calls back
+        previous = np.concatenate(([self.previous_balance, self.balance], balances))[:n]
+        reward += np.where(drawdowns > 0.10, -10, 0)
+        reward += np.where((drawdowns >= 0.20) & (balances > previous * 1.10), 20, np.where(drawdowns < 0.20, 3, 0))
+        reward += np.where(balances < previous - 10, -5, 0)
+
+        if n:
+            self.row_counter += n
+            self.previous_balance = balances[-2].item() if n > 1 else self.balance
+            self.balance = balances[-1].item()
+            self.risk_to_reward = risk_to_rewards[-1].item()
+            self.streaks = streaks[-1].item()
+            self.drawdown = drawdowns[-1].item()
+        return reward
+
+    def _periodic_rewards(self, balances, drawdowns) -> np.ndarray:
+        """Weekly/monthly/yearly bonuses for a batch; rolls the window start balances forward."""
+        n = len(balances)
+        reward = np.zeros(n, dtype=np.int64)
+        rows = self.row_counter + 1 + np.arange(n)
+        for period, attribute in self.PERIODIC_WINDOWS:
+            checkpoints = np.flatnonzero(rows % period == 0)
+            if checkpoints.size == 0:
+                continue
+            # Each window is measured from the balance at the previous checkpoint
+            window_start = np.concatenate(([getattr(self, attribute)], balances[checkpoints[:-1]]))
+            change = balances[checkpoints] - window_start
+            if period == 120:
+                bonus = np.where(change > 0, 5, np.where(change < 0, -3, 0))
+                bonus += np.where(drawdowns[checkpoints] > 0.10, -5, np.where(drawdowns[checkpoints] < 0.05, 3, 0))
+            elif period == 480:
+                bonus = np.where(change > 5, 10, np.where(change < -5, -5, np.where(change < 0, 2, 0)))
+            else:
+                bonus = np.where(change > 20, 30, np.where(change < -10, -10, 0))
+            reward[checkpoints] += bonus
+            setattr(self, attribute, balances[checkpoints[-1]].item())
+        return reward
+
     def update_state(self, new_balance, risk_to_reward, streaks, drawdown):
         self.previous_balance = self.balance
         self.balance = new_balance
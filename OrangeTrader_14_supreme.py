@@ -1,33 +1,9 @@
-import csv
+from market_data import load_market_data
+from trade_outcomes import find_outcome
 
-# Load data from CSV
+# Load data from CSV into the shared columnar store
 def load_data(file_name):
-    with open(file_name, mode='r') as file:
-        reader = csv.DictReader(file)
-        expected_columns = {"timestamp", "close", "ATR"}
-        if not expected_columns.issubset(reader.fieldnames):
-            raise ValueError(f"Missing required columns: {expected_columns - set(reader.fieldnames)}")
-        return [
-            {
-                "Time": row["timestamp"],
-                "Price": float(row["close"]),
-                "ATR": float(row["ATR"]),
-                "Vol": float(row["volume"]),
-                "LWPI": float(row["LWPI Value"]),
-                "ALMA": float(row["ALMA Value"]),
-                "VIX": float(row["VIXFIX"]),
-                "Filt_Stoch": float(row["Filtered Stochastic"]),
-                "Sig": float(row["Signal"]),
-                "ATR_EMA": float(row["ATR_EMA"]),
-                "PriceDiff": float(row["Price_Difference"]),
-                "Grad": float(row["Gradient"]),
-                "ALMA_Grad": float(row["ALMA_Gradient"]),
-                "ATR_EMA_Grad": float(row["ATR_EMA_Gradient"]),
-                "EMA13": float(row["EMA_13"]),
-                "EMA_Grad": float(row["EMA_Gradient"])
-            }
-            for row in reader
-        ]
+    return load_market_data(file_name)
 
 # Round a number to 4 decimal places
 def round_to_4_decimals(value):
@@ -35,15 +11,7 @@ def round_to_4_decimals(value):
 
 # Check if TP or SL is reached first and skip to that row
 def check_outcome(data, start_index, trade_action, tp, sl):
-    entry_price = data[start_index]["Price"]
-
-    for i in range(start_index + 1, len(data)):
-        current_price = data[i]["Price"]
-        if (trade_action == "BUY" and current_price >= tp) or (trade_action == "SELL" and current_price <= tp):
-            return "TP", i  # Return the result and the row index where it resolves
-        if (trade_action == "BUY" and current_price <= sl) or (trade_action == "SELL" and current_price >= sl):
-            return "SL", i  # Return the result and the row index where it resolves
-    return "No TP or SL", len(data) - 1  # If unresolved, jump to the last row
+    return find_outcome(data, start_index, trade_action, tp, sl)  # Result and the row index where it resolves
 
 # Game logic with RRR input for TP adjustment and win/loss amount modification
 def forex_game(data):
@@ -63,9 +31,9 @@ def forex_game(data):
     while i < len(data) - 1:
         # Current row data
         current_data = data[i]
-        current_price = current_data["Price"]
-        atr = current_data["ATR"]
-        time = current_data["Time"]
+        current_price = float(data.price[i])
+        atr = float(data.atr[i])
+        time = data.times[i]
 
         if atr == 0:
             print(f"\nWarning: ATR is 0 at time {time}. Skipping this row.")
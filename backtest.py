@@ -0,0 +1,106 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from OrangeTraderV2 import GameState, TradeSettings
+from trade_outcomes import outcome_table
+
+# A policy sees the bar index and the MarketData and returns (action, rrr_choice),
+# with action in "B"/"S"/"P" (or "BUY"/"SELL"/"PASS") and rrr_choice a TradeSettings.rrr_multipliers key
+Policy = Callable[[int, object], Tuple[str, str]]
+
+END_OF_DATA = "End of data"
+
+# Policy actions that open a trade, mapped to the trade direction; anything else passes
+ACTION_CODES = {"B": "BUY", "S": "SELL", "BUY": "BUY", "SELL": "SELL"}
+
+
+@dataclass
+class TradeRecord:
+    entry_index: int
+    exit_index: int
+    action: str
+    rrr_choice: str
+    result: str
+    trade_result: float
+    reward: float
+    balance: float
+
+
+@dataclass
+class BacktestResult:
+    final_balance: float
+    score: float
+    max_drawdown: float
+    termination_reason: str
+    last_index: int
+    trades: List[TradeRecord] = field(default_factory=list)
+
+    @property
+    def balance_path(self) -> np.ndarray:
+        """Balance before the first trade and after every trade."""
+        return np.array([TradeSettings.starting_balance] + [trade.balance for trade in self.trades], dtype=np.float64)
+
+    @property
+    def n_trades(self) -> int:
+        return len(self.trades)
+
+
+class BacktestEngine:
+    """Plays the ForexGame rules without any I/O, driven by a policy callable.
+
+    Uses the same GameState (balance, streak, drawdown, game-over checks and
+    TradingRewardCalculator) as the interactive game, and resolves trades
+    through the precomputed outcome table, so one engine can replay thousands
+    of policies over the same data.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.outcomes = outcome_table(
+            data,
+            [multiplier for multiplier, _ in TradeSettings.rrr_multipliers.values()],
+            TradeSettings.default_sl_multiplier,
+        )
+        self._atr = np.asarray(data.atr)
+        self._high_risk = np.asarray(data.columns["VIX"]) > 20
+
+    def run(self, policy: Policy, start_index: int = 0) -> BacktestResult:
+        state = GameState()
+        trades: List[TradeRecord] = []
+        n = len(self.data)
+        reason = END_OF_DATA
+        i = start_index
+        while i < n - 1:
+            if self._atr[i] == 0:
+                i += 1
+                continue
+
+            action, rrr_choice = policy(i, self.data)
+            trade_action = ACTION_CODES.get(action)
+            if trade_action is not None:
+                rrr_multiplier, win_amount = TradeSettings.rrr_multipliers[rrr_choice]
+                result, next_index = self.outcomes.lookup(i, trade_action, rrr_multiplier)
+                trade_result, reward = state.settle_trade(result, win_amount, rrr_multiplier, bool(self._high_risk[i]))
+                trades.append(TradeRecord(i, next_index, trade_action, rrr_choice, result, trade_result, reward, state.balance))
+                i = next_index
+            else:
+                i += 1
+
+            # GameState counts rows from the start of the game, which here is start_index
+            game_over, message = state.check_game_over(i - start_index)
+            if game_over:
+                reason = message
+                break
+
+        max_drawdown = 0.0
+        if trades:
+            path = np.array([TradeSettings.starting_balance] + [trade.balance for trade in trades], dtype=np.float64)
+            peaks = np.maximum.accumulate(path)
+            max_drawdown = float(np.max((peaks - path) / np.where(peaks > 0, peaks, 1)))
+        return BacktestResult(state.balance, state.score, max_drawdown, reason, i, trades)
+
+    def sweep(self, policies: Dict[str, Policy], start_index: int = 0) -> Dict[str, BacktestResult]:
+        """Run every named policy over the same data."""
+        return {name: self.run(policy, start_index) for name, policy in policies.items()}
@@ -0,0 +1,241 @@
+"""Benchmarks for the simulator and training hot paths.
+
+    python benchmark.py --sizes 10000 100000 1000000 --output benchmark_results.json
+    python benchmark.py --compare old_results.json
+
+Data is synthetic (GBM closes with indicator columns derived from them) so runs
+are comparable between machines and versions without the real CSVs.
+"""
+import argparse
+import contextlib
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from market_data import COLUMN_MAP, FIELDS, TIME_COLUMN, MarketData, load_market_data, parse_market_csv
+from qlearning_shandis_6 import BinnedQLearningAgent, QLearningAgent, forex_game
+from state_encoding import StateEncoder
+from trade_outcomes import FirstPassageIndex, OutcomeTable, find_outcome, scan_outcome
+from vectorized_training import train_vectorized
+
+ACTIONS = ["BUY", "SELL", "PASS"]
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+
+def _ema(values: np.ndarray, span: int) -> np.ndarray:
+    alpha = 2.0 / (span + 1)
+    out = np.empty_like(values)
+    acc = values[0] if len(values) else 0.0
+    for i, value in enumerate(values.tolist()):
+        acc = alpha * value + (1 - alpha) * acc
+        out[i] = acc
+    return out
+
+
+def synthetic_market_data(n_bars: int, seed: int = 0, start_price: float = 0.75, volatility: float = 0.0015) -> MarketData:
+    """GBM close series on an hourly grid with indicator columns that behave like the real ones."""
+    rng = np.random.default_rng(seed)
+    close = start_price * np.exp(np.cumsum(rng.normal(-0.5 * volatility ** 2, volatility, n_bars)))
+    close = np.round(close, 5)
+    move = np.abs(np.diff(close, prepend=close[:1]))
+    atr = np.round(_ema(move, 14) * 1.6, 6)
+    atr[rng.random(n_bars) < 0.002] = 0.0  # The real exports have occasional zero-ATR rows
+    ema13 = _ema(close, 13)
+    alma = _ema(close, 9)
+    atr_ema = _ema(atr, 14)
+    stoch = np.clip(_ema(rng.uniform(0, 100, n_bars), 5), 0, 100)
+    columns = {
+        "Price": close,
+        "ATR": atr,
+        "Vol": rng.gamma(2.0, 500.0, n_bars),
+        "LWPI": np.clip(50 + 10 * rng.standard_normal(n_bars), 0, 100),
+        "ALMA": alma,
+        "VIX": np.abs(rng.normal(10, 6, n_bars)),
+        "Filt_Stoch": stoch,
+        "Sig": _ema(stoch, 3),
+        "ATR_EMA": atr_ema,
+        "PriceDiff": np.diff(close, prepend=close[:1]),
+        "Grad": np.gradient(close) if n_bars > 1 else np.zeros(n_bars),
+        "ALMA_Grad": np.gradient(alma) if n_bars > 1 else np.zeros(n_bars),
+        "ATR_EMA_Grad": np.gradient(atr_ema) if n_bars > 1 else np.zeros(n_bars),
+        "EMA13": ema13,
+        "EMA_Grad": np.gradient(ema13) if n_bars > 1 else np.zeros(n_bars),
+    }
+    start = np.datetime64("2003-08-03T21:00:00")
+    times = (start + np.arange(n_bars) * np.timedelta64(1, "h")).astype(str)
+    times = np.char.replace(times, "T", " ")
+    return MarketData(times, columns)
+
+
+def write_synthetic_csv(file_name: str, data: MarketData) -> None:
+    """Write MarketData in the same column layout as the indicator exports."""
+    header = [TIME_COLUMN] + [COLUMN_MAP[name] for name in FIELDS]
+    with open(file_name, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        columns = [data.columns[name].tolist() for name in FIELDS]
+        writer.writerows(zip(data.times.tolist(), *columns))
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (ru_maxrss is KiB on Linux, bytes on macOS).
+
+    The high-water mark is inherited through fork and exec, so run_benchmarks
+    measures each size in a process forked from a small fork server.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+
+def _best_time(fn: Callable[[], object], repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - begin)
+    return best
+
+
+def _rate(count: int, seconds: float) -> float:
+    return count / seconds if seconds > 0 else float("inf")
+
+
+def bench_size(n_bars: int, seed: int = 0, episodes: int = 5, vector_episodes: int = 256) -> Dict:
+    """Time every hot path on one synthetic dataset of n_bars bars."""
+    result: Dict = {"bars": n_bars}
+    data = synthetic_market_data(n_bars, seed)
+    rng = np.random.default_rng(seed)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        file_name = os.path.join(workdir, "synthetic.csv")
+        write_synthetic_csv(file_name, data)
+        seconds = _best_time(lambda: parse_market_csv(file_name), repeat=1)
+        result["load_csv_bars_per_sec"] = _rate(n_bars, seconds)
+        begin = time.perf_counter()
+        load_market_data(file_name)
+        result["load_cold_cache_sec"] = time.perf_counter() - begin
+        seconds = _best_time(lambda: load_market_data(file_name))
+        result["load_warm_cache_sec"] = seconds
+        data = load_market_data(file_name)
+
+    prices, atr = data.price, data.atr
+    seconds = _best_time(lambda: FirstPassageIndex(prices), repeat=1)
+    result["first_passage_build_bars_per_sec"] = _rate(n_bars, seconds)
+    seconds = _best_time(lambda: OutcomeTable.build(prices, atr), repeat=1)
+    result["outcome_table_build_bars_per_sec"] = _rate(n_bars, seconds)
+
+    starts = rng.integers(0, max(1, n_bars - 1), 2000).tolist()
+    levels = [(float(prices[s]) + 2 * float(atr[s]), float(prices[s]) - 2 * float(atr[s])) for s in starts]
+    find_outcome(data, 0, "BUY", *levels[0])  # Build the index outside the timing
+    seconds = _best_time(lambda: [find_outcome(data, s, "BUY", tp, sl) for s, (tp, sl) in zip(starts, levels)])
+    result["check_outcome_indexed_per_sec"] = _rate(len(starts), seconds)
+    seconds = _best_time(lambda: [scan_outcome(prices, s, "BUY", tp, sl) for s, (tp, sl) in zip(starts[:200], levels[:200])], repeat=1)
+    result["check_outcome_scan_per_sec"] = _rate(200, seconds)
+
+    rows = rng.integers(0, n_bars, 20000).tolist()
+    tuple_agent = QLearningAgent(ACTIONS)
+    seconds = _best_time(lambda: [tuple_agent.get_state(data, i, 100) for i in rows])
+    result["get_state_tuple_per_sec"] = _rate(len(rows), seconds)
+    encoder = StateEncoder().fit(data)
+    binned_agent = BinnedQLearningAgent(ACTIONS, encoder)
+    binned_agent.get_state(data, 0, 100)
+    seconds = _best_time(lambda: [binned_agent.get_state(data, i, 100) for i in rows])
+    result["get_state_binned_per_sec"] = _rate(len(rows), seconds)
+
+    tuple_states = [tuple_agent.get_state(data, i, 100) for i in rows[:5000]]
+    seconds = _best_time(lambda: [tuple_agent.update_q_value(s, "BUY", 1, s) for s in tuple_states])
+    result["update_q_value_tuple_per_sec"] = _rate(len(tuple_states), seconds)
+    binned_states = [binned_agent.get_state(data, i, 100) for i in rows[:5000]]
+    seconds = _best_time(lambda: [binned_agent.update_q_value(s, "BUY", 1, s) for s in binned_states])
+    result["update_q_value_binned_per_sec"] = _rate(len(binned_states), seconds)
+
+    for name, agent in (("tuple", QLearningAgent(ACTIONS)), ("binned", BinnedQLearningAgent(ACTIONS, encoder))):
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            begin = time.perf_counter()
+            for episode in range(episodes):
+                forex_game(data, episode, agent)
+            seconds = time.perf_counter() - begin
+        result[f"forex_game_{name}_episodes_per_sec"] = _rate(episodes, seconds)
+
+    agent = BinnedQLearningAgent(ACTIONS, encoder)
+    seconds = _best_time(lambda: train_vectorized(data, agent, vector_episodes, n_envs=64, seed=seed), repeat=1)
+    result["vectorized_episodes_per_sec"] = _rate(vector_episodes, seconds)
+
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def _size_context():
+    """Start method for the per-size processes; forkserver children start from a small process."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, seed: int = 0, episodes: int = 5, vector_episodes: int = 256) -> Dict:
+    """bench_size for every size, each in a fresh process so peak_rss_mb belongs to that size alone."""
+    with _size_context().Pool(1, maxtasksperchild=1) as pool:
+        results = pool.starmap(bench_size, [(n, seed, episodes, vector_episodes) for n in sizes], chunksize=1)
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare_results(old: Dict, new: Dict, tolerance: float = 0.10) -> List[str]:
+    """One line per metric present in both runs; rates are better when higher, seconds/MB when lower.
+
+    Changes within ``tolerance`` are treated as noise and not flagged.
+    """
+    lines = []
+    old_by_size = {row["bars"]: row for row in old["results"]}
+    for row in new["results"]:
+        previous = old_by_size.get(row["bars"])
+        if previous is None:
+            continue
+        for key, value in row.items():
+            if key == "bars" or key not in previous or not previous[key]:
+                continue
+            ratio = value / previous[key]
+            higher_is_better = key.endswith("_per_sec")
+            regressed = ratio < 1 - tolerance if higher_is_better else ratio > 1 + tolerance
+            lines.append(f"{row['bars']:>9} {key:<40} {previous[key]:>14.2f} -> {value:>14.2f}  x{ratio:.2f} {'REGRESSION' if regressed else ''}")
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--episodes", type=int, default=5, help="sequential forex_game episodes per agent")
+    parser.add_argument("--vector-episodes", type=int, default=256)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.seed, args.episodes, args.vector_episodes)
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    for row in results["results"]:
+        print(json.dumps(row))
+    if args.compare:
+        with open(args.compare) as file:
+            for line in compare_results(json.load(file), results):
+                print(line)
+
+
+if __name__ == "__main__":
+    main()
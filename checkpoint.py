@@ -0,0 +1,197 @@
+import json
+import os
+import queue
+import random
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+
+from vectorized_training import VectorizedForexGame
+
+CHECKPOINT_VERSION = 1
+
+_REPLAY_ARRAYS = ("states", "actions", "rewards", "next_states", "dones")
+
+
+def snapshot(agent, episode: int, balances: Optional[np.ndarray] = None, rng: Optional[np.random.Generator] = None) -> Dict[str, np.ndarray]:
+    """Copy everything needed to resume training into plain arrays.
+
+    Runs on the training thread; it is just a few memcpys, so the slow part
+    (compressing and writing) can happen elsewhere while training continues.
+    """
+    meta = {
+        "version": CHECKPOINT_VERSION,
+        "episode": episode,
+        "exploration_rate": agent.exploration_rate,
+        "exploration_steps": agent.exploration_steps,
+        "exploration_stream": agent.exploration.get_state() if agent.exploration is not None else None,
+        "python_random_state": random.getstate(),
+        "rng_state": rng.bit_generator.state if rng is not None else None,
+        "encoder_fields": list(agent.encoder.fields),
+    }
+    arrays = {
+        "q_values": agent.q_table.values.copy(),
+        "balances": np.asarray(balances if balances is not None else np.zeros(0), dtype=np.int64).copy(),
+    }
+    if agent.q_table.visits is not None:
+        arrays["visits"] = agent.q_table.visits.copy()
+    for name, edges in (agent.encoder.edges or {}).items():
+        arrays[f"edges_{name}"] = edges.copy()
+    replay = getattr(agent, "replay", None)
+    if replay is not None:
+        for name in _REPLAY_ARRAYS:
+            arrays[f"replay_{name}"] = getattr(replay, name).copy()
+        meta["replay"] = {"cursor": replay.cursor, "count": replay.count, "rng_state": replay.rng.bit_generator.state}
+        if replay.prioritized:
+            arrays["replay_tree"] = replay._tree.copy()
+            meta["replay"]["max_priority"] = replay._max_priority
+    arrays["meta"] = np.array(json.dumps(meta))
+    return arrays
+
+
+def write_checkpoint(path: str, arrays: Dict[str, np.ndarray], compress: bool = True) -> None:
+    """Write a snapshot as one .npz; the old checkpoint stays intact until the new one is complete."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as file:
+            (np.savez_compressed if compress else np.savez)(file, **arrays)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def save_checkpoint(path: str, agent, episode: int, balances: Optional[np.ndarray] = None,
+                    rng: Optional[np.random.Generator] = None, compress: bool = True) -> None:
+    write_checkpoint(path, snapshot(agent, episode, balances, rng), compress)
+
+
+def load_checkpoint(path: str) -> Dict:
+    """Read a checkpoint into a dict of arrays plus its parsed ``meta``."""
+    with np.load(path) as archive:
+        checkpoint = {name: archive[name] for name in archive.files}
+    checkpoint["meta"] = json.loads(str(checkpoint["meta"]))
+    if checkpoint["meta"].get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version in {path}")
+    return checkpoint
+
+
+def restore(agent, checkpoint: Dict, rng: Optional[np.random.Generator] = None) -> int:
+    """Load a checkpoint into ``agent`` (and ``rng``); returns the number of episodes already trained."""
+    meta = checkpoint["meta"]
+    if checkpoint["q_values"].shape != agent.q_table.values.shape:
+        raise ValueError(f"Checkpoint Q table has shape {checkpoint['q_values'].shape}, "
+                         f"agent expects {agent.q_table.values.shape}")
+    agent.q_table.values[:] = checkpoint["q_values"]
+    if agent.q_table.visits is not None and "visits" in checkpoint:
+        agent.q_table.visits[:] = checkpoint["visits"]
+    agent.exploration_rate = meta["exploration_rate"]
+    agent.exploration_steps = meta.get("exploration_steps", 0)
+    if agent.exploration is not None and meta.get("exploration_stream") is not None:
+        agent.exploration.set_state(meta["exploration_stream"])
+    agent.encoder.edges = {name: checkpoint[f"edges_{name}"] for name in meta["encoder_fields"] if f"edges_{name}" in checkpoint}
+
+    version, internal, gauss_next = meta["python_random_state"]
+    random.setstate((version, tuple(internal), gauss_next))
+    if rng is not None and meta["rng_state"] is not None:
+        rng.bit_generator.state = meta["rng_state"]
+
+    replay = getattr(agent, "replay", None)
+    if replay is not None and "replay" in meta:
+        for name in _REPLAY_ARRAYS:
+            getattr(replay, name)[:] = checkpoint[f"replay_{name}"]
+        replay.cursor = meta["replay"]["cursor"]
+        replay.count = meta["replay"]["count"]
+        replay.rng.bit_generator.state = meta["replay"]["rng_state"]
+        if replay.prioritized and "replay_tree" in checkpoint:
+            replay._tree[:] = checkpoint["replay_tree"]
+            replay._max_priority = meta["replay"]["max_priority"]
+    return meta["episode"]
+
+
+class CheckpointWriter:
+    """Writes checkpoints on a background thread.
+
+    ``submit`` hands over a snapshot and returns immediately; if the previous
+    checkpoint is still being written it waits for that one first, so at most
+    one snapshot is held in memory. Errors from the writer are raised on the
+    next ``submit`` or on ``close``.
+    """
+
+    def __init__(self, compress: bool = True):
+        self.compress = compress
+        self._queue: queue.Queue = queue.Queue(maxsize=1)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                path, arrays = item
+                write_checkpoint(path, arrays, self.compress)
+            except BaseException as error:  # Surfaced to the training thread
+                self._error = error
+            finally:
+                self._queue.task_done()
+
+    def _raise_pending(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def submit(self, path: str, arrays: Dict[str, np.ndarray]) -> None:
+        self._raise_pending()
+        self._queue.put((path, arrays))
+
+    def flush(self) -> None:
+        """Block until every submitted checkpoint is on disk."""
+        self._queue.join()
+        self._raise_pending()
+
+    def close(self) -> None:
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+
+    def __enter__(self) -> "CheckpointWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def train_resumable(data, agent, n_episodes: int, path: str, checkpoint_every: int = 1000, n_envs: int = 64,
+                    seed: Optional[int] = None, resume: bool = False, compress: bool = True, progress=None,
+                    sampler=None) -> np.ndarray:
+    """train_vectorized in rounds of checkpoint_every episodes, checkpointing after each round.
+
+    With ``resume`` the run continues from the checkpoint at ``path``; it ends up
+    with exactly the Q-values and balances an uninterrupted run with the same
+    seed and checkpoint_every would have. Returns the final balances of all
+    episodes, including the ones trained before resuming. ``progress`` (a
+    reporting.ProgressReporter) is updated once per round. ``sampler`` (an
+    episodes.EpisodeSampler) sets where episodes start and how long they run.
+    """
+    game = VectorizedForexGame(data, agent, n_envs, seed, sampler)
+    episode = 0
+    balances = [np.zeros(0, dtype=np.int64)]
+    if resume and os.path.exists(path):
+        checkpoint = load_checkpoint(path)
+        episode = restore(agent, checkpoint, game.rng)
+        balances = [checkpoint["balances"]]
+        if progress is not None:
+            progress.update(episode)
+    with CheckpointWriter(compress) as writer:
+        while episode < n_episodes:
+            this_round = min(checkpoint_every, n_episodes - episode)
+            balances.append(game.run(this_round))
+            episode += this_round
+            if progress is not None:
+                progress.update(this_round, avg_balance=f"{balances[-1].mean():.1f}", epsilon=f"{agent.exploration_rate:.3g}")
+            writer.submit(path, snapshot(agent, episode, np.concatenate(balances), game.rng))
+    return np.concatenate(balances)
@@ -0,0 +1,55 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+from market_data import Timestamp
+
+SAMPLING_MODES = ("start", "uniform", "stratified")
+
+
+class EpisodeSampler:
+    """Chooses where training episodes start and how many bars they may run.
+
+    ``mode="start"`` begins every episode at the first bar of the range (the
+    forex_game default), ``"uniform"`` draws start bars uniformly and
+    ``"stratified"`` splits the range into ``n_strata`` equal strata and puts
+    episode k in stratum k % n_strata, so every period is revisited at the
+    same rate. With a ``horizon`` an episode also ends after that many bars;
+    starts are drawn so that the whole horizon fits in the range.
+
+    The range can be limited by date with ``start``/``end`` (start <= time < end).
+    Draws come from the caller's Generator, so a seeded trainer stays
+    reproducible and checkpoints stay exact.
+    """
+
+    def __init__(self, data, mode: str = "uniform", horizon: Optional[int] = None, start: Optional[Timestamp] = None,
+                 end: Optional[Timestamp] = None, n_strata: int = 16):
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode: {mode}")
+        if horizon is not None and horizon < 1:
+            raise ValueError("horizon must be at least 1 bar")
+        self.mode = mode
+        self.horizon = horizon
+        self.n_strata = max(1, n_strata)
+        self.first, self.stop = data.bar_range(start, end)
+        # Episodes end on reaching the last bar of the range, so the last start with a full horizon is stop - 1 - horizon
+        self.last_start = self.stop - 1 - (horizon or 0)
+        if self.last_start < self.first:
+            raise ValueError(f"Range of {self.stop - self.first} bars is too short for a {horizon}-bar horizon")
+
+    def sample(self, episode_ids: np.ndarray, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        """(start rows, end rows) for the given episode numbers; an episode ends when it reaches its end row."""
+        episode_ids = np.asarray(episode_ids, dtype=np.int64)
+        n_starts = self.last_start - self.first + 1
+        if self.mode == "start":
+            starts = np.full(len(episode_ids), self.first, dtype=np.int64)
+        elif self.mode == "uniform":
+            starts = self.first + rng.integers(0, n_starts, len(episode_ids))
+        else:
+            strata = (episode_ids % self.n_strata) + rng.random(len(episode_ids))
+            starts = self.first + np.minimum((strata * n_starts / self.n_strata).astype(np.int64), n_starts - 1)
+        if self.horizon is None:
+            ends = np.full(len(episode_ids), self.stop - 1, dtype=np.int64)
+        else:
+            ends = starts + self.horizon
+        return starts, ends
@@ -0,0 +1,97 @@
+"""Seeded exploration draws and a closed-form epsilon schedule for the Q-learning agents.
+
+    agent = BinnedQLearningAgent(actions, encoder, seed=7, schedule=EpsilonSchedule(1.0, 0.995, 0.01))
+
+An agent with a seed draws its explore/exploit decisions from its own NumPy
+Generator instead of the global ``random`` module, in blocks, so a run is
+reproducible from the seed and independent of anything else using ``random``.
+Workers get independent streams from one seed through ``spawn_streams``.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+Seed = Union[None, int, np.random.SeedSequence, np.random.Generator]
+
+
+@dataclass(frozen=True)
+class EpsilonSchedule:
+    """epsilon(step) = max(minimum, initial * decay**step), for any step without stepping through the ones before."""
+    initial: float = 1.0
+    decay: float = 0.995
+    minimum: float = 0.0
+
+    def at(self, step):
+        """Epsilon after ``step`` decays; ``step`` may be an int or an array."""
+        return np.maximum(self.minimum, self.initial * np.power(self.decay, step)) if np.ndim(step) else \
+            max(self.minimum, self.initial * self.decay ** step)
+
+
+class ExplorationStream:
+    """Explore/exploit decisions drawn ``block`` at a time from a private Generator.
+
+    Each decision uses one uniform and one action index whether or not it
+    explores, so the sequence only depends on the seed and the number of
+    decisions made, not on the epsilon values along the way.
+    """
+
+    def __init__(self, n_actions: int, seed: Seed = None, block: int = 4096):
+        self.n_actions = n_actions
+        self.block = block
+        self.rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+        self._refill()
+
+    def _refill(self) -> None:
+        self._block_state = self.rng.bit_generator.state
+        # Python lists: indexing one element is several times cheaper than on an ndarray
+        self._uniforms = self.rng.random(self.block).tolist()
+        self._actions = self.rng.integers(0, self.n_actions, self.block).tolist()
+        self._position = 0
+
+    def draw(self, epsilon: float) -> int:
+        """A random action index with probability epsilon, otherwise -1 (exploit)."""
+        if self._position == self.block:
+            self._refill()
+        i = self._position
+        self._position = i + 1
+        return self._actions[i] if self._uniforms[i] < epsilon else -1
+
+    def draw_many(self, epsilon: float, n: int) -> np.ndarray:
+        """``n`` consecutive draws at once, the same values ``n`` calls to draw would return."""
+        out = np.empty(n, dtype=np.int64)
+        done = 0
+        while done < n:
+            if self._position == self.block:
+                self._refill()
+            take = min(n - done, self.block - self._position)
+            window = slice(self._position, self._position + take)
+            uniforms = np.array(self._uniforms[window])
+            actions = np.array(self._actions[window], dtype=np.int64)
+            out[done:done + take] = np.where(uniforms < epsilon, actions, -1)
+            self._position += take
+            done += take
+        return out
+
+    def get_state(self) -> Dict:
+        """JSON-serializable position of the stream, for checkpoints."""
+        return {"block_state": self._block_state, "position": self._position}
+
+    def set_state(self, state: Dict) -> None:
+        self.rng.bit_generator.state = state["block_state"]
+        self._refill()
+        self._position = state["position"]
+
+
+def spawn_streams(n_actions: int, seed: Seed, n: int, block: int = 4096) -> List[ExplorationStream]:
+    """``n`` statistically independent streams from one seed, e.g. one per worker process."""
+    if isinstance(seed, np.random.Generator):
+        children = seed.bit_generator.seed_seq.spawn(n)
+    else:
+        children = (seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)).spawn(n)
+    return [ExplorationStream(n_actions, np.random.default_rng(child), block) for child in children]
+
+
+def stream_for(n_actions: int, seed: Seed) -> Optional[ExplorationStream]:
+    """The agent's stream for a ``seed`` argument; None keeps the global ``random`` module."""
+    return None if seed is None else ExplorationStream(n_actions, seed)
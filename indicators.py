@@ -0,0 +1,239 @@
+import csv
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from market_data import TIME_COLUMN, MarketData
+
+OHLCV_COLUMNS = ("open", "high", "low", "close", "volume")
+
+
+@dataclass(frozen=True)
+class IndicatorSettings:
+    """Lengths of the indicators in the exported CSVs."""
+    atr_length: int = 14
+    atr_ema_length: int = 14
+    ema_length: int = 13
+    alma_length: int = 9
+    alma_offset: float = 0.85
+    alma_sigma: float = 6.0
+    vix_length: int = 22
+    lwpi_length: int = 8
+    stoch_length: int = 14
+    stoch_smooth: int = 3
+    signal_length: int = 3
+
+    @property
+    def lookback(self) -> int:
+        """Bars of history an incremental update needs to reproduce a full recompute."""
+        windows = (self.alma_length, self.vix_length, self.lwpi_length, self.stoch_length, self.stoch_smooth, self.signal_length)
+        return max(max(windows) - 1, 2)
+
+
+def recursive_filter(values: np.ndarray, alpha: float, initial: Optional[float] = None, block: int = 64) -> np.ndarray:
+    """y[t] = alpha * x[t] + (1 - alpha) * y[t-1], i.e. an EMA (alpha = 2/(n+1)) or Wilder RMA (alpha = 1/n).
+
+    ``initial`` is y[-1]; without it the filter starts at x[0]. The recursion is
+    evaluated a block at a time: inside a block it is a small lower-triangular
+    matrix product, and only the carry between blocks is sequential.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n == 0:
+        return values.copy()
+    y_prev = float(values[0] if initial is None else initial)
+    decay = 1.0 - alpha
+    b = min(block, n)
+    lag = np.subtract.outer(np.arange(b), np.arange(b))
+    kernel = np.where(lag >= 0, alpha * decay ** np.maximum(lag, 0), 0.0)
+    carry = decay ** np.arange(1, b + 1)
+    n_blocks = -(-n // b)
+    padded = np.zeros(n_blocks * b)
+    padded[:n] = values
+    out = padded.reshape(n_blocks, b) @ kernel.T
+    for row in out:
+        row += carry * y_prev
+        y_prev = row[-1]
+    return out.ravel()[:n]
+
+
+def windowed_mean(values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Weighted moving average, weights[-1] on the newest bar.
+
+    The first bars, which have less than a full window behind them, are averaged
+    over what is available instead of being NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    w = len(weights)
+    padded = np.concatenate([np.zeros(w - 1), values])
+    present = np.concatenate([np.zeros(w - 1), np.ones(len(values))])
+    return (sliding_window_view(padded, w) @ weights) / (sliding_window_view(present, w) @ weights)
+
+
+def rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return values.copy()
+    padded = np.concatenate([np.full(window - 1, values[0]), values])
+    return sliding_window_view(padded, window).max(axis=1)
+
+
+def rolling_min(values: np.ndarray, window: int) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return values.copy()
+    padded = np.concatenate([np.full(window - 1, values[0]), values])
+    return sliding_window_view(padded, window).min(axis=1)
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray, default: float) -> np.ndarray:
+    """numerator / denominator, with ``default`` wherever the denominator is not positive."""
+    out = np.full(np.shape(numerator), default, dtype=np.float64)
+    return np.divide(numerator, denominator, out=out, where=denominator > 0)
+
+
+def alma_weights(length: int, offset: float, sigma: float) -> np.ndarray:
+    """Arnaud Legoux moving average weights, oldest bar first."""
+    m = offset * (length - 1)
+    s = length / sigma
+    return np.exp(-((np.arange(length) - m) ** 2) / (2 * s * s))
+
+
+class IndicatorPipeline:
+    """Computes the indicator columns from raw OHLCV bars.
+
+    ``update`` takes only the new bars and returns their MarketData rows; the
+    last ``settings.lookback`` values of every input and intermediate series,
+    plus the recursive filter states, are kept so appending bars gives the same
+    numbers as recomputing the whole history, up to float rounding: the
+    blockwise filters behind ATR and the EMAs (and their gradients) can differ
+    in the last bit depending on where the chunks split.
+
+    Gradients are two-bar slopes, (x[t] - x[t-2]) / 2, so a closed bar's value
+    never changes when more bars arrive.
+    """
+
+    def __init__(self, settings: Optional[IndicatorSettings] = None):
+        self.settings = settings or IndicatorSettings()
+        self._alma_weights = alma_weights(self.settings.alma_length, self.settings.alma_offset, self.settings.alma_sigma)
+        self.reset()
+
+    def reset(self) -> None:
+        self._tails: Dict[str, np.ndarray] = {}
+        self.n_bars = 0
+
+    def _extend(self, name: str, values: np.ndarray) -> np.ndarray:
+        """Return the kept history of ``name`` followed by ``values``, and keep the new tail."""
+        extended = np.concatenate([self._tails.get(name, np.zeros(0)), values])
+        self._tails[name] = extended[-self.settings.lookback:].copy()
+        return extended
+
+    def _last(self, name: str) -> Optional[float]:
+        tail = self._tails.get(name)
+        return float(tail[-1]) if tail is not None and len(tail) else None
+
+    def _smooth(self, name: str, values: np.ndarray, length: int) -> np.ndarray:
+        extended = self._extend(name, values)
+        return windowed_mean(extended, np.ones(length))[len(extended) - len(values):]
+
+    def _slope(self, name: str, values: np.ndarray) -> np.ndarray:
+        extended = self._extend(name, values)
+        back2 = np.concatenate([extended[:1], extended[:1], extended[:-2]])[:len(extended)]
+        back1 = np.concatenate([extended[:1], extended[:-1]])
+        slope = np.where(np.arange(len(extended)) >= 2, (extended - back2) / 2, extended - back1)
+        return slope[len(extended) - len(values):]
+
+    def update(self, times, open_, high, low, close, volume) -> MarketData:
+        """Indicator rows for bars appended after everything seen so far."""
+        s = self.settings
+        open_, high, low, close, volume = (np.asarray(v, dtype=np.float64) for v in (open_, high, low, close, volume))
+        n = len(close)
+        prev_atr, prev_lwpi_atr = self._last("ATR"), self._last("LWPI_ATR")
+        prev_ema, prev_atr_ema = self._last("EMA13"), self._last("ATR_EMA")
+
+        high_x = self._extend("high", high)
+        low_x = self._extend("low", low)
+        close_x = self._extend("close", close)
+        new = slice(len(close_x) - n, None)
+
+        prev_close = np.concatenate([close_x[:1], close_x[:-1]])
+        true_range = np.maximum(high_x - low_x, np.maximum(np.abs(high_x - prev_close), np.abs(low_x - prev_close)))[new]
+        atr = recursive_filter(true_range, 1.0 / s.atr_length, prev_atr)
+        lwpi_atr = recursive_filter(true_range, 1.0 / s.lwpi_length, prev_lwpi_atr)
+        ema13 = recursive_filter(close, 2.0 / (s.ema_length + 1), prev_ema)
+        atr_ema = recursive_filter(atr, 2.0 / (s.atr_ema_length + 1), prev_atr_ema)
+        self._extend("ATR", atr)
+        self._extend("LWPI_ATR", lwpi_atr)
+
+        alma = windowed_mean(close_x, self._alma_weights)[new]
+
+        # Williams VIX Fix: distance of the low below the recent highest close
+        highest_close = rolling_max(close_x, s.vix_length)[new]
+        vix = _ratio(highest_close - low, highest_close, 0.0) * 100
+
+        # Larry Williams proxy index: average open-close move relative to ATR, centred on 50
+        open_close = self._smooth("open_close", open_ - close, s.lwpi_length)
+        lwpi = 50 * _ratio(open_close, lwpi_atr, 0.0) + 50
+
+        highest = rolling_max(high_x, s.stoch_length)[new]
+        lowest = rolling_min(low_x, s.stoch_length)[new]
+        spread = highest - lowest
+        stoch_k = 100 * _ratio(close - lowest, spread, 0.5)
+        filt_stoch = self._smooth("stoch_k", stoch_k, s.stoch_smooth)
+        signal = self._smooth("filt_stoch", filt_stoch, s.signal_length)
+
+        price_diff = close - prev_close[new]
+        columns = {
+            "Price": close,
+            "ATR": atr,
+            "Vol": volume,
+            "LWPI": lwpi,
+            "ALMA": alma,
+            "VIX": vix,
+            "Filt_Stoch": filt_stoch,
+            "Sig": signal,
+            "ATR_EMA": atr_ema,
+            "PriceDiff": price_diff,
+            "Grad": self._slope("close_slope", close),
+            "ALMA_Grad": self._slope("ALMA", alma),
+            "ATR_EMA_Grad": self._slope("ATR_EMA", atr_ema),
+            "EMA13": ema13,
+            "EMA_Grad": self._slope("EMA13", ema13),
+        }
+        self.n_bars += n
+        return MarketData(np.asarray(times, dtype=str), columns)
+
+    def compute(self, times, open_, high, low, close, volume) -> MarketData:
+        """Indicator rows for a whole history, starting from a clean state."""
+        self.reset()
+        return self.update(times, open_, high, low, close, volume)
+
+
+def read_ohlcv_csv(file_name: str):
+    """Read a raw OHLCV CSV (timestamp, open, high, low, close, volume) into (times, {column: array})."""
+    with open(file_name, mode='r', newline='') as file:
+        reader = csv.reader(file)
+        header = [name.strip().lower() for name in next(reader, None) or []]
+        time_name = TIME_COLUMN if TIME_COLUMN in header else "time"
+        missing = {time_name, *OHLCV_COLUMNS} - set(header)
+        if missing:
+            raise ValueError(f"Missing required columns: {missing}")
+        time_pos = header.index(time_name)
+        positions = [header.index(name) for name in OHLCV_COLUMNS]
+        times = []
+        values = [[] for _ in OHLCV_COLUMNS]
+        for row in reader:
+            if not row:
+                continue
+            times.append(row[time_pos])
+            for column, pos in zip(values, positions):
+                column.append(float(row[pos]))
+    return np.array(times, dtype=str), {name: np.array(column, dtype=np.float64) for name, column in zip(OHLCV_COLUMNS, values)}
+
+
+def load_ohlcv_market_data(file_name: str, settings: Optional[IndicatorSettings] = None) -> MarketData:
+    """Build the MarketData store straight from raw OHLCV bars, with no external preprocessing step."""
+    times, bars = read_ohlcv_csv(file_name)
+    return IndicatorPipeline(settings).compute(times, *(bars[name] for name in OHLCV_COLUMNS))
@@ -0,0 +1,162 @@
+"""Opt-in per-phase timing and counters for the game and training loops.
+
+    recorder = instrumentation.enable("metrics.jsonl", interval=10.0)
+    ... run forex_game / ForexGame / train_vectorized ...
+    instrumentation.disable()
+
+Loops fetch ``active()`` once and guard every hook with ``if rec:``, so with
+instrumentation disabled the cost is one local None check per hook. Setting
+ORANGE_TRADER_METRICS=<path> enables it at import time, e.g. for the
+interactive game.
+"""
+import atexit
+import json
+import os
+import time
+from collections import defaultdict
+from time import perf_counter_ns
+from typing import Callable, Dict, List, Optional
+
+RESULT_COUNTERS = {"TP": "tp", "SL": "sl"}
+
+
+class Recorder:
+    """Aggregates perf_counter_ns laps per phase plus bar/trade counters.
+
+    ``tick`` starts a bar; ``lap(phase)`` charges the time since the previous
+    tick or lap to ``phase``. With ``sample_every=N`` only every Nth tick is
+    timed (counters are always exact). A summary line is appended to ``path``
+    every ``interval`` seconds and on ``flush``.
+    """
+
+    # Bars between clock checks for the periodic summary
+    _FLUSH_CHECK_BARS = 4096
+
+    def __init__(self, path: Optional[str] = None, interval: float = 10.0, sample_every: int = 1):
+        self.path = path
+        self.interval = interval
+        self.sample_every = max(1, sample_every)
+        self.summaries: List[Dict] = []
+        self.gauges: Dict[str, Callable[[], float]] = {}
+        self.timing = False
+        self._mark = 0
+        self._ticks = 0
+        self._started = time.monotonic()
+        self._reset_window()
+
+    def _reset_window(self) -> None:
+        self.phase_ns: Dict[str, int] = defaultdict(int)
+        self.phase_calls: Dict[str, int] = defaultdict(int)
+        self.counters: Dict[str, int] = defaultdict(int)
+        self._window_start = time.monotonic()
+        self._next_check = self._FLUSH_CHECK_BARS
+
+    def tick(self, bars: int = 1) -> None:
+        """Count ``bars`` processed bars and start timing this step if it is sampled."""
+        if self.counters["bars"] >= self._next_check:
+            self._next_check = self.counters["bars"] + self._FLUSH_CHECK_BARS
+            if time.monotonic() - self._window_start >= self.interval:
+                self.flush()
+        self.counters["bars"] += bars
+        self._ticks += 1
+        self.timing = self._ticks % self.sample_every == 0
+        if self.timing:
+            self._mark = perf_counter_ns()
+
+    def lap(self, phase: str) -> None:
+        if not self.timing:
+            return
+        now = perf_counter_ns()
+        self.phase_ns[phase] += now - self._mark
+        self.phase_calls[phase] += 1
+        self._mark = now
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counters[name] += value
+
+    def trade(self, result: str, scan_length: int) -> None:
+        """One resolved trade: its outcome and how many bars it stayed open."""
+        counters = self.counters
+        counters["trades"] += 1
+        counters["scan_bars"] += scan_length
+        counters[RESULT_COUNTERS.get(result, "no_outcome")] += 1
+
+    def trades(self, tp: int, sl: int, no_outcome: int, scan_bars: int) -> None:
+        """Batch form of ``trade`` for the lockstep trainer."""
+        counters = self.counters
+        counters["trades"] += tp + sl + no_outcome
+        counters["scan_bars"] += scan_bars
+        counters["tp"] += tp
+        counters["sl"] += sl
+        counters["no_outcome"] += no_outcome
+
+    def watch(self, name: str, read: Callable[[], float]) -> None:
+        """Report ``read()`` in every summary, e.g. the Q-table size."""
+        self.gauges[name] = read
+
+    def summary(self) -> Dict:
+        """Counters and phase timings of the window since the last flush."""
+        now = time.monotonic()
+        seconds = now - self._window_start
+        counters = self.counters
+        decided = counters["tp"] + counters["sl"]
+        phases = {
+            phase: {
+                "calls": self.phase_calls[phase],
+                "total_ms": total / 1e6,
+                "avg_us": total / self.phase_calls[phase] / 1e3,
+            }
+            for phase, total in sorted(self.phase_ns.items())
+        }
+        summary = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "elapsed_sec": now - self._started,
+            "window_sec": seconds,
+            "bars": counters["bars"],
+            "bars_per_sec": counters["bars"] / seconds if seconds > 0 else 0.0,
+            "trades": counters["trades"],
+            "avg_scan_length": counters["scan_bars"] / counters["trades"] if counters["trades"] else 0.0,
+            "hit_rate": counters["tp"] / decided if decided else 0.0,
+            "counters": dict(counters),
+            "phases": phases,
+        }
+        for name, read in self.gauges.items():
+            summary[name] = read()
+        return summary
+
+    def flush(self) -> Dict:
+        """Emit the current window as a summary (a JSON line when ``path`` is set) and start a new one."""
+        summary = self.summary()
+        self.summaries.append(summary)
+        if self.path is not None:
+            with open(self.path, "a") as file:
+                file.write(json.dumps(summary) + "\n")
+        self._reset_window()
+        return summary
+
+
+_active: Optional[Recorder] = None
+
+
+def enable(path: Optional[str] = None, interval: float = 10.0, sample_every: int = 1) -> Recorder:
+    global _active
+    _active = Recorder(path, interval, sample_every)
+    return _active
+
+
+def disable() -> Optional[Recorder]:
+    """Stop recording; the last partial window is flushed and the recorder returned."""
+    global _active
+    recorder, _active = _active, None
+    if recorder is not None and recorder.counters["bars"]:
+        recorder.flush()
+    return recorder
+
+
+def active() -> Optional[Recorder]:
+    return _active
+
+
+if os.environ.get("ORANGE_TRADER_METRICS"):
+    enable(os.environ["ORANGE_TRADER_METRICS"])
+    atexit.register(disable)
@@ -0,0 +1,551 @@
+import csv
+import hashlib
+import io
+import itertools
+import json
+import os
+from collections.abc import Mapping
+from datetime import datetime
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+# Row key used by the game/agent code -> column name in the indicator CSV
+COLUMN_MAP = {
+    "Price": "close",
+    "ATR": "ATR",
+    "Vol": "volume",
+    "LWPI": "LWPI Value",
+    "ALMA": "ALMA Value",
+    "VIX": "VIXFIX",
+    "Filt_Stoch": "Filtered Stochastic",
+    "Sig": "Signal",
+    "ATR_EMA": "ATR_EMA",
+    "PriceDiff": "Price_Difference",
+    "Grad": "Gradient",
+    "ALMA_Grad": "ALMA_Gradient",
+    "ATR_EMA_Grad": "ATR_EMA_Gradient",
+    "EMA13": "EMA_13",
+    "EMA_Grad": "EMA_Gradient",
+}
+FIELDS = tuple(COLUMN_MAP)
+TIME_COLUMN = "timestamp"
+
+# Bump when the on-disk cache layout changes so stale sidecars are rebuilt
+CACHE_VERSION = 1
+
+# Earlier versions of a grown CSV remembered in the cache meta, so derived caches can be extended instead of rebuilt
+MAX_PREFIXES = 32
+
+
+class MarketRow(Mapping):
+    """Read-only view of a single bar that behaves like the old per-row dict."""
+
+    __slots__ = ("_data", "_index")
+
+    def __init__(self, data: "MarketData", index: int):
+        self._data = data
+        self._index = index
+
+    def __getitem__(self, key: str):
+        if key == "Time":
+            return str(self._data.times[self._index])
+        return float(self._data.columns[key][self._index])
+
+    def __iter__(self) -> Iterator[str]:
+        yield "Time"
+        yield from FIELDS
+
+    def __len__(self) -> int:
+        return len(FIELDS) + 1
+
+    def __repr__(self) -> str:
+        return f"MarketRow({dict(self)!r})"
+
+
+Timestamp = Union[int, str, datetime, np.datetime64]
+
+
+def to_epoch(when: Timestamp) -> int:
+    """Seconds since 1970-01-01 (naive, like the CSV times); ints are taken as already converted."""
+    if isinstance(when, (int, np.integer)):
+        return int(when)
+    return int(np.datetime64(when, "s").astype(np.int64))
+
+
+def parse_epoch(times: np.ndarray) -> np.ndarray:
+    """int64 epoch seconds of an array of 'YYYY-MM-DD HH:MM:SS' strings."""
+    return np.asarray(times).astype("datetime64[s]").astype(np.int64)
+
+
+class TimeIndex:
+    """Bar timestamps parsed once into int64 epoch seconds, for binary-search date lookups.
+
+    Lives in data.indexes["time_index"]; slices of the data get a view of it
+    and refresh_market_data extends it over appended bars.
+    """
+
+    def __init__(self, epoch: np.ndarray):
+        self.epoch = epoch
+
+    @classmethod
+    def build(cls, data: "MarketData") -> "TimeIndex":
+        epoch = parse_epoch(data.times)
+        if len(epoch) > 1 and np.any(np.diff(epoch) < 0):
+            raise ValueError("Bar timestamps are not in ascending order")
+        return cls(epoch)
+
+    def extend(self, data: "MarketData") -> "TimeIndex":
+        return TimeIndex(np.concatenate([self.epoch, parse_epoch(data.times[len(self.epoch):])]))
+
+    def at_or_after(self, when: Timestamp) -> int:
+        """Index of the first bar at or after ``when`` (len(data) if there is none)."""
+        return int(np.searchsorted(self.epoch, to_epoch(when), side="left"))
+
+    def after(self, when: Timestamp) -> int:
+        """Index of the first bar strictly after ``when``."""
+        return int(np.searchsorted(self.epoch, to_epoch(when), side="right"))
+
+
+class MarketData:
+    """Columnar store of H1 bars: one contiguous float64 array per field plus a timestamp array.
+
+    Indexing with an int returns a MarketRow (so ``data[i]["Price"]`` keeps working),
+    indexing with a slice returns a zero-copy MarketData over the same arrays.
+    """
+
+    def __init__(self, times: np.ndarray, columns: Dict[str, np.ndarray]):
+        self.times = np.asarray(times)
+        self.cache_dir: Optional[str] = None  # Set when the arrays are memory-mapped from a sidecar cache
+        self.cache_key: Optional[str] = None  # Content hash of the source CSV, for keying derived caches
+        self.cache_prefixes: Dict[str, int] = {}  # Hashes of earlier, shorter versions of the CSV -> their row counts
+        self.indexes: Dict[str, Any] = {}  # Derived structures built over these arrays, e.g. the first-passage index
+        self.columns = {name: np.asarray(columns[name], dtype=np.float64) for name in FIELDS}
+        for name, values in self.columns.items():
+            if values.shape != self.times.shape:
+                raise ValueError(f"Column {name} has {len(values)} rows, expected {len(self.times)}")
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[MarketRow, "MarketData"]:
+        if isinstance(index, slice):
+            if index.step not in (None, 1):
+                raise ValueError("MarketData slices must be contiguous")
+            part = MarketData(self.times[index], {name: values[index] for name, values in self.columns.items()})
+            if "time_index" in self.indexes:
+                part.indexes["time_index"] = TimeIndex(self.indexes["time_index"].epoch[index])
+            return part
+        n = len(self.times)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("bar index out of range")
+        return MarketRow(self, index)
+
+    def __iter__(self) -> Iterator[MarketRow]:
+        for i in range(len(self.times)):
+            yield MarketRow(self, i)
+
+    @property
+    def price(self) -> np.ndarray:
+        return self.columns["Price"]
+
+    @property
+    def atr(self) -> np.ndarray:
+        return self.columns["ATR"]
+
+    def feature_values(self, index: int) -> List[float]:
+        """Return the indicator values of one bar as Python floats, in FIELDS order."""
+        return [float(self.columns[name][index]) for name in FIELDS]
+
+    @property
+    def time_index(self) -> TimeIndex:
+        index = self.indexes.get("time_index")
+        if index is None:
+            index = self.indexes["time_index"] = TimeIndex.build(self)
+        return index
+
+    @property
+    def epoch(self) -> np.ndarray:
+        """Bar timestamps as int64 seconds since the epoch."""
+        return self.time_index.epoch
+
+    def bar_at(self, when: Timestamp) -> int:
+        """Index of the first bar at or after ``when`` (len(self) if the data ends before it)."""
+        return self.time_index.at_or_after(when)
+
+    def bar_range(self, start: Optional[Timestamp] = None, end: Optional[Timestamp] = None) -> Tuple[int, int]:
+        """(first, stop) bar indexes of the bars with start <= time < end; either bound may be open."""
+        first = 0 if start is None else self.bar_at(start)
+        stop = len(self) if end is None else self.bar_at(end)
+        return first, max(first, stop)
+
+    def between(self, start: Optional[Timestamp] = None, end: Optional[Timestamp] = None) -> "MarketData":
+        """Zero-copy slice of the bars with start <= time < end."""
+        first, stop = self.bar_range(start, end)
+        return self[first:stop]
+
+
+def load_market_data(file_name: str, use_cache: bool = True) -> MarketData:
+    """Load an indicator CSV, going through the binary sidecar cache when possible.
+
+    If the CSV has only grown since the cache was written, just the new rows are
+    parsed and appended to the cached arrays.
+    """
+    if not use_cache:
+        return parse_market_csv(file_name)
+    data = load_cached_market_data(file_name)
+    if data is None:
+        try:
+            if append_market_cache(file_name):
+                data = load_cached_market_data(file_name)
+        except OSError:
+            pass
+    if data is None:
+        data = parse_market_csv(file_name)
+        try:
+            write_market_cache(file_name, data)
+        except OSError:
+            return data  # Read-only location, keep the parsed copy
+        data = load_cached_market_data(file_name) or data
+    return data
+
+
+def _column_positions(header: List[str]):
+    expected_columns = {TIME_COLUMN, *COLUMN_MAP.values()}
+    if not expected_columns.issubset(header):
+        raise ValueError(f"Missing required columns: {expected_columns - set(header)}")
+    return header.index(TIME_COLUMN), [header.index(COLUMN_MAP[name]) for name in FIELDS]
+
+
+def _rows_to_market_data(times: List[str], values: List[List[float]]) -> MarketData:
+    return MarketData(
+        np.array(times, dtype=str),
+        {name: np.array(column, dtype=np.float64) for name, column in zip(FIELDS, values)},
+    )
+
+
+def _parse_rows(reader, time_pos: int, positions: List[int]) -> MarketData:
+    times: List[str] = []
+    values: List[List[float]] = [[] for _ in FIELDS]
+    for row in reader:
+        if not row:
+            continue
+        times.append(row[time_pos])
+        for column, pos in zip(values, positions):
+            column.append(float(row[pos]))
+    return _rows_to_market_data(times, values)
+
+
+def parse_market_csv(file_name: str) -> MarketData:
+    """Parse an indicator CSV into an in-memory MarketData store."""
+    with open(file_name, mode='r', newline='') as file:
+        reader = csv.reader(file)
+        time_pos, positions = _column_positions(next(reader, None) or [])
+        return _parse_rows(reader, time_pos, positions)
+
+
+def parse_market_csv_tail(file_name: str, offset: int) -> MarketData:
+    """Parse only the rows that start at byte ``offset`` (which must be the start of a line)."""
+    with open(file_name, mode='r', newline='') as file:
+        header = next(csv.reader(file), None) or []
+    time_pos, positions = _column_positions(header)
+    with open(file_name, mode='rb') as raw:
+        raw.seek(offset)
+        with io.TextIOWrapper(raw, newline='') as file:
+            return _parse_rows(csv.reader(file), time_pos, positions)
+
+
+def iter_market_chunks(file_name: str, chunk_size: int = 100_000) -> Iterator[MarketData]:
+    """Stream an indicator CSV as consecutive MarketData chunks of at most chunk_size bars."""
+    with open(file_name, mode='r', newline='') as file:
+        reader = csv.reader(file)
+        time_pos, positions = _column_positions(next(reader, None) or [])
+        while True:
+            start_line = reader.line_num
+            chunk = _parse_rows(itertools.islice(reader, chunk_size), time_pos, positions)
+            if reader.line_num == start_line:
+                return  # Nothing left to read
+            if len(chunk):
+                yield chunk
+
+
+def concat_market_data(parts: List[MarketData]) -> MarketData:
+    """Join consecutive MarketData pieces into one store (copies the arrays)."""
+    if not parts:
+        return _rows_to_market_data([], [[] for _ in FIELDS])
+    return MarketData(
+        np.concatenate([part.times for part in parts]),
+        {name: np.concatenate([part.columns[name] for part in parts]) for name in FIELDS},
+    )
+
+
+# ---------------------------------------------------------------------------
+# Binary sidecar cache: one .npy per column next to the CSV, memory-mapped on reload
+# ---------------------------------------------------------------------------
+
+def cache_dir_for(file_name: str) -> str:
+    directory, base = os.path.split(os.path.abspath(file_name))
+    return os.path.join(directory, f".{base}.cache")
+
+
+def file_digest(file_name: str, length: Optional[int] = None) -> str:
+    """blake2b of the first ``length`` bytes of a file (the whole file by default)."""
+    digest = hashlib.blake2b(digest_size=16)
+    remaining = length
+    with open(file_name, 'rb') as file:
+        while remaining is None or remaining > 0:
+            chunk = file.read(1 << 20 if remaining is None else min(1 << 20, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def _prefix_and_full_digest(file_name: str, prefix_length: int) -> Tuple[str, str]:
+    """file_digest of the first prefix_length bytes and of the whole file, in one read."""
+    digest = hashlib.blake2b(digest_size=16)
+    remaining = prefix_length
+    with open(file_name, 'rb') as file:
+        while remaining > 0:
+            chunk = file.read(min(1 << 20, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+        prefix = digest.hexdigest()
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return prefix, digest.hexdigest()
+
+
+def _column_file(cache_dir: str, name: str) -> str:
+    return os.path.join(cache_dir, f"{name}.npy")
+
+
+def _read_meta(cache_dir: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(cache_dir, "meta.json")) as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("version") == CACHE_VERSION else None
+
+
+def _write_atomic(path: str, write) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as file:
+            write(file)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _write_meta(cache_dir: str, meta: Dict) -> None:
+    _write_atomic(os.path.join(cache_dir, "meta.json"), lambda file: file.write(json.dumps(meta).encode()))
+
+
+def cache_is_fresh(file_name: str, meta: Optional[Dict]) -> bool:
+    """True when the sidecar described by ``meta`` still matches the CSV on disk.
+
+    Size and mtime are checked first; the content hash is only computed when the
+    size matches but the mtime moved (e.g. the file was touched or copied).
+    """
+    if meta is None:
+        return False
+    stat = os.stat(file_name)
+    if stat.st_size != meta["size"]:
+        return False
+    if stat.st_mtime_ns == meta["mtime_ns"]:
+        return True
+    if file_digest(file_name) != meta["hash"]:
+        return False
+    meta["mtime_ns"] = stat.st_mtime_ns
+    try:
+        _write_meta(cache_dir_for(file_name), meta)
+    except OSError:
+        pass
+    return True
+
+
+def load_cached_market_data(file_name: str) -> Optional[MarketData]:
+    """Memory-map the sidecar arrays for ``file_name``, or return None if missing/stale."""
+    cache_dir = cache_dir_for(file_name)
+    meta = _read_meta(cache_dir)
+    if not cache_is_fresh(file_name, meta):
+        return None
+    try:
+        times = np.load(os.path.join(cache_dir, "times.npy"), mmap_mode='r')
+        columns = {name: np.load(_column_file(cache_dir, name), mmap_mode='r') for name in FIELDS}
+        data = MarketData(times, columns)
+    except (OSError, ValueError):
+        return None
+    if len(data) != meta["rows"]:
+        return None
+    data.cache_dir = cache_dir
+    data.cache_key = meta["hash"]
+    data.cache_prefixes = dict(meta.get("prefixes", {}))
+    return data
+
+
+def write_market_cache(file_name: str, data: MarketData) -> None:
+    """Write ``data`` as the sidecar cache of ``file_name``; meta.json goes last so readers never see a partial cache."""
+    cache_dir = cache_dir_for(file_name)
+    os.makedirs(cache_dir, exist_ok=True)
+    meta_path = os.path.join(cache_dir, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)  # Invalidate before touching the column files
+    stat = os.stat(file_name)
+    meta = {
+        "version": CACHE_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "hash": file_digest(file_name),
+        "rows": len(data),
+    }
+    _write_atomic(os.path.join(cache_dir, "times.npy"), lambda file: np.save(file, data.times))
+    for name in FIELDS:
+        values = data.columns[name]
+        _write_atomic(_column_file(cache_dir, name), lambda file: np.save(file, values))
+    _write_meta(cache_dir, meta)
+
+
+def append_npy(path: str, values: np.ndarray) -> bool:
+    """Append rows to a C-ordered .npy file in place, rewriting only its header.
+
+    np.save leaves room in the header for the row count to grow, so the data
+    never has to move. Returns False (file untouched) when the dtype or the rest
+    of the shape does not match, or the new header would not fit.
+    """
+    values = np.asarray(values)
+    with open(path, 'r+b') as file:
+        version = np.lib.format.read_magic(file)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+        data_offset = file.tell()
+        if fortran_order or values.shape[1:] != shape[1:] or values.dtype.kind != dtype.kind:
+            return False
+        if values.dtype.itemsize > dtype.itemsize:
+            return False  # e.g. longer timestamp strings than the stored width
+        header = io.BytesIO()
+        header_data = {
+            "descr": np.lib.format.dtype_to_descr(dtype),
+            "fortran_order": False,
+            "shape": (shape[0] + len(values),) + tuple(shape[1:]),
+        }
+        if version == (1, 0):
+            np.lib.format.write_array_header_1_0(header, header_data)
+        else:
+            np.lib.format.write_array_header_2_0(header, header_data)
+        if header.tell() != data_offset:
+            return False
+        file.seek(data_offset + shape[0] * dtype.itemsize * int(np.prod(shape[1:], dtype=np.int64)))
+        file.truncate()
+        file.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+        file.seek(0)
+        file.write(header.getvalue())
+    return True
+
+
+def append_market_cache(file_name: str) -> bool:
+    """Extend the sidecar cache when the CSV has only grown since it was written.
+
+    The old bytes must hash to the cached content hash and end on a line break;
+    then only the new rows are parsed and appended to the column files. Returns
+    False when the cache cannot be extended (the caller rebuilds it).
+    """
+    cache_dir = cache_dir_for(file_name)
+    meta = _read_meta(cache_dir)
+    if meta is None or os.stat(file_name).st_size <= meta["size"]:
+        return False
+    old_size = meta["size"]
+    if old_size > 0:
+        with open(file_name, 'rb') as file:
+            file.seek(old_size - 1)
+            if file.read(1) != b"\n":
+                return False  # The last cached row may have been cut off mid-write
+    prefix_hash, full_hash = _prefix_and_full_digest(file_name, old_size)
+    if prefix_hash != meta["hash"]:
+        return False
+    tail = parse_market_csv_tail(file_name, old_size)
+
+    os.remove(os.path.join(cache_dir, "meta.json"))  # Invalidate before touching the column files
+    if not append_npy(os.path.join(cache_dir, "times.npy"), tail.times):
+        return False
+    for name in FIELDS:
+        if not append_npy(_column_file(cache_dir, name), tail.columns[name]):
+            return False
+
+    prefixes = dict(meta.get("prefixes", {}))
+    prefixes[meta["hash"]] = meta["rows"]
+    stat = os.stat(file_name)
+    _write_meta(cache_dir, {
+        "version": CACHE_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "hash": full_hash,
+        "rows": meta["rows"] + len(tail),
+        "prefixes": dict(list(prefixes.items())[-MAX_PREFIXES:]),
+    })
+    return True
+
+
+def refresh_market_data(data: MarketData, file_name: str) -> MarketData:
+    """Reload a CSV that may have grown, carrying over the derived indexes of ``data``.
+
+    Entries of data.indexes that have an ``extend(new_data)`` method (the
+    first-passage index, outcome tables) are extended over the new bars only;
+    anything else is left to be rebuilt on first use.
+    """
+    new_data = load_market_data(file_name)
+    if new_data.cache_key == data.cache_key and len(new_data) == len(data):
+        new_data.indexes.update(data.indexes)
+        return new_data
+    if data.cache_key is None or new_data.cache_prefixes.get(data.cache_key) != len(data):
+        return new_data  # Not an append of the data we had
+    for key, index in data.indexes.items():
+        extend = getattr(index, "extend", None)
+        if extend is not None:
+            new_data.indexes[key] = extend(new_data)
+    return new_data
+
+
+# ---------------------------------------------------------------------------
+# Shared memory: hand one copy of the arrays to worker processes without pickling them
+# ---------------------------------------------------------------------------
+
+def share_market_data(data: MarketData):
+    """Copy ``data`` into a SharedMemory block.
+
+    Returns (shm, spec); keep ``shm`` alive in the parent and close/unlink it when
+    the workers are done. ``spec`` is a small picklable dict for attach_shared_market_data.
+    """
+    n = len(data)
+    times = np.ascontiguousarray(data.times)
+    float_bytes = len(FIELDS) * n * 8
+    shm = shared_memory.SharedMemory(create=True, size=max(1, float_bytes + times.nbytes))
+    block = np.ndarray((len(FIELDS), n), dtype=np.float64, buffer=shm.buf)
+    for row, name in enumerate(FIELDS):
+        block[row] = data.columns[name]
+    np.ndarray(times.shape, dtype=times.dtype, buffer=shm.buf, offset=float_bytes)[:] = times
+    spec = {"name": shm.name, "rows": n, "time_dtype": times.dtype.str, "cache_key": data.cache_key}
+    return shm, spec
+
+
+def attach_shared_market_data(spec: Dict):
+    """Map a block created by share_market_data; returns (shm, MarketData) with zero copies."""
+    shm = shared_memory.SharedMemory(name=spec["name"])
+    n = spec["rows"]
+    block = np.ndarray((len(FIELDS), n), dtype=np.float64, buffer=shm.buf)
+    times = np.ndarray((n,), dtype=np.dtype(spec["time_dtype"]), buffer=shm.buf, offset=len(FIELDS) * n * 8)
+    data = MarketData(times, {name: block[row] for row, name in enumerate(FIELDS)})
+    data.cache_key = spec["cache_key"]
+    return shm, data
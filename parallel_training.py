@@ -0,0 +1,193 @@
+import os
+import time
+from multiprocessing import Pool, shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from exploration import ExplorationStream, spawn_streams
+from market_data import attach_shared_market_data, share_market_data
+from q_tables import ArrayQTable
+from qlearning_shandis_6 import BinnedQLearningAgent
+from vectorized_training import train_vectorized
+
+ACTIONS = ["BUY", "SELL", "PASS"]
+
+# Per-process state set up once by the pool initializer
+_worker: Dict = {}
+
+
+def _slot_arrays(shm: shared_memory.SharedMemory, n_slots: int, q_shape):
+    """(Q-values, visits) of every worker slot in one shared block, each [slot, state, action]."""
+    shape = (n_slots, *q_shape)
+    values = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    visits = np.ndarray(shape, dtype=np.int64, buffer=shm.buf, offset=values.nbytes)
+    return values, visits
+
+
+def _init_worker(data_spec: Dict, q_name: str, slots_name: str, n_slots: int, q_shape, row_ranges) -> None:
+    shm, data = attach_shared_market_data(data_spec)
+    q_shm = shared_memory.SharedMemory(name=q_name)
+    slots_shm = shared_memory.SharedMemory(name=slots_name)
+    _worker["handles"] = (shm, q_shm, slots_shm)
+    # One slice per range for the life of the worker, so the outcome table and
+    # encoder bar slots cached on it are built once, not every round
+    _worker["data"] = {(start, stop): data if (start, stop) == (0, len(data)) else data[start:stop]
+                       for start, stop in row_ranges}
+    _worker["q_values"] = np.ndarray(q_shape, dtype=np.float64, buffer=q_shm.buf)
+    _worker["slots"] = _slot_arrays(slots_shm, n_slots, q_shape)
+
+
+def _train_shard(task: Dict) -> Dict:
+    """Run one worker's share of a round, starting from the merged Q-values.
+
+    The worker trains directly in its slot of the shared result block, so only
+    the balances and a few scalars travel back through the pool.
+    """
+    data = _worker["data"][task["rows"]]
+    agent = BinnedQLearningAgent(ACTIONS, task["encoder"], **task["agent_kwargs"])
+    slot_values, slot_visits = (slots[task["worker"]] for slots in _worker["slots"])
+    slot_values[:] = _worker["q_values"]
+    slot_visits[:] = 0
+    agent.q_table = ArrayQTable.from_arrays(slot_values, slot_visits)
+    agent.exploration = task["exploration"]
+    agent.exploration_rate = task["exploration_rate"]
+    agent.exploration_steps = task["exploration_steps"]
+    begin = time.perf_counter()
+    balances = train_vectorized(data, agent, task["episodes"], task["n_envs"])
+    return {
+        "worker": task["worker"],
+        "balances": balances,
+        "exploration_rate": agent.exploration_rate,
+        "exploration_steps": agent.exploration_steps,
+        "seconds": time.perf_counter() - begin,
+    }
+
+
+class ParallelTrainer:
+    """Trains a BinnedQLearningAgent with a pool of worker processes.
+
+    The market data, the merged Q array and every worker's copy of the table
+    live in shared memory, so neither the data nor the tables are pickled. Each
+    round every worker trains its own copy on an episode shard
+    (``shard="episodes"``) or on its own contiguous date range
+    (``shard="ranges"``); the copies are then merged by plain averaging or by
+    visit-count weighting.
+    """
+
+    def __init__(self, data, encoder, n_workers: Optional[int] = None, merge: str = "visits",
+                 shard: str = "episodes", seed: Optional[int] = None, n_envs: int = 64, agent_kwargs: Optional[Dict] = None):
+        if merge not in ("mean", "visits"):
+            raise ValueError(f"Unknown merge mode: {merge}")
+        if shard not in ("episodes", "ranges"):
+            raise ValueError(f"Unknown shard mode: {shard}")
+        self.data = data
+        self.encoder = encoder
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.merge = merge
+        self.shard = shard
+        self.n_envs = n_envs
+        self.agent_kwargs = dict(agent_kwargs or {})
+        self.agent = BinnedQLearningAgent(ACTIONS, encoder, **self.agent_kwargs)
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.rounds_done = 0
+        self.round_stats: List[Dict] = []
+
+    def worker_streams(self, round_index: int) -> List[ExplorationStream]:
+        """Exploration streams of each worker in a given round; fixed by the trainer seed."""
+        round_sequence = np.random.SeedSequence(self.seed_sequence.entropy, spawn_key=(round_index,))
+        return spawn_streams(len(ACTIONS), round_sequence, self.n_workers)
+
+    def _row_ranges(self) -> List[tuple]:
+        n = len(self.data)
+        if self.shard == "episodes":
+            return [(0, n)] * self.n_workers
+        bounds = np.linspace(0, n, self.n_workers + 1).astype(int)
+        return [(int(bounds[w]), int(bounds[w + 1])) for w in range(self.n_workers)]
+
+    def _merge(self, results: List[Dict], slot_values: np.ndarray, slot_visits: np.ndarray) -> None:
+        q_values = self.agent.q_table.values
+        workers = [r["worker"] for r in results]
+        if self.merge == "mean":
+            q_values[:] = np.mean([slot_values[w] for w in workers], axis=0)
+        else:
+            weighted = np.zeros_like(q_values)
+            total = np.zeros(q_values.shape, dtype=np.int64)
+            for w in workers:
+                weighted += slot_visits[w] * slot_values[w]
+                total += slot_visits[w]
+            visited = total > 0
+            q_values[visited] = weighted[visited] / total[visited]
+        self.agent.exploration_rate = float(np.mean([r["exploration_rate"] for r in results]))
+        self.agent.exploration_steps = int(round(np.mean([r["exploration_steps"] for r in results])))
+
+    def train(self, n_episodes: int, episodes_per_round: Optional[int] = None) -> np.ndarray:
+        """Train for n_episodes episodes in total, merging after every round; returns final balances."""
+        episodes_per_round = episodes_per_round or max(self.n_workers, n_episodes // 10)
+        data_shm, data_spec = share_market_data(self.data)
+        q_values = self.agent.q_table.values
+        q_shm = shared_memory.SharedMemory(create=True, size=q_values.nbytes)
+        shared_q = np.ndarray(q_values.shape, dtype=np.float64, buffer=q_shm.buf)
+        # One [state, action] slot of Q-values and visits per worker, written by the worker in place
+        slots_shm = shared_memory.SharedMemory(create=True, size=2 * self.n_workers * q_values.nbytes)
+        slot_values, slot_visits = _slot_arrays(slots_shm, self.n_workers, q_values.shape)
+        balances: List[np.ndarray] = []
+        try:
+            with Pool(self.n_workers, initializer=_init_worker,
+                      initargs=(data_spec, q_shm.name, slots_shm.name, self.n_workers, q_values.shape,
+                                set(self._row_ranges()))) as pool:
+                remaining = n_episodes
+                while remaining > 0:
+                    this_round = min(episodes_per_round, remaining)
+                    shares = np.full(self.n_workers, this_round // self.n_workers)
+                    shares[:this_round % self.n_workers] += 1
+                    shared_q[:] = self.agent.q_table.values
+                    tasks = [
+                        {
+                            "worker": w,
+                            "rows": rows,
+                            "episodes": int(shares[w]),
+                            "exploration": stream,
+                            "encoder": self.encoder,
+                            "agent_kwargs": self.agent_kwargs,
+                            "exploration_rate": self.agent.exploration_rate,
+                            "exploration_steps": self.agent.exploration_steps,
+                            "n_envs": self.n_envs,
+                        }
+                        for w, (rows, stream) in enumerate(zip(self._row_ranges(), self.worker_streams(self.rounds_done)))
+                        if shares[w] > 0
+                    ]
+                    begin = time.perf_counter()
+                    results = pool.map(_train_shard, tasks)
+                    elapsed = time.perf_counter() - begin
+                    self._merge(results, slot_values, slot_visits)
+                    balances.extend(r["balances"] for r in sorted(results, key=lambda r: r["worker"]))
+                    self.round_stats.append({
+                        "round": self.rounds_done,
+                        "episodes": this_round,
+                        "seconds": elapsed,
+                        "episodes_per_sec": this_round / elapsed if elapsed > 0 else float("inf"),
+                    })
+                    self.rounds_done += 1
+                    remaining -= this_round
+        finally:
+            del shared_q, slot_values, slot_visits
+            for shm in (data_shm, q_shm, slots_shm):
+                shm.close()
+                shm.unlink()
+        return np.concatenate(balances) if balances else np.zeros(0, dtype=np.int64)
+
+
+def scaling_report(data, encoder, worker_counts=(1, 2, 4, 8), n_episodes: int = 256, seed: Optional[int] = 0, **trainer_kwargs) -> List[Dict]:
+    """Train the same number of episodes with each worker count and report throughput and speedup."""
+    report = []
+    for n_workers in worker_counts:
+        trainer = ParallelTrainer(data, encoder, n_workers=n_workers, seed=seed, **trainer_kwargs)
+        begin = time.perf_counter()
+        trainer.train(n_episodes, episodes_per_round=n_episodes)
+        elapsed = time.perf_counter() - begin
+        report.append({"workers": n_workers, "seconds": elapsed, "episodes_per_sec": n_episodes / elapsed})
+    base = report[0]["episodes_per_sec"]
+    for row in report:
+        row["speedup"] = row["episodes_per_sec"] / base
+    return report
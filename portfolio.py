@@ -0,0 +1,204 @@
+"""Several instruments traded at once against one shared balance.
+
+    portfolio = load_portfolio(["audusd.csv", "eurusd.csv", "gbpusd.csv"])
+    result = PortfolioSimulator(portfolio).run(policy)
+
+Instruments are aligned on their timestamps into [bar, instrument] arrays.
+Each instrument holds at most one position; positions open and settle
+independently and every settlement goes to the same balance. TP/SL outcomes
+come from each instrument's own OutcomeTable (the TradeCalculator levels), so a
+position resolves exactly as it would in the single-instrument game.
+"""
+import os
+from dataclasses import dataclass
+from functools import reduce
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from OrangeTraderV2 import TradeSettings
+from market_data import MarketData, load_market_data
+from trade_outcomes import outcome_table
+
+# Per-instrument action codes a portfolio policy returns
+PASS, BUY, SELL = 0, 1, 2
+
+# A policy sees the bar index and the Portfolio and returns (actions, rrr_slots): an int array of
+# PASS/BUY/SELL per instrument and the RRR slot (index into Portfolio.rrr_choices) per instrument or as a scalar
+PortfolioPolicy = Callable[[int, "Portfolio"], Tuple[np.ndarray, Union[np.ndarray, int]]]
+
+END_OF_DATA = "End of data"
+
+
+class Portfolio:
+    """Aligned bars of several instruments plus their precomputed trade outcomes.
+
+    ``prices``/``atr`` are float64 [bar, instrument]; ``present`` marks bars an
+    instrument actually has (only relevant for ``how="outer"``, where gaps are
+    forward-filled and cannot be traded). ``codes``/``exits`` are
+    [bar, instrument, action, rrr] result codes and exit bars on the aligned
+    timeline.
+    """
+
+    def __init__(self, instruments: Dict[str, MarketData], how: str = "inner"):
+        if how not in ("inner", "outer"):
+            raise ValueError(f"how must be 'inner' or 'outer', not {how!r}")
+        self.names: List[str] = list(instruments)
+        datas = list(instruments.values())
+        combine = np.intersect1d if how == "inner" else np.union1d
+        self.times = reduce(combine, [data.times for data in datas])
+        self.rrr_choices = list(TradeSettings.rrr_multipliers)
+        multipliers = [multiplier for multiplier, _ in TradeSettings.rrr_multipliers.values()]
+        self.win_amounts = np.array([win for _, win in TradeSettings.rrr_multipliers.values()], dtype=np.float64)
+
+        n, k = len(self.times), len(datas)
+        self.prices = np.full((n, k), np.nan)
+        self.atr = np.zeros((n, k))
+        self.present = np.zeros((n, k), dtype=bool)
+        self.codes = np.zeros((n, k, 2, len(multipliers)), dtype=np.int8)
+        self.exits = np.full((n, k, 2, len(multipliers)), max(n - 1, 0), dtype=np.int32)
+        for j, data in enumerate(datas):
+            # Aligned bar of every original bar (the first aligned bar at or after it) and vice versa
+            aligned_of = np.minimum(np.searchsorted(self.times, data.times), max(n - 1, 0))
+            rows = np.searchsorted(data.times, self.times)
+            rows = np.minimum(rows, len(data) - 1)
+            present = data.times[rows] == self.times
+            table = outcome_table(data, multipliers, TradeSettings.default_sl_multiplier)
+            self.present[:, j] = present
+            self.atr[present, j] = data.atr[rows[present]]
+            self.codes[present, j] = table.bar_codes[rows[present]]
+            self.exits[present, j] = aligned_of[table.bar_indexes[rows[present]]]
+            # Gaps keep the last known price
+            filled = np.where(present, np.arange(n), -1)
+            np.maximum.accumulate(filled, out=filled)
+            has_price = filled >= 0
+            self.prices[has_price, j] = data.price[rows[filled[has_price]]]
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @property
+    def n_instruments(self) -> int:
+        return len(self.names)
+
+
+def instrument_name(file_name: str) -> str:
+    """'audusd-h1-bid-2003-...csv' -> 'audusd'"""
+    return os.path.basename(file_name).split("-")[0].split(".")[0]
+
+
+def load_portfolio(files: Union[Sequence[str], Dict[str, str]], how: str = "inner") -> Portfolio:
+    """Load indicator CSVs (a list, or a name -> file dict) into one aligned Portfolio."""
+    if not isinstance(files, dict):
+        files = {instrument_name(file_name): file_name for file_name in files}
+    return Portfolio({name: load_market_data(file_name) for name, file_name in files.items()}, how)
+
+
+@dataclass
+class PortfolioTrades:
+    """Every opened position, one array element per trade in opening order."""
+    entry: np.ndarray  # Aligned bar the position was opened on
+    exit: np.ndarray  # Aligned bar it settles on
+    instrument: np.ndarray
+    action: np.ndarray  # BUY or SELL
+    rrr_slot: np.ndarray
+    result: np.ndarray  # trade_outcomes.RESULT_NAMES code
+    pnl: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.entry)
+
+
+@dataclass
+class PortfolioResult:
+    final_balance: float
+    max_drawdown: float
+    termination_reason: str
+    last_index: int
+    balance_path: np.ndarray  # Balance after the settlements of every bar played
+    trades: PortfolioTrades
+    open_positions: int  # Still open when the run ended; not included in the balance
+
+    @property
+    def n_trades(self) -> int:
+        return len(self.trades)
+
+    def pnl_by_instrument(self, n_instruments: int) -> np.ndarray:
+        """Settled profit and loss per instrument."""
+        settled = self.trades.exit <= self.last_index
+        return np.bincount(self.trades.instrument[settled], self.trades.pnl[settled], minlength=n_instruments)
+
+
+class PortfolioSimulator:
+    """Steps all instruments of a Portfolio together, bar by bar.
+
+    Per bar the work is a handful of array operations over the instrument axis
+    (settle exits, ask the policy, open positions), so the Python overhead is
+    paid once per bar rather than once per instrument.
+    """
+
+    def __init__(self, portfolio: Portfolio, starting_balance: float = TradeSettings.starting_balance,
+                 min_balance: float = TradeSettings.min_balance, max_open: Optional[int] = None):
+        self.portfolio = portfolio
+        self.starting_balance = starting_balance
+        self.min_balance = min_balance
+        self.max_open = max_open  # Cap on simultaneously open positions, None for one per instrument
+
+    def run(self, policy: PortfolioPolicy, start_index: int = 0) -> PortfolioResult:
+        p = self.portfolio
+        n, k = len(p), p.n_instruments
+        codes, exits, atr, present, wins = p.codes, p.exits, p.atr, p.present, p.win_amounts
+        instruments = np.arange(k)
+        open_exit = np.full(k, -1, dtype=np.int64)  # Exit bar of each instrument's open position, -1 if flat
+        open_pnl = np.zeros(k)
+        balance = float(self.starting_balance)
+        path = np.empty(max(n - start_index, 0))
+        opened: List[Tuple[np.ndarray, ...]] = []
+        reason = END_OF_DATA
+        t = start_index
+        for t in range(start_index, n):
+            closing = open_exit == t
+            if closing.any():
+                balance += open_pnl[closing].sum()
+                open_exit[closing] = -1
+            path[t - start_index] = balance
+            if balance <= self.min_balance:
+                reason = f"Your balance reached ${self.min_balance}!"
+                break
+            if t == n - 1:
+                break
+
+            actions, rrr_slots = policy(t, p)
+            actions = np.asarray(actions)
+            can_open = (open_exit < 0) & (actions != PASS) & present[t] & (atr[t] != 0)
+            idx = np.flatnonzero(can_open)
+            if self.max_open is not None:
+                idx = idx[:max(0, self.max_open - int(np.count_nonzero(open_exit >= 0)))]
+            if not idx.size:
+                continue
+            action = actions[idx]
+            slot = np.broadcast_to(np.asarray(rrr_slots), (k,))[idx]
+            result = codes[t, idx, action - 1, slot]
+            exit_bar = exits[t, idx, action - 1, slot]
+            pnl = np.where(result == 1, wins[slot], np.where(result == 2, -1.0, 0.0))
+            open_exit[idx] = exit_bar
+            open_pnl[idx] = pnl
+            opened.append((np.full(idx.size, t), exit_bar, instruments[idx], action, slot, result, pnl))
+
+        path = path[:t - start_index + 1]
+        peaks = np.maximum.accumulate(path) if path.size else path
+        max_drawdown = float(np.max((peaks - path) / np.where(peaks > 0, peaks, 1))) if path.size else 0.0
+        columns = [np.concatenate(column) for column in zip(*opened)] if opened else [np.zeros(0, dtype=np.int64)] * 7
+        trades = PortfolioTrades(*columns)
+        return PortfolioResult(balance, max_drawdown, reason, t, path, trades, int(np.count_nonzero(open_exit >= 0)))
+
+
+def signal_policy(actions: np.ndarray, rrr_slots: Union[np.ndarray, int] = 0) -> PortfolioPolicy:
+    """Policy replaying precomputed [bar, instrument] action codes (and optionally RRR slots)."""
+    actions = np.asarray(actions)
+    rrr_slots = np.asarray(rrr_slots)
+
+    def policy(t: int, portfolio: Portfolio):
+        return actions[t], rrr_slots[t] if rrr_slots.ndim == 2 else rrr_slots
+
+    return policy
@@ -0,0 +1,198 @@
+from typing import Dict, Optional
+
+import numpy as np
+
+
+class ArrayQTable:
+    """Preallocated Q-values indexed by dense integer state id and action index."""
+
+    def __init__(self, n_states: int, n_actions: int, initial_value: float = 0.0, track_visits: bool = False):
+        self.values = np.full((n_states, n_actions), initial_value, dtype=np.float64)
+        # Per-entry update counts, used for visit-weighted merging of worker tables
+        self.visits = np.zeros((n_states, n_actions), dtype=np.int64) if track_visits else None
+
+    @classmethod
+    def from_arrays(cls, values: np.ndarray, visits: Optional[np.ndarray] = None) -> "ArrayQTable":
+        """Wrap existing arrays (e.g. views of shared memory) without copying them."""
+        table = cls.__new__(cls)
+        table.values = values
+        table.visits = visits
+        return table
+
+    @property
+    def n_states(self) -> int:
+        return self.values.shape[0]
+
+    @property
+    def n_actions(self) -> int:
+        return self.values.shape[1]
+
+    def __len__(self) -> int:
+        """Number of (state, action) entries that have moved away from zero."""
+        return int(np.count_nonzero(self.values))
+
+    def best_actions(self, states: np.ndarray) -> np.ndarray:
+        """Greedy action index for each state; ties go to the lowest index like the dict agent."""
+        return np.argmax(self.values[states], axis=1)
+
+    def max_values(self, states: np.ndarray) -> np.ndarray:
+        return self.values[states].max(axis=1)
+
+    def add_mean(self, states: np.ndarray, actions: np.ndarray, steps: np.ndarray,
+                 groups: Optional[np.ndarray] = None) -> None:
+        """Add ``steps`` to Q(state, action), averaging the steps of pairs that occur more than once.
+
+        A batch then moves each pair by at most one learning-rate step, as if it
+        were updated once with the mean TD error, however many lanes hit it.
+        With ``groups`` (e.g. the lane of each step), steps of one group are
+        summed and the sums averaged over the groups that touch the pair.
+        """
+        flat = states * self.n_actions + actions
+        pairs, inverse, counts = np.unique(flat, return_inverse=True, return_counts=True)
+        values = self.values.reshape(-1)
+        if len(pairs) == len(flat):
+            values[flat] += steps
+            return
+        if groups is not None:
+            n_groups = int(groups.max()) + 1
+            counts = np.bincount(np.unique(inverse * n_groups + groups) // n_groups, minlength=len(pairs))
+        values[pairs] += np.bincount(inverse, steps, minlength=len(pairs)) / counts
+
+
+class BoundedQTable:
+    """Drop-in replacement for the ``{(state, action): q}`` dict with a fixed memory budget.
+
+    States are stored as their 64-bit hash (``hash(state)``, which for the
+    agent's tuples of floats is the same in every process) next to one row of
+    Q-values per state, so a state costs a few dozen bytes instead of a tuple
+    of boxed floats per action. Distinct states whose hashes collide share a
+    row, which at 64 bits is negligible.
+
+    When the table is full, inserting a new state first evicts the
+    ``evict_fraction`` lowest-ranked resident states: least recently used with
+    ``policy="lru"``, or fewest visits (then smallest max |Q|) with
+    ``policy="visits"``.
+    """
+
+    # Approximate cost of one entry of the hash -> row dict (key int, value int, table slot)
+    _INDEX_BYTES = 104
+
+    def __init__(self, actions, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 policy: str = "lru", evict_fraction: float = 1 / 16):
+        if policy not in ("lru", "visits"):
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        if max_entries is None and max_bytes is None:
+            raise ValueError("BoundedQTable needs max_entries or max_bytes")
+        self.actions = list(actions)
+        self.action_index = {action: i for i, action in enumerate(self.actions)}
+        n_actions = len(self.actions)
+        if max_entries is None:
+            max_entries = max_bytes // self.bytes_per_state(n_actions)
+        if max_entries < 1:
+            raise ValueError("Budget is too small for a single state")
+        self.capacity = int(max_entries)
+        self.policy = policy
+        self.evict_batch = max(1, int(self.capacity * evict_fraction))
+        self.keys = np.zeros(self.capacity, dtype=np.int64)
+        self.values = np.zeros((self.capacity, n_actions), dtype=np.float64)
+        self.present = np.zeros((self.capacity, n_actions), dtype=bool)  # Which (state, action) entries were set
+        self.visits = np.zeros(self.capacity, dtype=np.uint32)
+        self.last_used = np.zeros(self.capacity, dtype=np.int64)
+        self._rows: Dict[int, int] = {}
+        self._free = list(range(self.capacity - 1, -1, -1))
+        self._clock = 0
+        self.evictions = 0  # States evicted so far
+        self.misses = 0  # Lookups of states that were not resident
+
+    @staticmethod
+    def bytes_per_state(n_actions: int) -> int:
+        """Resident bytes per stored state, for turning a memory budget into an entry budget."""
+        return 8 + 9 * n_actions + 4 + 8 + BoundedQTable._INDEX_BYTES
+
+    def _row(self, state) -> Optional[int]:
+        row = self._rows.get(hash(state))
+        self._clock += 1
+        if row is None:
+            self.misses += 1
+        else:
+            self.last_used[row] = self._clock
+        return row
+
+    def _scores(self, rows: np.ndarray) -> np.ndarray:
+        if self.policy == "lru":
+            return self.last_used[rows].astype(np.float64)
+        magnitude = np.abs(self.values[rows]).max(axis=1)
+        return self.visits[rows] + magnitude / (1.0 + magnitude)  # Visits first, then |Q| within the same count
+
+    def _evict(self) -> None:
+        rows = np.fromiter(self._rows.values(), dtype=np.int64, count=len(self._rows))
+        victims = rows[np.argpartition(self._scores(rows), self.evict_batch - 1)[:self.evict_batch]]
+        for row in victims.tolist():
+            del self._rows[int(self.keys[row])]
+            self._free.append(row)
+        self.present[victims] = False
+        self.values[victims] = 0.0
+        self.visits[victims] = 0
+        self.evictions += len(victims)
+
+    def get(self, key, default: float = 0.0) -> float:
+        state, action = key
+        row = self._row(state)
+        if row is None:
+            return default
+        a = self.action_index[action]
+        return float(self.values[row, a]) if self.present[row, a] else default
+
+    def __getitem__(self, key) -> float:
+        state, action = key
+        row = self._row(state)
+        a = self.action_index[action]
+        if row is None or not self.present[row, a]:
+            raise KeyError(key)
+        return float(self.values[row, a])
+
+    def __setitem__(self, key, value: float) -> None:
+        state, action = key
+        state_hash = hash(state)
+        self._clock += 1
+        row = self._rows.get(state_hash)
+        if row is None:
+            if not self._free:
+                self._evict()
+            row = self._free.pop()
+            self._rows[state_hash] = row
+            self.keys[row] = state_hash
+        a = self.action_index[action]
+        self.values[row, a] = value
+        self.present[row, a] = True
+        self.visits[row] += 1
+        self.last_used[row] = self._clock
+
+    def __contains__(self, key) -> bool:
+        state, action = key
+        row = self._rows.get(hash(state))
+        return row is not None and bool(self.present[row, self.action_index[action]])
+
+    def __len__(self) -> int:
+        """Number of resident (state, action) entries, like len() of the dict it replaces."""
+        return int(np.count_nonzero(self.present))  # Free rows are cleared on eviction
+
+    @property
+    def n_states(self) -> int:
+        return len(self._rows)
+
+    @property
+    def resident_bytes(self) -> int:
+        """Arrays plus the estimated size of the hash index."""
+        arrays = (self.keys, self.values, self.present, self.visits, self.last_used)
+        return sum(array.nbytes for array in arrays) + self._INDEX_BYTES * len(self._rows)
+
+    def stats(self) -> Dict[str, float]:
+        """Occupancy and eviction counters, e.g. for sizing the budget or instrumentation.watch."""
+        return {
+            "states": self.n_states,
+            "capacity": self.capacity,
+            "evictions": self.evictions,
+            "misses": self.misses,
+            "resident_bytes": self.resident_bytes,
+        }
@@ -1,128 +1,189 @@
-import csv
+import argparse
 import random
 
-# Round a number to 4 decimal places
-def round_to_4_decimals(value):
-    return round(value, 4)
+import numpy as np
 
-# Check if TP or SL is reached first and skip to that row
-def check_outcome(data, start_index, trade_action):
-    entry_price = data[start_index]["Price"]
-    atr = data[start_index]["ATR"]
-
-    tp = round_to_4_decimals(entry_price + 2 * atr) if trade_action == "BUY" else round_to_4_decimals(entry_price - 2 * atr)
-    sl = round_to_4_decimals(entry_price - 2 * atr) if trade_action == "BUY" else round_to_4_decimals(entry_price + 2 * atr)
+import instrumentation
+import reporting
+from checkpoint import train_resumable
+from episodes import SAMPLING_MODES, EpisodeSampler
+from exploration import stream_for
+from market_data import load_market_data
+from q_tables import ArrayQTable
+from replay_buffer import replay_minibatch
+from reporting import logger
+from state_encoding import StateEncoder
+from trade_outcomes import outcome_table
 
-    for i in range(start_index + 1, len(data)):
-        current_price = data[i]["Price"]
-        if (trade_action == "BUY" and current_price >= tp) or (trade_action == "SELL" and current_price <= tp):
-            return "TP", i  # Return the result and the row index where it resolves
-        if (trade_action == "BUY" and current_price <= sl) or (trade_action == "SELL" and current_price >= sl):
-            return "SL", i  # Return the result and the row index where it resolves
-    return "No TP or SL", len(data) - 1  # If unresolved, jump to the last row
+# Check if TP or SL is reached first and skip to that row (TP and SL are both 2×ATR away)
+def check_outcome(data, start_index, trade_action):
+    return outcome_table(data).lookup(start_index, trade_action, 2)  # Result and the row index where it resolves
 
-# Load data from CSV
+# Load data from CSV into the shared columnar store
 def load_data(file_name):
-    with open(file_name, mode='r') as file:
-        reader = csv.DictReader(file)
-        expected_columns = {"timestamp", "close", "ATR", "volume", "LWPI Value", "ALMA Value", "VIXFIX", "Filtered Stochastic", "Signal", "ATR_EMA", "Price_Difference", "Gradient", "ALMA_Gradient", "ATR_EMA_Gradient", "EMA_13", "EMA_Gradient"}
-        if not expected_columns.issubset(reader.fieldnames):
-            raise ValueError(f"Missing required columns: {expected_columns - set(reader.fieldnames)}")
-        return [
-            {
-                "Time": row["timestamp"],
-                "Price": float(row["close"]),
-                "ATR": float(row["ATR"]),
-                "Vol": float(row["volume"]),
-                "LWPI": float(row["LWPI Value"]),
-                "ALMA": float(row["ALMA Value"]),
-                "VIX": float(row["VIXFIX"]),
-                "Filt_Stoch": float(row["Filtered Stochastic"]),
-                "Sig": float(row["Signal"]),
-                "ATR_EMA": float(row["ATR_EMA"]),
-                "PriceDiff": float(row["Price_Difference"]),
-                "Grad": float(row["Gradient"]),
-                "ALMA_Grad": float(row["ALMA_Gradient"]),
-                "ATR_EMA_Grad": float(row["ATR_EMA_Gradient"]),
-                "EMA13": float(row["EMA_13"]),
-                "EMA_Grad": float(row["EMA_Gradient"])
-            }
-            for row in reader
-        ]
+    return load_market_data(file_name)
 
 # Q-learning implementation (barebones)
 class QLearningAgent:
-    def __init__(self, actions, learning_rate=0.1, discount_factor=0.9, exploration_rate=1.0, exploration_decay=0.995):
+    def __init__(self, actions, learning_rate=0.1, discount_factor=0.9, exploration_rate=1.0, exploration_decay=0.995,
+                 q_table=None, seed=None, schedule=None):
         self.actions = actions  # possible actions: "BUY", "SELL", "PASS"
         self.learning_rate = learning_rate  # learning rate
         self.discount_factor = discount_factor  # how much future rewards count
         self.exploration_rate = exploration_rate  # exploration vs exploitation
         self.exploration_decay = exploration_decay  # exploration decay rate
-        self.q_table = {}  # Initialize Q-table
+        self.q_table = q_table if q_table is not None else {}  # Initialize Q-table (a BoundedQTable caps its memory)
+        self.exploration = stream_for(len(actions), seed)  # Own random stream when seeded, else the global random module
+        self.schedule = schedule  # exploration.EpsilonSchedule: epsilon from the step count instead of repeated decay
+        self.exploration_steps = 0  # Decays applied so far
 
     def get_state(self, data, index, balance):
         """Return a tuple that represents the state, using all the features and balance."""
-        features = (
-            round(data[index]["Price"], 4),
-            round(data[index]["ATR"], 4),
-            round(data[index]["Vol"], 4),
-            round(data[index]["LWPI"], 4),
-            round(data[index]["ALMA"], 4),
-            round(data[index]["VIX"], 4),
-            round(data[index]["Filt_Stoch"], 4),
-            round(data[index]["Sig"], 4),
-            round(data[index]["ATR_EMA"], 4),
-            round(data[index]["PriceDiff"], 4),
-            round(data[index]["Grad"], 4),
-            round(data[index]["ALMA_Grad"], 4),
-            round(data[index]["ATR_EMA_Grad"], 4),
-            round(data[index]["EMA13"], 4),
-            round(data[index]["EMA_Grad"], 4),
-            round(balance, 2)  # Include balance in the state
-        )
-        return features
-
-    def update_q_value(self, state, action, reward, next_state):
+        features = tuple(round(value, 4) for value in data.feature_values(index))
+        return features + (round(balance, 2),)  # Include balance in the state
+
+    def update_q_value(self, state, action, reward, next_state, done=False):
         """Update the Q-value for a given state-action pair"""
         old_q_value = self.q_table.get((state, action), 0.0)
         max_future_q = max([self.q_table.get((next_state, a), 0.0) for a in self.actions], default=0.0)
         new_q_value = old_q_value + self.learning_rate * (reward + self.discount_factor * max_future_q - old_q_value)
         self.q_table[(state, action)] = new_q_value
 
+    def explore(self):
+        """A random action with probability exploration_rate, otherwise None"""
+        if self.exploration is not None:
+            a = self.exploration.draw(self.exploration_rate)
+            return self.actions[a] if a >= 0 else None
+        if random.uniform(0, 1) < self.exploration_rate:
+            return random.choice(self.actions)
+        return None
+
     def choose_action(self, state):
         """Choose an action based on exploration or exploitation"""
-        if random.uniform(0, 1) < self.exploration_rate:
-            return random.choice(self.actions)  # Explore
+        action = self.explore()
+        if action is not None:
+            return action  # Explore
         else:
             q_values = {action: self.q_table.get((state, action), 0.0) for action in self.actions}
             return max(q_values, key=q_values.get)  # Exploit
 
     def decay_exploration(self):
         """Decay the exploration rate after each episode"""
-        self.exploration_rate *= self.exploration_decay
+        self.advance_exploration(1)
+
+    def advance_exploration(self, steps):
+        """Apply ``steps`` decays at once"""
+        self.exploration_steps += steps
+        if self.schedule is not None:
+            self.exploration_rate = self.schedule.at(self.exploration_steps)
+        else:
+            self.exploration_rate *= self.exploration_decay ** steps
+
+    def start_episode(self):
+        """Called by forex_game before the first step of an episode"""
+
+    def end_episode(self):
+        """Called by forex_game after the last step of an episode"""
+
+# forex_game plays a single episode, which uses the first lane of the traces
+_FIRST_LANE = np.zeros(1, dtype=np.int64)
+
+class BinnedQLearningAgent(QLearningAgent):
+    """QLearningAgent over discretized states, storing Q-values in a preallocated array.
+
+    States are integer ids from a StateEncoder instead of rounded feature tuples,
+    so memory is fixed by the encoder and updates don't allocate. With a
+    ReplayBuffer, every update also stores the transition and replays a
+    minibatch of earlier ones. With ``traces`` (traces.NStepReturns or
+    traces.WatkinsTraces) updates use multi-step targets instead of one-step TD.
+    """
+
+    def __init__(self, actions, encoder, learning_rate=0.1, discount_factor=0.9, exploration_rate=1.0, exploration_decay=0.995,
+                 replay=None, replay_batch_size=32, traces=None, seed=None, schedule=None):
+        super().__init__(actions, learning_rate, discount_factor, exploration_rate, exploration_decay, seed=seed,
+                         schedule=schedule)
+        self.encoder = encoder
+        self.q_table = ArrayQTable(encoder.n_states, len(actions))
+        self.action_index = {action: i for i, action in enumerate(actions)}
+        self.replay = replay
+        self.replay_batch_size = replay_batch_size
+        self.traces = traces
+
+    def get_state(self, data, index, balance):
+        """Return the encoder's integer state id for this bar and balance."""
+        return self.encoder.encode(data, index, balance)
+
+    def update_q_value(self, state, action, reward, next_state, done=False):
+        """Update the Q-value for a given state-action pair
+
+        ``done`` marks the $50 restart. The update itself still bootstraps from
+        next_state, but the transition is replayed as terminal, the same as in
+        VectorizedForexGame.
+        """
+        q_values = self.q_table.values
+        a = self.action_index[action]
+        if self.traces is not None:
+            greedy = a == int(np.argmax(q_values[state]))
+            self.traces.update_batch(self, _FIRST_LANE, np.array([state]), np.array([a]), np.array([float(reward)]),
+                                     np.array([next_state]), np.array([greedy]))
+        else:
+            old_q_value = q_values[state, a]
+            max_future_q = q_values[next_state].max()
+            q_values[state, a] = old_q_value + self.learning_rate * (reward + self.discount_factor * max_future_q - old_q_value)
+        if self.q_table.visits is not None:
+            self.q_table.visits[state, a] += 1
+        if self.replay is not None:
+            self.replay.add(state, a, reward, next_state, done)
+            replay_minibatch(self, self.replay, self.replay_batch_size)
+
+    def choose_action(self, state):
+        """Choose an action based on exploration or exploitation"""
+        action = self.explore()
+        if action is not None:
+            return action  # Explore
+        return self.actions[int(np.argmax(self.q_table.values[state]))]  # Exploit
+
+    def start_episode(self):
+        if self.traces is not None:
+            self.traces.start(1)
+
+    def end_episode(self):
+        """Flush pending multi-step updates"""
+        if self.traces is not None:
+            self.traces.end_lanes(self, _FIRST_LANE)
 
 # Game logic with Q-learning agent
-def forex_game(data, episode_num, agent):
+def forex_game(data, episode_num, agent, start_index=0, end_index=None):
     balance = 100  # Starting balance
-    print(f"\nEpisode {episode_num + 1}: Starting balance: ${balance}")
-    print("Rules: TP = 2×ATR away. SL = 2×ATR away. $1 gained for hitting TP, $1 lost for hitting SL.")
-    i = 0  # Start at the first row
+    last_index = len(data) - 1 if end_index is None else min(end_index, len(data) - 1)  # The episode ends here
+    logger.debug("\nEpisode %d: Starting balance: $%s", episode_num + 1, balance)
+    logger.debug("Rules: TP = 2×ATR away. SL = 2×ATR away. $1 gained for hitting TP, $1 lost for hitting SL.")
+    i = start_index  # Start at the first row (or the sampled start)
+    agent.start_episode()
+    rec = instrumentation.active()
+    if rec and agent.q_table is not None:
+        rec.watch("q_table_size", lambda: len(agent.q_table))
 
-    while i < len(data) - 1:
-        current_data = data[i]
-        atr = current_data["ATR"]
-        time = current_data["Time"]
+    while i < last_index:
+        if rec:
+            rec.tick()
+        atr = data.atr[i]
+        time = data.times[i]
 
         if atr == 0:
-            print(f"\nWarning: ATR is 0 at time {time}. Skipping this row.")
+            logger.debug("\nWarning: ATR is 0 at time %s. Skipping this row.", time)
             i += 1
             continue
 
         # State for the Q-learning agent
         state = agent.get_state(data, i, balance)
+        if rec:
+            rec.lap("get_state")
 
         # Agent chooses an action
         action = agent.choose_action(state)
+        if rec:
+            rec.lap("choose_action")
 
         # Determine reward and next state based on chosen action
         if action == "BUY":
@@ -134,17 +195,26 @@ def forex_game(data, episode_num, agent):
         else:
             reward = 0
             next_index = i + 1  # No change if PASS
+        if rec:
+            rec.lap("check_outcome")
+            if action != "PASS":
+                rec.trade(result, next_index - i)
 
         # Update Q-table based on the result
         next_state = agent.get_state(data, next_index, balance + reward)
-        agent.update_q_value(state, action, reward, next_state)
+        if rec:
+            rec.lap("get_state")
+        agent.update_q_value(state, action, reward, next_state, balance + reward <= 50)
+        if rec:
+            rec.lap("update_q_value")
 
         # Update balance
         balance += reward
 
         # Restart game if balance drops to $50
         if balance <= 50:
-            print("\nBalance dropped to $50. Restarting the game.")
+            logger.debug("\nBalance dropped to $50. Restarting the game.")
+            agent.end_episode()
             return balance  # End the current episode
 
         # Decay exploration rate
@@ -153,34 +223,74 @@ def forex_game(data, episode_num, agent):
         # Move to the next row after the current one
         i = next_index
 
+    agent.end_episode()
     return balance
 
 # Load CSV and start game
-file_name = "audusd-h1-bid-2003-08-03T21-2024-05-27.csv"  # Replace with your CSV file path
-try:
-    forex_data = load_data(file_name)
-
-    agent = QLearningAgent(actions=["BUY", "SELL", "PASS"])
-    total_balance = 0
-    total_points = 0
-    for episode in range(100000):
-        final_balance = forex_game(forex_data, episode, agent)
-
-        # Point system based on results
-        if final_balance > 100:  # Win
-            total_points += 1
-        else:  # Loss
-            total_points -= 2
-
-        total_balance += final_balance
-        print(f"Episode {episode + 1} completed. Final Balance: ${final_balance}")
-
-    avg_balance = total_balance / 100
-    print("\n🎮 100 Episodes Complete!")
-    print(f"Average Balance after 100 episodes: ${avg_balance}")
-    print(f"Total Points: {total_points}")
-    print("Thanks for playing. Better luck next time (or maybe you're ready for the big leagues)!")
-except FileNotFoundError:
-    print("Error: The specified CSV file was not found.")
-except Exception as e:
-    print(f"An error occurred: {e}")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the Q-learning agent on the H1 indicator CSV.")
+    parser.add_argument("--file", default="audusd-h1-bid-2003-08-03T21-2024-05-27.csv", help="indicator CSV")
+    parser.add_argument("--episodes", type=int, default=100000)
+    parser.add_argument("--checkpoint", default="qlearning_checkpoint.npz", help="checkpoint file")
+    parser.add_argument("--checkpoint-every", type=int, default=1000, help="episodes between checkpoints")
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint file")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--start-date", help="train on bars at or after this date, e.g. 2015-01-01")
+    parser.add_argument("--end-date", help="train on bars before this date")
+    parser.add_argument("--sampling", choices=SAMPLING_MODES, default="start",
+                        help="where episodes start: the first bar of the range, uniformly at random, or stratified")
+    parser.add_argument("--horizon", type=int, default=None, help="end episodes after this many bars")
+    parser.add_argument("--metrics", help="append per-phase timing summaries to this JSON-lines file")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only warnings and errors")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="also print every episode")
+    args = parser.parse_args(argv)
+    reporting.configure(reporting.verbosity_from_flags(args.quiet, args.verbose))
+    if args.metrics:
+        instrumentation.enable(args.metrics)
+
+    file_name = args.file
+    try:
+        forex_data = load_data(file_name)
+
+        sampler = None
+        if args.start_date or args.end_date or args.sampling != "start" or args.horizon:
+            sampler = EpisodeSampler(forex_data, args.sampling, args.horizon, args.start_date, args.end_date)
+            encoder = StateEncoder().fit(forex_data[sampler.first:sampler.stop])  # Bins from the bars being trained on
+        else:
+            encoder = StateEncoder().fit(forex_data)
+        agent = BinnedQLearningAgent(actions=["BUY", "SELL", "PASS"], encoder=encoder, seed=args.seed)
+        total_balance = 0
+        total_points = 0
+        # Episodes run 64 at a time in lockstep; results come back in episode order.
+        # A checkpoint is written in the background every --checkpoint-every episodes.
+        with reporting.ProgressReporter(args.episodes, desc="Training") as progress:
+            final_balances = train_resumable(forex_data, agent, args.episodes, args.checkpoint, args.checkpoint_every,
+                                             n_envs=64, seed=args.seed, resume=args.resume, progress=progress,
+                                             sampler=sampler)
+        verbose = reporting.enabled(reporting.VERBOSE)
+        for episode, final_balance in enumerate(final_balances.tolist()):
+            # Point system based on results
+            if final_balance > 100:  # Win
+                total_points += 1
+            else:  # Loss
+                total_points -= 2
+
+            total_balance += final_balance
+            if verbose:
+                logger.debug("Episode %d completed. Final Balance: $%s", episode + 1, final_balance)
+
+        n_episodes = len(final_balances)
+        avg_balance = total_balance / n_episodes if n_episodes else 0.0
+        logger.info("\n🎮 %d Episodes Complete!", n_episodes)
+        logger.info("Average Balance after %d episodes: $%.2f", n_episodes, avg_balance)
+        logger.info("Total Points: %d", total_points)
+        logger.info("Thanks for playing. Better luck next time (or maybe you're ready for the big leagues)!")
+    except FileNotFoundError:
+        logger.error("Error: The specified CSV file was not found.")
+    except Exception as e:
+        logger.error("An error occurred: %s", e)
+    finally:
+        instrumentation.disable()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+
+@dataclass
+class ReplayBatch:
+    slots: np.ndarray  # Buffer positions, for update_priorities
+    states: np.ndarray
+    actions: np.ndarray
+    rewards: np.ndarray
+    next_states: np.ndarray
+    dones: np.ndarray
+    weights: np.ndarray  # Importance-sampling weights (all ones for uniform sampling)
+
+
+class ReplayBuffer:
+    """Fixed-capacity ring of (state id, action index, reward, next state id, done) transitions.
+
+    Everything lives in arrays allocated once up front; adding a transition just
+    overwrites the oldest slot. With ``prioritized=True`` transitions are drawn
+    with probability proportional to (|TD error| + priority_epsilon) ** alpha
+    through a sum tree, and come back with importance-sampling weights.
+    """
+
+    def __init__(self, capacity: int, prioritized: bool = False, alpha: float = 0.6, beta: float = 0.4,
+                 priority_epsilon: float = 1e-3, seed: Optional[int] = None):
+        self.capacity = capacity
+        self.prioritized = prioritized
+        self.alpha = alpha
+        self.beta = beta
+        self.priority_epsilon = priority_epsilon
+        self.rng = np.random.default_rng(seed)
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float64)
+        self.next_states = np.zeros(capacity, dtype=np.int64)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.cursor = 0
+        self.count = 0
+        if prioritized:
+            size = 1
+            while size < capacity:
+                size <<= 1
+            self._size = size
+            self._tree = np.zeros(2 * size)  # Sum tree over priority ** alpha; leaf i is slot i
+            self._max_priority = 1.0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, state: int, action: int, reward: float, next_state: int, done: bool = False) -> None:
+        slot = self.cursor
+        self.states[slot] = state
+        self.actions[slot] = action
+        self.rewards[slot] = reward
+        self.next_states[slot] = next_state
+        self.dones[slot] = done
+        self.cursor = (slot + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        if self.prioritized:
+            # New transitions get the highest priority seen so far, so each is replayed at least once soon
+            node = self._size + slot
+            tree = self._tree
+            tree[node] = self._max_priority ** self.alpha
+            node >>= 1
+            while node:
+                tree[node] = tree[2 * node] + tree[2 * node + 1]
+                node >>= 1
+
+    def add_batch(self, states: np.ndarray, actions: np.ndarray, rewards: np.ndarray, next_states: np.ndarray,
+                  dones=False) -> None:
+        """Vectorized add; with more transitions than capacity only the newest are kept."""
+        n = len(states)
+        if n == 0:
+            return
+        keep = slice(max(0, n - self.capacity), n)
+        slots = (self.cursor + np.arange(n)[keep]) % self.capacity
+        self.states[slots] = np.asarray(states)[keep]
+        self.actions[slots] = np.asarray(actions)[keep]
+        self.rewards[slots] = np.asarray(rewards)[keep]
+        self.next_states[slots] = np.asarray(next_states)[keep]
+        self.dones[slots] = np.broadcast_to(dones, (n,))[keep]
+        self.cursor = (self.cursor + n) % self.capacity
+        self.count = min(self.count + n, self.capacity)
+        if self.prioritized:
+            self._set_leaves(slots, np.full(len(slots), self._max_priority ** self.alpha))
+
+    def _set_leaves(self, slots: np.ndarray, values: np.ndarray) -> None:
+        tree = self._tree
+        nodes = self._size + slots
+        tree[nodes] = values
+        nodes = np.unique(nodes >> 1)
+        while nodes.size and nodes[-1] >= 1:
+            tree[nodes] = tree[2 * nodes] + tree[2 * nodes + 1]
+            nodes = np.unique(nodes[nodes > 1] >> 1)
+
+    def sample(self, batch_size: int) -> ReplayBatch:
+        """Draw batch_size transitions (with replacement) from the filled part of the buffer."""
+        if self.count == 0:
+            raise ValueError("Cannot sample from an empty replay buffer")
+        if not self.prioritized:
+            slots = self.rng.integers(0, self.count, batch_size)
+            weights = np.ones(batch_size)
+        else:
+            tree, size = self._tree, self._size
+            total = tree[1]
+            # Stratified: one draw from each of batch_size equal slices of the total priority
+            targets = (np.arange(batch_size) + self.rng.random(batch_size)) * (total / batch_size)
+            nodes = np.ones(batch_size, dtype=np.int64)
+            while nodes[0] < size:
+                left = 2 * nodes
+                left_sum = tree[left]
+                go_right = targets > left_sum
+                targets = np.where(go_right, targets - left_sum, targets)
+                nodes = left + go_right
+            slots = np.minimum(nodes - size, self.count - 1)  # Rounding can step onto an empty leaf at the end
+            probabilities = tree[size + slots] / total
+            weights = (self.count * probabilities) ** -self.beta
+            weights /= weights.max()
+        return ReplayBatch(slots, self.states[slots], self.actions[slots], self.rewards[slots],
+                           self.next_states[slots], self.dones[slots], weights)
+
+    def update_priorities(self, slots: np.ndarray, td_errors: np.ndarray) -> None:
+        if not self.prioritized:
+            return
+        priorities = np.abs(td_errors) + self.priority_epsilon
+        self._max_priority = max(self._max_priority, float(priorities.max(initial=0.0)))
+        # A slot drawn twice in one batch keeps its last priority
+        self._set_leaves(slots, priorities ** self.alpha)
+
+
+def replay_minibatch(agent, buffer: ReplayBuffer, batch_size: int = 32) -> np.ndarray:
+    """Apply one vectorized Q-learning update to ``agent`` from a sampled minibatch; returns the TD errors.
+
+    Terminal transitions (done) don't bootstrap from the next state. The minibatch
+    is drawn with replacement, so updates to the same (state, action) are averaged
+    like in VectorizedForexGame rather than summed.
+    """
+    if len(buffer) == 0:
+        return np.zeros(0)
+    batch = buffer.sample(batch_size)
+    q_values = agent.q_table.values
+    future = np.where(batch.dones, 0.0, q_values[batch.next_states].max(axis=1))
+    td_error = batch.rewards + agent.discount_factor * future - q_values[batch.states, batch.actions]
+    agent.q_table.add_mean(batch.states, batch.actions, agent.learning_rate * batch.weights * td_error)
+    if agent.q_table.visits is not None:
+        np.add.at(agent.q_table.visits, (batch.states, batch.actions), 1)
+    buffer.update_priorities(batch.slots, td_error)
+    return td_error
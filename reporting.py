@@ -0,0 +1,93 @@
+import logging
+import sys
+import time
+
+from tqdm import tqdm
+
+# Verbosity levels for the scripts' -q/-v flags
+QUIET, NORMAL, VERBOSE = 0, 1, 2
+_LEVELS = {QUIET: logging.WARNING, NORMAL: logging.INFO, VERBOSE: logging.DEBUG}
+
+logger = logging.getLogger("orange_trader")
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout is at emit time, so contextlib.redirect_stdout still works."""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+def configure(verbosity: int = NORMAL, stream=None) -> None:
+    """Print the game/training messages (plain text, like print) at the given verbosity.
+
+    NORMAL is set up on import: progress lines, summaries and the interactive
+    board are shown, while per-episode and per-row messages (episode banners,
+    "ATR is 0" warnings) need VERBOSE.
+    """
+    handler = logging.StreamHandler(stream) if stream is not None else _StdoutHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.handlers[:] = [handler]
+    logger.setLevel(_LEVELS[max(QUIET, min(VERBOSE, verbosity))])
+    logger.propagate = False
+
+
+def verbosity_from_flags(quiet: bool, verbose: int) -> int:
+    return QUIET if quiet else min(VERBOSE, NORMAL + verbose)
+
+
+def enabled(verbosity: int = NORMAL) -> bool:
+    """True when messages at this verbosity are shown; guard expensive rendering with it."""
+    return logger.isEnabledFor(_LEVELS[verbosity])
+
+
+class ProgressReporter:
+    """One tqdm status line for a long run, refreshed every ``every`` items or ``interval`` seconds.
+
+    ``update`` only adds to counters until a refresh is due, and does nothing at
+    all when NORMAL output is off, so it can be called once per episode.
+    """
+
+    def __init__(self, total: int, desc: str = "Episodes", every: int = 1000, interval: float = 5.0, unit: str = "ep"):
+        self.every = every
+        self.interval = interval
+        self.enabled = enabled(NORMAL)
+        self._bar = tqdm(total=total, desc=desc, unit=unit, ncols=100, disable=not self.enabled)
+        self._pending = 0
+        self._stats = {}
+        self._last = time.monotonic()
+
+    def update(self, n: int = 1, **stats) -> None:
+        if not self.enabled:
+            return
+        self._pending += n
+        self._stats.update(stats)
+        if self._pending >= self.every or time.monotonic() - self._last >= self.interval:
+            self.refresh()
+
+    def refresh(self) -> None:
+        if not self.enabled:
+            return
+        if self._stats:
+            self._bar.set_postfix(self._stats, refresh=False)
+        self._bar.update(self._pending)
+        self._pending = 0
+        self._last = time.monotonic()
+
+    def close(self) -> None:
+        self.refresh()
+        self._bar.close()
+
+    def __enter__(self) -> "ProgressReporter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+configure(NORMAL)
@@ -0,0 +1,109 @@
+import hashlib
+from bisect import bisect_right
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from market_data import FIELDS
+
+# Balance edges for the default encoder; episodes restart at $50 and start at $100
+DEFAULT_BALANCE_EDGES = (60, 70, 80, 90, 95, 100, 105, 110, 120, 140)
+
+
+def _mix64(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, used to spread bin tuples uniformly over the state slots."""
+    x = values.astype(np.uint64, copy=True)
+    with np.errstate(over='ignore'):
+        x ^= x >> np.uint64(30)
+        x *= np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(27)
+        x *= np.uint64(0x94D049BB133111EB)
+        x ^= x >> np.uint64(31)
+    return x
+
+
+class StateEncoder:
+    """Discretizes bars into a bounded set of integer state ids.
+
+    Each indicator is cut into ``n_bins`` quantile or fixed-width bins, the bin
+    tuple of a bar is hashed into one of ``n_bar_slots`` slots and combined with
+    a balance bin, so ids are dense in ``[0, n_states)``. Bar slots are computed
+    once per dataset, which leaves a lookup and a bisect per get_state call.
+    """
+
+    def __init__(self, fields: Sequence[str] = FIELDS, n_bins: int = 8, method: str = "quantile",
+                 n_bar_slots: int = 1 << 16, balance_edges: Sequence[float] = DEFAULT_BALANCE_EDGES):
+        if method not in ("quantile", "fixed"):
+            raise ValueError(f"Unknown binning method: {method}")
+        self.fields = tuple(fields)
+        self.n_bins = n_bins
+        self.method = method
+        self.n_bar_slots = n_bar_slots
+        self.balance_edges = list(balance_edges)
+        self.n_balance_bins = len(self.balance_edges) + 1
+        self.edges: Optional[Dict[str, np.ndarray]] = None
+        self._slots_key = None
+        self._slots_key_of = None  # (edges, params) the key was computed from
+
+    def slots_key(self) -> tuple:
+        """Key of this encoder's bar slots in data.indexes: a hash of the fitted edges and binning parameters.
+
+        Encoders that would compute the same slots share one cache entry, and
+        refitting or restoring edges from a checkpoint gives a new key.
+        """
+        if self.edges is None:
+            raise ValueError("StateEncoder.fit must be called before encoding")
+        params = (self.fields, self.n_bins, self.method, self.n_bar_slots)
+        source = self._slots_key_of
+        if source is None or source[0] is not self.edges or source[1] != params:
+            digest = hashlib.blake2b(repr(params).encode(), digest_size=16)
+            for name in self.fields:
+                digest.update(np.ascontiguousarray(self.edges[name], dtype=np.float64).tobytes())
+            self._slots_key = ("state_slots", digest.hexdigest())
+            self._slots_key_of = (self.edges, params)
+        return self._slots_key
+
+    @property
+    def n_states(self) -> int:
+        return self.n_bar_slots * self.n_balance_bins
+
+    def fit(self, data) -> "StateEncoder":
+        """Compute the bin edges of every field from a MarketData (typically the training range)."""
+        self.edges = {}
+        for name in self.fields:
+            values = np.asarray(data.columns[name])
+            values = values[np.isfinite(values)]
+            if values.size == 0:
+                self.edges[name] = np.empty(0)
+            elif self.method == "quantile":
+                self.edges[name] = np.unique(np.quantile(values, np.linspace(0, 1, self.n_bins + 1)[1:-1]))
+            else:
+                self.edges[name] = np.linspace(values.min(), values.max(), self.n_bins + 1)[1:-1]
+        return self
+
+    def bar_slots(self, data) -> np.ndarray:
+        """Hashed bin tuple of every bar in ``data``, cached in data.indexes."""
+        key = self.slots_key()
+        slots = data.indexes.get(key)
+        if slots is None:
+            radix = np.uint64(self.n_bins + 1)  # +1 so NaN gets its own bin
+            codes = np.zeros(len(data), dtype=np.uint64)
+            with np.errstate(over='ignore'):
+                for name in self.fields:
+                    bins = np.searchsorted(self.edges[name], data.columns[name], side='right')
+                    codes = codes * radix + bins.astype(np.uint64)
+            slots = (_mix64(codes) % np.uint64(self.n_bar_slots)).astype(np.int64)
+            data.indexes[key] = slots
+        return slots
+
+    def balance_bin(self, balance: float) -> int:
+        return bisect_right(self.balance_edges, balance)
+
+    def encode(self, data, index: int, balance: float) -> int:
+        """State id of bar ``index`` at the given balance."""
+        return int(self.bar_slots(data)[index]) * self.n_balance_bins + bisect_right(self.balance_edges, balance)
+
+    def encode_many(self, data, indexes: np.ndarray, balances: np.ndarray) -> np.ndarray:
+        """Vectorized encode over arrays of bar indexes and balances."""
+        balance_bins = np.searchsorted(self.balance_edges, balances, side='right')
+        return self.bar_slots(data)[indexes] * self.n_balance_bins + balance_bins
@@ -0,0 +1,168 @@
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from backtest import ACTION_CODES, END_OF_DATA, BacktestResult, Policy, TradeRecord
+from market_data import MarketData, concat_market_data, iter_market_chunks
+from OrangeTraderV2 import GameState, TradeCalculator, TradeSettings
+from reporting import logger
+from trade_outcomes import NO_OUTCOME, scan_outcome
+
+
+class MarketWindow:
+    """Sliding window of bars over a chunked stream, addressed by global bar index.
+
+    Only the bars from the last release point onwards are kept, plus at most
+    one freshly read chunk, so memory stays at a couple of chunks no matter how
+    long the file is. ``data`` is a normal MarketData over the retained bars and
+    ``offset`` is the global index of its first row.
+    """
+
+    def __init__(self, chunks: Iterator[MarketData]):
+        self._chunks = iter(chunks)
+        self.data = concat_market_data([])
+        self.offset = 0
+        self.exhausted = False
+        self._release_to = 0
+
+    @classmethod
+    def from_csv(cls, file_name: str, chunk_size: int = 100_000) -> "MarketWindow":
+        return cls(iter_market_chunks(file_name, chunk_size))
+
+    @property
+    def end(self) -> int:
+        """One past the last global index currently loaded (the file length once exhausted)."""
+        return self.offset + len(self.data)
+
+    def local(self, index: int) -> int:
+        return index - self.offset
+
+    def release(self, index: int) -> None:
+        """Bars before ``index`` are no longer needed; they are dropped on the next chunk read."""
+        self._release_to = max(self._release_to, index)
+
+    def _pull(self) -> bool:
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self.exhausted = True
+            return False
+        drop = min(self._release_to, self.end) - self.offset
+        self.data = concat_market_data([self.data[drop:], chunk])
+        self.offset += drop
+        return True
+
+    def ensure(self, index: int) -> bool:
+        """Read ahead until global ``index`` is loaded; False if the stream ends before it."""
+        while index >= self.end:
+            if self.exhausted or not self._pull():
+                return False
+        return True
+
+    def resolve(self, start_index: int, trade_action: str, tp: float, sl: float) -> Tuple[str, int]:
+        """check_outcome for a trade opened at start_index, reading further chunks while it stays open.
+
+        Bars the scan has passed are released, so an open trade costs no more
+        memory than a closed one. Returns a global index.
+        """
+        position = start_index + 1
+        while self.ensure(position):
+            result, hit = scan_outcome(self.data.price, self.local(position) - 1, trade_action, tp, sl)
+            if result != NO_OUTCOME:
+                return result, self.offset + hit
+            position = self.end
+            self.release(position)
+        return NO_OUTCOME, self.end - 1
+
+
+def stream_forex_game(file_name: str, episode_num: int, agent, chunk_size: int = 100_000) -> int:
+    """forex_game from qlearning_shandis_6, reading the CSV in chunks instead of loading it.
+
+    ``agent.get_state`` receives the window's MarketData and a local index; a
+    BinnedQLearningAgent's encoder must already be fitted.
+    """
+    window = MarketWindow.from_csv(file_name, chunk_size)
+    balance = 100  # Starting balance
+    logger.debug("\nEpisode %d: Starting balance: $%s", episode_num + 1, balance)
+    logger.debug("Rules: TP = 2×ATR away. SL = 2×ATR away. $1 gained for hitting TP, $1 lost for hitting SL.")
+    i = 0
+
+    while window.ensure(i + 1):  # i < len(data) - 1
+        window.release(i)
+        atr = float(window.data.atr[window.local(i)])
+
+        if atr == 0:
+            logger.debug("\nWarning: ATR is 0 at time %s. Skipping this row.", window.data.times[window.local(i)])
+            i += 1
+            continue
+
+        state = agent.get_state(window.data, window.local(i), balance)
+        action = agent.choose_action(state)
+
+        if action in ("BUY", "SELL"):
+            buy_tp, buy_sl, sell_tp, sell_sl = TradeCalculator.calculate_trade_levels(
+                float(window.data.price[window.local(i)]), atr, 2
+            )
+            tp, sl = (buy_tp, buy_sl) if action == "BUY" else (sell_tp, sell_sl)
+            result, next_index = window.resolve(i, action, tp, sl)
+            reward = 1 if result == "TP" else -1 if result == "SL" else 0
+        else:
+            reward = 0
+            next_index = i + 1  # No change if PASS
+            window.ensure(next_index)
+
+        next_state = agent.get_state(window.data, window.local(next_index), balance + reward)
+        agent.update_q_value(state, action, reward, next_state, balance + reward <= 50)
+
+        balance += reward
+        if balance <= 50:
+            logger.debug("\nBalance dropped to $50. Restarting the game.")
+            return balance
+
+        agent.decay_exploration()
+        i = next_index
+
+    return balance
+
+
+def stream_backtest(file_name: str, policy: Policy, chunk_size: int = 100_000) -> BacktestResult:
+    """BacktestEngine.run over a chunked CSV; the policy gets (local index, window MarketData)."""
+    window = MarketWindow.from_csv(file_name, chunk_size)
+    state = GameState()
+    trades: List[TradeRecord] = []
+    reason = END_OF_DATA
+    i = 0
+    while window.ensure(i + 1):
+        window.release(i)
+        local = window.local(i)
+        atr = float(window.data.atr[local])
+        if atr == 0:
+            i += 1
+            continue
+
+        action, rrr_choice = policy(local, window.data)
+        trade_action = ACTION_CODES.get(action)
+        if trade_action is not None:
+            rrr_multiplier, win_amount = TradeSettings.rrr_multipliers[rrr_choice]
+            buy_tp, buy_sl, sell_tp, sell_sl = TradeCalculator.calculate_trade_levels(
+                float(window.data.price[local]), atr, rrr_multiplier
+            )
+            high_risk = bool(window.data.columns["VIX"][local] > 20)
+            tp, sl = (buy_tp, buy_sl) if trade_action == "BUY" else (sell_tp, sell_sl)
+            result, next_index = window.resolve(i, trade_action, tp, sl)
+            trade_result, reward = state.settle_trade(result, win_amount, rrr_multiplier, high_risk)
+            trades.append(TradeRecord(i, next_index, trade_action, rrr_choice, result, trade_result, reward, state.balance))
+            i = next_index
+        else:
+            i += 1
+
+        game_over, message = state.check_game_over(i)
+        if game_over:
+            reason = message
+            break
+
+    max_drawdown = 0.0
+    if trades:
+        path = np.array([TradeSettings.starting_balance] + [trade.balance for trade in trades], dtype=np.float64)
+        peaks = np.maximum.accumulate(path)
+        max_drawdown = float(np.max((peaks - path) / np.where(peaks > 0, peaks, 1)))
+    return BacktestResult(state.balance, state.score, max_drawdown, reason, i, trades)
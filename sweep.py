@@ -0,0 +1,331 @@
+"""Hyperparameter search for BinnedQLearningAgent over a process pool.
+
+    python sweep.py --file audusd.csv --search random --trials 32 --episodes 5000 --output sweep.csv
+    python sweep.py --file audusd.csv --search halving --trials 27 --min-episodes 500 --episodes 13500
+
+Agent parameters (learning_rate, discount_factor, exploration_rate,
+exploration_decay) and StateEncoder parameters (n_bins, method, n_bar_slots)
+can all be searched. A trial is scored by the mean final balance of its last
+``window`` episodes and stopped early once that rolling mean falls below
+``threshold``. Successive halving checkpoints every trial between rungs and
+resumes the survivors instead of retraining them.
+"""
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+from multiprocessing import Pool
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from checkpoint import load_checkpoint, restore, snapshot, write_checkpoint
+from exploration import ExplorationStream, spawn_streams
+from market_data import attach_shared_market_data, load_market_data, share_market_data
+from qlearning_shandis_6 import BinnedQLearningAgent
+from reporting import logger
+from state_encoding import StateEncoder
+from vectorized_training import RESTART_BALANCE, VectorizedForexGame
+
+ACTIONS = ["BUY", "SELL", "PASS"]
+AGENT_PARAMS = ("learning_rate", "discount_factor", "exploration_rate", "exploration_decay")
+ENCODER_PARAMS = ("n_bins", "method", "n_bar_slots")
+
+# Per-process state set up once by the pool initializer
+_worker: Dict = {}
+
+
+@dataclass(frozen=True)
+class Uniform:
+    low: float
+    high: float
+
+    def sample(self, rng: np.random.Generator) -> float:
+        return float(rng.uniform(self.low, self.high))
+
+
+@dataclass(frozen=True)
+class LogUniform:
+    low: float
+    high: float
+
+    def sample(self, rng: np.random.Generator) -> float:
+        return float(np.exp(rng.uniform(np.log(self.low), np.log(self.high))))
+
+
+@dataclass(frozen=True)
+class OneMinusLogUniform:
+    """Samples 1 - x with x log-uniform in [1 - high, 1 - low]; suits decay rates close to 1."""
+    low: float
+    high: float
+
+    def sample(self, rng: np.random.Generator) -> float:
+        return 1.0 - LogUniform(1.0 - self.high, 1.0 - self.low).sample(rng)
+
+
+# A list is a set of choices (the grid for grid search), anything with .sample(rng) is a distribution
+DEFAULT_SPACE: Dict[str, Any] = {
+    "learning_rate": LogUniform(0.01, 0.5),
+    "discount_factor": Uniform(0.5, 0.99),
+    "exploration_decay": OneMinusLogUniform(0.99, 0.99999),
+    "n_bins": [4, 6, 8, 12],
+}
+DEFAULT_GRID: Dict[str, Any] = {
+    "learning_rate": [0.05, 0.1, 0.2],
+    "discount_factor": [0.8, 0.9, 0.95],
+    "n_bins": [6, 8],
+}
+
+
+@dataclass(frozen=True)
+class EarlyStopping:
+    """Stop a trial whose rolling mean episode balance is below ``threshold``.
+
+    Checked every ``check_every`` episodes once ``min_episodes`` have run.
+    """
+    window: int = 500
+    min_episodes: int = 1000
+    threshold: float = RESTART_BALANCE + 10
+    check_every: int = 250
+
+    def should_stop(self, balances: np.ndarray) -> bool:
+        return len(balances) >= self.min_episodes and rolling_score(balances, self.window) < self.threshold
+
+
+@dataclass
+class TrialResult:
+    trial: int
+    params: Dict[str, Any]
+    episodes: int
+    score: float  # Mean final balance over the last ``window`` episodes
+    mean_balance: float
+    seconds: float
+    stopped: str = ""  # "early", "rung <k>" when successive halving dropped it, "" when it ran to completion
+    rung_scores: List[float] = field(default_factory=list)
+
+
+def rolling_score(balances: np.ndarray, window: int) -> float:
+    return float(np.mean(balances[-window:])) if len(balances) else 0.0
+
+
+def grid_trials(space: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Every combination of the listed values; scalars are held fixed."""
+    names = list(space)
+    values = [space[name] if isinstance(space[name], list) else [space[name]] for name in names]
+    for name, value in space.items():
+        if hasattr(value, "sample"):
+            raise ValueError(f"Grid search needs a list of values for {name}, got {value!r}")
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+
+def random_trials(space: Dict[str, Any], n_trials: int, seed: Optional[int] = None) -> List[Dict[str, Any]]:
+    """n_trials independent draws; lists are sampled uniformly, distributions through .sample."""
+    rng = np.random.default_rng(seed)
+    trials = []
+    for _ in range(n_trials):
+        params = {}
+        for name, value in space.items():
+            if hasattr(value, "sample"):
+                params[name] = value.sample(rng)
+            elif isinstance(value, list):
+                params[name] = value[rng.integers(len(value))]
+            else:
+                params[name] = value
+        trials.append({name: value.item() if isinstance(value, np.generic) else value for name, value in params.items()})
+    return trials
+
+
+def split_params(params: Dict[str, Any]):
+    """(agent kwargs, encoder kwargs) of one trial."""
+    unknown = set(params) - set(AGENT_PARAMS) - set(ENCODER_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown hyperparameters: {sorted(unknown)}")
+    agent_kwargs = {name: value for name, value in params.items() if name in AGENT_PARAMS}
+    encoder_kwargs = {name: value for name, value in params.items() if name in ENCODER_PARAMS}
+    return agent_kwargs, encoder_kwargs
+
+
+def _init_worker(data_spec: Dict) -> None:
+    shm, data = attach_shared_market_data(data_spec)
+    _worker["handle"] = shm
+    _worker["data"] = data
+
+
+def build_agent(data, params: Dict[str, Any]) -> BinnedQLearningAgent:
+    """A fresh agent for one trial, with its StateEncoder fitted on ``data``."""
+    agent_kwargs, encoder_kwargs = split_params(params)
+    return BinnedQLearningAgent(ACTIONS, StateEncoder(**encoder_kwargs).fit(data), **agent_kwargs)
+
+
+def _run_trial(task: Dict) -> TrialResult:
+    """Train one configuration up to task["episodes"], resuming from its checkpoint when there is one.
+
+    The checkpoint records the trial's params, and one written for other params
+    (e.g. left in --checkpoint-dir by an earlier sweep) is retrained from scratch.
+    """
+    data = _worker["data"]
+    stopping: EarlyStopping = task["stopping"]
+    agent = build_agent(data, task["params"])
+    agent.exploration = task["exploration"]
+    game = VectorizedForexGame(data, agent, task["n_envs"])
+    path = task["checkpoint"]
+    episode = 0
+    balances = np.zeros(0, dtype=np.int64)
+    params = json.dumps(task["params"], sort_keys=True)
+    if path is not None and os.path.exists(path):
+        checkpoint = load_checkpoint(path)
+        if str(checkpoint.get("trial_params")) == params:
+            episode = restore(agent, checkpoint, game.rng)
+            balances = checkpoint["balances"]
+        else:
+            logger.warning("Ignoring %s: it was written for other parameters", path)
+    begin = time.perf_counter()
+    stopped = ""
+    while episode < task["episodes"]:
+        this_round = min(stopping.check_every, task["episodes"] - episode)
+        balances = np.concatenate([balances, game.run(this_round)])
+        episode += this_round
+        if stopping.should_stop(balances):
+            stopped = "early"
+            break
+    if path is not None:
+        arrays = snapshot(agent, episode, balances, game.rng)
+        arrays["trial_params"] = np.array(params)
+        write_checkpoint(path, arrays, compress=False)
+    return TrialResult(task["trial"], task["params"], episode, rolling_score(balances, stopping.window),
+                       float(balances.mean()) if len(balances) else 0.0, time.perf_counter() - begin, stopped)
+
+
+class Sweep:
+    """Runs trials over one shared copy of the data in a process pool."""
+
+    def __init__(self, data, n_workers: Optional[int] = None, n_envs: int = 64, seed: Optional[int] = 0,
+                 stopping: EarlyStopping = EarlyStopping(), checkpoint_dir: Optional[str] = None):
+        self.data = data
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.n_envs = n_envs
+        self.seed = seed  # Trial i explores with the i-th stream spawned from this seed
+        self.stopping = stopping
+        self.checkpoint_dir = checkpoint_dir
+
+    def _task(self, trial: int, params: Dict[str, Any], episodes: int, stream: ExplorationStream,
+              checkpoint_dir: Optional[str]) -> Dict:
+        return {
+            "trial": trial,
+            "params": params,
+            "episodes": episodes,
+            "n_envs": self.n_envs,
+            "exploration": stream,
+            "stopping": self.stopping,
+            "checkpoint": os.path.join(checkpoint_dir, f"trial_{trial:04d}.npz") if checkpoint_dir else None,
+        }
+
+    def _map(self, tasks: List[Dict]) -> Iterable[TrialResult]:
+        shm, spec = share_market_data(self.data)
+        try:
+            with Pool(min(self.n_workers, len(tasks)), initializer=_init_worker, initargs=(spec,)) as pool:
+                for result in pool.imap_unordered(_run_trial, tasks):
+                    logger.info("Trial %d: score %.2f after %d episodes%s %s", result.trial, result.score,
+                                result.episodes, " (stopped early)" if result.stopped else "", result.params)
+                    yield result
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def run(self, trials: List[Dict[str, Any]], episodes: int) -> List[TrialResult]:
+        """Train every configuration for up to ``episodes`` episodes (grid or random search)."""
+        streams = spawn_streams(len(ACTIONS), self.seed, len(trials))
+        tasks = [self._task(i, params, episodes, streams[i], self.checkpoint_dir) for i, params in enumerate(trials)]
+        return sorted(self._map(tasks), key=lambda result: result.trial)
+
+    def successive_halving(self, trials: List[Dict[str, Any]], min_episodes: int, max_episodes: int,
+                           eta: int = 3) -> List[TrialResult]:
+        """Train all trials for min_episodes, keep the best 1/eta, multiply the budget by eta, and repeat.
+
+        Survivors continue from their checkpoint, so a trial that reaches the last
+        rung has cost max_episodes in total, not the sum of all rung budgets.
+        """
+        with tempfile.TemporaryDirectory(prefix="sweep-") as scratch:
+            checkpoint_dir = self.checkpoint_dir or scratch
+            results: Dict[int, TrialResult] = {}
+            streams = spawn_streams(len(ACTIONS), self.seed, len(trials))  # Survivors resume theirs from the checkpoint
+            survivors = list(range(len(trials)))
+            budget, rung = min_episodes, 0
+            while survivors:
+                tasks = [self._task(i, trials[i], budget, streams[i], checkpoint_dir) for i in survivors]
+                for result in self._map(tasks):
+                    previous = results.get(result.trial)
+                    result.rung_scores = (previous.rung_scores if previous else []) + [result.score]
+                    if previous:
+                        result.seconds += previous.seconds
+                    results[result.trial] = result
+                running = [i for i in survivors if not results[i].stopped]
+                if budget >= max_episodes or len(running) <= 1:
+                    break
+                running.sort(key=lambda i: results[i].score, reverse=True)
+                survivors = running[:max(1, math.ceil(len(running) / eta))]
+                for i in running[len(survivors):]:
+                    results[i].stopped = f"rung {rung}"
+                budget, rung = min(budget * eta, max_episodes), rung + 1
+        return [results[i] for i in sorted(results)]
+
+
+RESULT_COLUMNS = ("trial", "score", "mean_balance", "episodes", "seconds", "stopped")
+
+
+def write_results(path: str, results: List[TrialResult]) -> None:
+    """One CSV row per trial, best score first, with a column per searched parameter."""
+    names = sorted({name for result in results for name in result.params})
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(RESULT_COLUMNS + tuple(names))
+        for result in sorted(results, key=lambda result: result.score, reverse=True):
+            writer.writerow([result.trial, f"{result.score:.3f}", f"{result.mean_balance:.3f}", result.episodes,
+                             f"{result.seconds:.1f}", result.stopped] + [result.params.get(name, "") for name in names])
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", default="audusd-h1-bid-2003-08-03T21-2024-05-27.csv")
+    parser.add_argument("--search", choices=("grid", "random", "halving"), default="random")
+    parser.add_argument("--space", help="JSON file mapping parameter names to lists of values (default: built-in space)")
+    parser.add_argument("--trials", type=int, default=32, help="configurations drawn for random search and halving")
+    parser.add_argument("--episodes", type=int, default=5000, help="episodes per trial (the last rung for halving)")
+    parser.add_argument("--min-episodes", type=int, default=500, help="first rung budget for halving")
+    parser.add_argument("--eta", type=int, default=3)
+    parser.add_argument("--window", type=int, default=EarlyStopping.window, help="episodes in the rolling score")
+    parser.add_argument("--stop-below", type=float, default=EarlyStopping.threshold,
+                        help="stop trials whose rolling balance falls below this")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="sweep_results.csv")
+    args = parser.parse_args(argv)
+
+    space = DEFAULT_GRID if args.search == "grid" else DEFAULT_SPACE
+    if args.space:
+        with open(args.space) as file:
+            space = json.load(file)
+    if args.search == "grid":
+        trials = grid_trials(space)
+    else:
+        trials = random_trials(space, args.trials, args.seed)
+    stopping = EarlyStopping(window=args.window, min_episodes=min(EarlyStopping.min_episodes, args.episodes),
+                             threshold=args.stop_below)
+    sweep = Sweep(load_market_data(args.file), args.workers, seed=args.seed, stopping=stopping)
+    if args.search == "halving":
+        results = sweep.successive_halving(trials, args.min_episodes, args.episodes, args.eta)
+    else:
+        results = sweep.run(trials, args.episodes)
+    write_results(args.output, results)
+    best = max(results, key=lambda result: result.score)
+    logger.info("Best trial %d: score %.2f %s", best.trial, best.score, best.params)
+    logger.info("Results written to %s", args.output)
+
+
+if __name__ == "__main__":
+    main()
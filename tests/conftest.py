@@ -0,0 +1,24 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from market_data import FIELDS, MarketData  # noqa: E402
+
+
+def make_market_data(n_bars: int = 2000, seed: int = 0) -> MarketData:
+    """Hourly random-walk bars with positive ATR and random indicator columns."""
+    rng = np.random.default_rng(seed)
+    times = (np.datetime64("2020-01-01T00:00:00") + np.arange(n_bars) * np.timedelta64(1, "h")).astype(str)
+    columns = {name: rng.standard_normal(n_bars) for name in FIELDS}
+    columns["Price"] = 1.0 + np.cumsum(rng.standard_normal(n_bars)) * 0.001
+    columns["ATR"] = 0.001 + rng.random(n_bars) * 0.001
+    return MarketData(np.char.replace(times, "T", " "), columns)
+
+
+@pytest.fixture
+def market_data() -> MarketData:
+    return make_market_data()
@@ -0,0 +1,19 @@
+from backtest import END_OF_DATA, BacktestEngine
+from OrangeTraderV2 import TradeSettings
+from conftest import make_market_data
+
+
+def always_pass(index, data):
+    return "P", "1:1"
+
+
+def test_raise_check_counts_rows_from_the_start_index():
+    data = make_market_data(n_bars=TradeSettings.batch_size + 3000)
+    engine = BacktestEngine(data)
+    from_start = engine.run(always_pass)
+    assert from_start.termination_reason != END_OF_DATA
+    assert from_start.last_index == TradeSettings.batch_size
+
+    late = engine.run(always_pass, 4000)
+    assert late.termination_reason == END_OF_DATA  # Fewer than batch_size rows left after the start
+    assert engine.run(always_pass, 1000).last_index == 1000 + TradeSettings.batch_size
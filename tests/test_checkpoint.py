@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from checkpoint import load_checkpoint, train_resumable
+from qlearning_shandis_6 import BinnedQLearningAgent
+from replay_buffer import ReplayBuffer
+from state_encoding import StateEncoder
+
+ACTIONS = ["BUY", "SELL", "PASS"]
+
+
+@pytest.mark.parametrize("replay", [False, True])
+@pytest.mark.parametrize("agent_seed", [None, 7])
+def test_resumed_run_matches_an_uninterrupted_one(market_data, tmp_path, replay, agent_seed):
+    encoder = StateEncoder().fit(market_data)
+
+    def make_agent():
+        buffer = ReplayBuffer(500, prioritized=True, seed=3) if replay else None
+        return BinnedQLearningAgent(ACTIONS, encoder, replay=buffer, seed=agent_seed)
+
+    def train(agent, n_episodes, path, resume=False):
+        return train_resumable(market_data, agent, n_episodes, str(path), checkpoint_every=20, n_envs=8, seed=5,
+                               resume=resume, compress=False)
+
+    uninterrupted = make_agent()
+    expected = train(uninterrupted, 60, tmp_path / "full.npz")
+    train(make_agent(), 40, tmp_path / "run.npz")
+    resumed = make_agent()
+    balances = train(resumed, 60, tmp_path / "run.npz", resume=True)
+
+    np.testing.assert_array_equal(balances, expected)
+    np.testing.assert_array_equal(resumed.q_table.values, uninterrupted.q_table.values)
+    assert resumed.exploration_rate == uninterrupted.exploration_rate
+    assert load_checkpoint(str(tmp_path / "run.npz"))["meta"]["episode"] == 60
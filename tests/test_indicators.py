@@ -0,0 +1,37 @@
+import numpy as np
+
+from indicators import OHLCV_COLUMNS, IndicatorPipeline, read_ohlcv_csv
+from market_data import FIELDS
+
+
+def _bars(n_bars, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 1.0 + np.cumsum(rng.standard_normal(n_bars)) * 0.001
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = rng.random((2, n_bars)) * 0.002
+    times = (np.datetime64("2020-01-01T00:00:00") + np.arange(n_bars) * np.timedelta64(1, "h")).astype(str)
+    return times, [open_, np.maximum(open_, close) + spread[0], np.minimum(open_, close) - spread[1], close,
+                   rng.random(n_bars) * 1000]
+
+
+def test_incremental_updates_match_a_full_recompute():
+    times, bars = _bars(2000)
+    full = IndicatorPipeline().compute(times, *bars)
+    pipeline = IndicatorPipeline()
+    bounds = [0, 1, 700, 1333, 2000]  # Uneven chunks, including a single bar
+    parts = [pipeline.update(times[a:b], *(values[a:b] for values in bars)) for a, b in zip(bounds, bounds[1:])]
+    assert pipeline.n_bars == 2000
+    for name in FIELDS:
+        incremental = np.concatenate([part.columns[name] for part in parts])
+        np.testing.assert_allclose(incremental, full.columns[name], rtol=1e-12, atol=1e-12, err_msg=name)
+
+
+def test_ohlcv_reader_skips_blank_lines(tmp_path):
+    times, bars = _bars(5)
+    rows = ["timestamp," + ",".join(OHLCV_COLUMNS)]
+    rows += [",".join([t.replace("T", " ")] + [repr(float(v[i])) for v in bars]) for i, t in enumerate(times)]
+    path = tmp_path / "bars.csv"
+    path.write_text("\n".join(rows[:3] + [""] + rows[3:]) + "\n\n")
+    read_times, columns = read_ohlcv_csv(str(path))
+    assert len(read_times) == 5
+    np.testing.assert_array_equal(columns["close"], bars[3])
@@ -0,0 +1,102 @@
+import csv
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from market_data import (COLUMN_MAP, FIELDS, TIME_COLUMN, MarketData, TimeIndex, append_npy, load_market_data,
+                         parse_market_csv, refresh_market_data)
+from trade_outcomes import FirstPassageIndex, OutcomeTable, first_passage_index, outcome_table
+from conftest import make_market_data
+
+
+def _write_rows(path, data, start, stop, mode="w"):
+    with open(path, mode, newline="") as file:
+        writer = csv.writer(file)
+        if mode == "w":
+            writer.writerow([TIME_COLUMN] + [COLUMN_MAP[name] for name in FIELDS])
+        columns = [data.columns[name][start:stop].tolist() for name in FIELDS]
+        writer.writerows(zip(data.times[start:stop].tolist(), *columns))
+
+
+def _assert_same_outcomes(table, expected):
+    np.testing.assert_array_equal(table.bar_codes, expected.bar_codes)
+    np.testing.assert_array_equal(table.bar_indexes, expected.bar_indexes)
+
+
+def test_append_npy_grows_the_file_in_place(tmp_path):
+    path = str(tmp_path / "column.npy")
+    np.save(path, np.arange(5.0))
+    assert append_npy(path, np.arange(5.0, 8.0))
+    np.testing.assert_array_equal(np.load(path), np.arange(8.0))
+    assert not append_npy(path, np.arange(3))  # Wrong dtype leaves the file alone
+    np.testing.assert_array_equal(np.load(path), np.arange(8.0))
+
+
+def test_refreshed_csv_matches_a_cold_load(tmp_path):
+    source = make_market_data(n_bars=3000)
+    path = str(tmp_path / "bars.csv")
+    _write_rows(path, source, 0, 1500)
+    data = load_market_data(path)
+    table = outcome_table(data)
+    first_passage_index(data)
+
+    _write_rows(path, source, 1500, 3000, mode="a")
+    refreshed = refresh_market_data(data, path)
+    assert refreshed.cache_prefixes.get(data.cache_key) == 1500  # Appended to the cache, not rebuilt
+
+    cold = parse_market_csv(path)
+    np.testing.assert_array_equal(refreshed.times, cold.times)
+    for name in FIELDS:
+        np.testing.assert_array_equal(refreshed.columns[name], cold.columns[name])
+    expected = OutcomeTable.build(cold.price, cold.atr, table.rrr_multipliers, table.sl_multiplier)
+    _assert_same_outcomes(refreshed.indexes[("outcomes", table.rrr_multipliers, table.sl_multiplier)], expected)
+    _assert_same_outcomes(outcome_table(load_market_data(path)), expected)
+    assert first_passage_index(refreshed).first_hit(0, np.inf, -np.inf) == len(cold)
+
+
+@pytest.mark.parametrize("n_old", [1, 1000, 1024, 1500])
+def test_extended_outcome_tables_match_a_fresh_build(n_old):
+    data = make_market_data(n_bars=2000)
+    old = data[:n_old]
+    index = FirstPassageIndex(old.price).extend(data)
+    fresh_index = FirstPassageIndex(data.price)
+    starts = np.arange(0, len(data), 37)
+    for start in starts.tolist():
+        upper, lower = data.price[start] + 0.01, data.price[start] - 0.01
+        assert index.first_hit(start, upper, lower) == fresh_index.first_hit(start, upper, lower)
+
+    table = OutcomeTable.build(old.price, old.atr).extend(data)
+    _assert_same_outcomes(table, OutcomeTable.build(data.price, data.atr))
+
+
+def test_time_index_boundaries(market_data):
+    # Bars are hourly from 2020-01-01 00:00
+    index = market_data.time_index
+    assert index.at_or_after("2020-01-01 05:00:00") == 5
+    assert index.after("2020-01-01 05:00:00") == 6
+    assert index.at_or_after("2020-01-01 05:30:00") == index.after("2020-01-01 05:30:00") == 6
+    assert index.at_or_after("2019-12-31") == index.after("2019-12-31") == 0
+    assert index.at_or_after("2030-01-01") == index.after(market_data.times[-1]) == len(market_data)
+    assert index.at_or_after(datetime(2020, 1, 1, 5)) == index.at_or_after(np.datetime64("2020-01-01T05")) == 5
+    assert index.at_or_after(int(market_data.epoch[5])) == 5
+
+
+def test_bar_range_boundaries(market_data):
+    assert market_data.bar_range() == (0, len(market_data))
+    assert market_data.bar_range("2020-01-01 05:00:00", "2020-01-01 08:00:00") == (5, 8)  # End is exclusive
+    assert market_data.bar_range("2020-01-01 05:00:00", "2020-01-01 05:00:00") == (5, 5)
+    assert market_data.bar_range("2020-01-01 08:00:00", "2020-01-01 05:00:00") == (8, 8)
+    assert len(market_data.between("2030-01-01")) == 0
+    part = market_data.between("2020-01-01 05:00:00", "2020-01-01 08:00:00")
+    np.testing.assert_array_equal(part.times, market_data.times[5:8])
+    assert part.bar_at("2020-01-01 06:00:00") == 1  # The slice's own row numbers
+
+
+def test_time_index_extend_matches_build_and_rejects_unsorted_times(market_data):
+    head = market_data[:500]
+    extended = TimeIndex.build(head).extend(market_data)
+    np.testing.assert_array_equal(extended.epoch, TimeIndex.build(market_data).epoch)
+    shuffled = MarketData(market_data.times[::-1].copy(), market_data.columns)
+    with pytest.raises(ValueError):
+        TimeIndex.build(shuffled)
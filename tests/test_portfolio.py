@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from market_data import MarketData
+from OrangeTraderV2 import TradeSettings
+from portfolio import BUY, PASS, Portfolio, PortfolioSimulator, signal_policy
+from trade_outcomes import outcome_table
+from conftest import make_market_data
+
+MULTIPLIERS = [multiplier for multiplier, _ in TradeSettings.rrr_multipliers.values()]
+
+
+def _with_gaps(data, keep):
+    return MarketData(data.times[keep], {name: values[keep] for name, values in data.columns.items()})
+
+
+@pytest.fixture
+def instruments():
+    full = make_market_data(n_bars=1500, seed=1)
+    gappy = make_market_data(n_bars=1500, seed=2)
+    keep = np.arange(1500) % 3 != 1  # Every third bar missing
+    return {"full": full, "gappy": _with_gaps(gappy, keep)}
+
+
+def _table(data):
+    return outcome_table(data, MULTIPLIERS, TradeSettings.default_sl_multiplier)
+
+
+def test_inner_alignment_keeps_shared_bars_and_moves_exits_to_the_next_shared_bar(instruments):
+    portfolio = Portfolio(instruments, how="inner")
+    np.testing.assert_array_equal(portfolio.times, instruments["gappy"].times)
+    assert portfolio.present.all()
+    for j, data in enumerate(instruments.values()):
+        rows = np.searchsorted(data.times, portfolio.times)
+        table = _table(data)
+        np.testing.assert_array_equal(portfolio.prices[:, j], data.price[rows])
+        np.testing.assert_array_equal(portfolio.codes[:, j], table.bar_codes[rows])
+        exit_times = data.times[table.bar_indexes[rows]]
+        aligned_exits = portfolio.exits[:, j]
+        resolved = portfolio.codes[:, j] > 0
+        # The first shared bar at or after the original exit bar
+        assert (portfolio.times[aligned_exits][resolved] >= exit_times[resolved]).all()
+        before = np.maximum(aligned_exits - 1, 0)
+        assert ((aligned_exits == 0) | (portfolio.times[before] < exit_times))[resolved].all()
+
+
+def test_outer_alignment_forward_fills_gaps_and_never_trades_them(instruments):
+    portfolio = Portfolio(instruments, how="outer")
+    gappy = instruments["gappy"]
+    np.testing.assert_array_equal(portfolio.times, instruments["full"].times)
+    missing = ~portfolio.present[:, 1]
+    assert missing.sum() == len(portfolio) - len(gappy)
+    np.testing.assert_array_equal(portfolio.prices[missing, 1], portfolio.prices[np.flatnonzero(missing) - 1, 1])
+    np.testing.assert_array_equal(portfolio.codes[missing, 1], 0)
+
+    actions = np.full((len(portfolio), 2), PASS)
+    actions[:, 1] = BUY
+    result = PortfolioSimulator(portfolio).run(signal_policy(actions))
+    assert result.n_trades and portfolio.present[result.trades.entry, 1].all()
+
+
+def test_a_single_instrument_settles_like_its_outcome_table(instruments):
+    data = instruments["full"]
+    portfolio = Portfolio({"full": data})
+    table = _table(data)
+    actions = np.full((len(portfolio), 1), BUY)
+    result = PortfolioSimulator(portfolio).run(signal_policy(actions))
+    trades = result.trades
+    np.testing.assert_array_equal(trades.exit, table.bar_indexes[trades.entry, 0, 0])
+    np.testing.assert_array_equal(trades.result, table.bar_codes[trades.entry, 0, 0])
+    # One position at a time: each trade opens on the bar the previous one settled
+    assert (trades.entry[1:] >= trades.exit[:-1]).all()
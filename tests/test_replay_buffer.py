@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from qlearning_shandis_6 import BinnedQLearningAgent, forex_game
+from replay_buffer import ReplayBuffer, replay_minibatch
+from state_encoding import StateEncoder
+
+ACTIONS = ["BUY", "SELL", "PASS"]
+
+
+@pytest.mark.parametrize("prioritized", [False, True])
+def test_replay_never_overshoots_the_target_of_a_single_transition(prioritized):
+    agent = BinnedQLearningAgent(ACTIONS, StateEncoder(n_bar_slots=4), learning_rate=0.5)
+    buffer = ReplayBuffer(16, prioritized=prioritized, seed=0)
+    buffer.add(3, 0, 1.0, 5, done=True)  # Terminal, so the TD target is exactly the reward
+    previous = 0.0
+    for _ in range(20):
+        replay_minibatch(agent, buffer, batch_size=32)
+        q = agent.q_table.values[3, 0]
+        assert previous <= q <= 1.0
+        previous = q
+    assert q == pytest.approx(1.0, abs=1e-5)
+
+
+def test_scalar_game_stores_the_restart_as_terminal(market_data):
+    market_data.columns["Price"][:] = 2.0 - 0.001 * np.arange(len(market_data))  # Every BUY hits its SL
+    agent = BinnedQLearningAgent(ACTIONS, StateEncoder().fit(market_data), exploration_rate=0.0,
+                                 replay=ReplayBuffer(len(market_data), seed=0))
+    agent.q_table.values[:, 0] = 1000.0  # Always BUY
+    assert forex_game(market_data, 0, agent) == 50
+    dones = agent.replay.dones[:len(agent.replay)]
+    assert len(dones) == 50 and dones[-1] and not dones[:-1].any()
@@ -0,0 +1,38 @@
+import numpy as np
+
+import sweep
+from exploration import ExplorationStream
+from sweep import EarlyStopping
+
+
+def _task(trial, params, episodes=20):
+    return {"trial": trial, "params": params, "episodes": episodes, "n_envs": 4,
+            "exploration": ExplorationStream(len(sweep.ACTIONS), trial), "stopping": EarlyStopping(min_episodes=10 ** 9), "checkpoint": None}
+
+
+def test_trials_with_different_encoders_get_their_own_state_ids(market_data):
+    # Like _run_trial in a worker: one data object, a new encoder per trial, the old one dropped
+    indexes = np.arange(200)
+    balances = np.full(len(indexes), 100.0)
+    state_ids = []
+    for n_bins in (4, 6, 8, 12):
+        encoder = sweep.build_agent(market_data, {"n_bins": n_bins}).encoder
+        state_ids.append(tuple(encoder.encode_many(market_data, indexes, balances)))
+    assert len(set(state_ids)) == len(state_ids)
+
+
+def test_trials_can_search_the_slot_count(market_data, monkeypatch):
+    monkeypatch.setitem(sweep._worker, "data", market_data)
+    for trial, n_bar_slots in enumerate((1 << 16, 1 << 8)):
+        assert sweep._run_trial(_task(trial, {"n_bar_slots": n_bar_slots})).episodes == 20
+
+
+def test_trials_only_resume_checkpoints_of_their_own_params(market_data, monkeypatch, tmp_path):
+    monkeypatch.setitem(sweep._worker, "data", market_data)
+    path = str(tmp_path / "trial_0000.npz")
+    sweep._run_trial(dict(_task(0, {"learning_rate": 0.1}), checkpoint=path))
+    assert sweep._run_trial(dict(_task(0, {"learning_rate": 0.1}, episodes=30), checkpoint=path)).episodes == 30
+    assert len(np.load(path)["balances"]) == 30
+    # Another configuration left the file behind: train from scratch instead of continuing its 30 episodes
+    assert sweep._run_trial(dict(_task(0, {"learning_rate": 0.2}), checkpoint=path)).episodes == 20
+    assert len(np.load(path)["balances"]) == 20
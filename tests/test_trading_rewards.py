@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from OrangeTraderV2 import GameState, TradeSettings, TradingRewardCalculator
+from trade_outcomes import RESULT_NAMES
+
+RRR_CHOICES = list(TradeSettings.rrr_multipliers)
+STATE_ATTRIBUTES = ("row_counter", "balance", "previous_balance", "risk_to_reward", "streaks", "drawdown",
+                    "weekly_start_balance", "monthly_start_balance", "yearly_start_balance")
+
+
+def _play(rng, n_trades):
+    """Scalar path: settle random trades through GameState and record what calculate_rewards needs."""
+    state = GameState()
+    inputs = {name: [] for name in ("trade_results", "balances", "risk_to_rewards", "streaks", "high_risk_setups",
+                                    "drawdowns")}
+    rewards = []
+    for _ in range(n_trades):
+        result = RESULT_NAMES[rng.integers(len(RESULT_NAMES))]  # TP, SL or no outcome at the end of the data
+        rrr_multiplier, win_amount = TradeSettings.rrr_multipliers[RRR_CHOICES[rng.integers(len(RRR_CHOICES))]]
+        high_risk_setup = bool(rng.random() < 0.3)
+        trade_result, reward = state.settle_trade(result, win_amount, rrr_multiplier, high_risk_setup)
+        rewards.append(reward)
+        for name, value in zip(inputs, (trade_result, state.balance, rrr_multiplier / 2, state.consecutive_wins,
+                                        high_risk_setup, state.drawdown)):
+            inputs[name].append(value)
+    return state.reward_calculator, inputs, rewards
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_batch_rewards_match_the_scalar_path(seed):
+    rng = np.random.default_rng(seed)
+    scalar, inputs, rewards = _play(rng, int(rng.integers(1, 1200)))
+    batch = TradingRewardCalculator(TradeSettings.starting_balance)
+    split = int(rng.integers(0, len(rewards) + 1))  # Batches continue from the calculator's state
+    got = np.concatenate([batch.calculate_rewards(**{name: values[:split] for name, values in inputs.items()}),
+                          batch.calculate_rewards(**{name: values[split:] for name, values in inputs.items()})])
+    np.testing.assert_array_equal(got, rewards)
+    for name in STATE_ATTRIBUTES:
+        assert getattr(batch, name) == pytest.approx(getattr(scalar, name)), name
+
+
+def test_random_trades_cover_every_result_and_rrr_slot():
+    _, inputs, _ = _play(np.random.default_rng(0), 300)
+    trade_results = np.array(inputs["trade_results"])
+    assert (trade_results > 0).any() and (trade_results < 0).any() and (trade_results == 0).any()
+    assert set(inputs["risk_to_rewards"]) == {multiplier / 2 for multiplier, _ in TradeSettings.rrr_multipliers.values()}
@@ -0,0 +1,36 @@
+import numpy as np
+
+from qlearning_shandis_6 import BinnedQLearningAgent, forex_game
+from state_encoding import StateEncoder
+from vectorized_training import VectorizedForexGame
+
+ACTIONS = ["BUY", "SELL", "PASS"]
+
+
+def test_duplicated_lanes_keep_q_within_the_return_bound(market_data):
+    # Greedy lanes that all start at row 0 hit the same (state, action) pairs on every step
+    agent = BinnedQLearningAgent(ACTIONS, StateEncoder(n_bins=2, n_bar_slots=64).fit(market_data), learning_rate=0.5,
+                                 discount_factor=0.9, exploration_rate=0.0)
+    VectorizedForexGame(market_data[:300], agent, n_envs=64, seed=0).run(256)
+    bound = 1 / (1 - agent.discount_factor)  # |reward| <= 1
+    assert np.abs(agent.q_table.values).max() <= bound + 1e-9
+
+
+def test_duplicate_updates_average_instead_of_summing():
+    agent = BinnedQLearningAgent(ACTIONS, StateEncoder(n_bar_slots=4), learning_rate=1.0)
+    states, actions = np.array([1, 1, 1, 2]), np.array([0, 0, 0, 2])
+    agent.q_table.add_mean(states, actions, np.array([1.0, 2.0, 3.0, 5.0]))
+    assert agent.q_table.values[1, 0] == 2.0
+    assert agent.q_table.values[2, 2] == 5.0
+    assert np.count_nonzero(agent.q_table.values) == 2
+
+
+def test_seeded_lockstep_game_explores_like_forex_game(market_data):
+    encoder = StateEncoder().fit(market_data)
+    scalar = BinnedQLearningAgent(ACTIONS, encoder, exploration_decay=0.999, seed=7)
+    lockstep = BinnedQLearningAgent(ACTIONS, encoder, exploration_decay=0.999, seed=7)
+    balances = [forex_game(market_data, episode, scalar) for episode in range(3)]
+    # Different game seeds: only the agent's stream may drive exploration
+    assert VectorizedForexGame(market_data, lockstep, n_envs=1, seed=123).run(3).tolist() == balances
+    np.testing.assert_array_equal(lockstep.q_table.values, scalar.q_table.values)
+    assert lockstep.exploration_steps == scalar.exploration_steps
@@ -0,0 +1,153 @@
+"""Multi-step credit assignment for BinnedQLearningAgent: n-step returns and Watkins Q(λ).
+
+A trade's reward only arrives when it resolves, so one-step Q-learning needs
+many episodes to carry it back to the decisions that led there. Both classes
+keep a short per-lane history in arrays ([lane, step]) so VectorizedForexGame
+can update every lane with a few array operations; forex_game uses lane 0.
+
+    agent = BinnedQLearningAgent(actions, encoder, traces=WatkinsTraces(trace_decay=0.8))
+"""
+import math
+
+import numpy as np
+
+
+class _LaneHistory:
+    """Per-lane arrays shared by both update modes; lanes are compacted together with VectorizedForexGame's."""
+
+    def __init__(self, width: int):
+        self.width = width
+        self.start(1)
+
+    def start(self, n_lanes: int) -> None:
+        """Allocate empty histories for ``n_lanes`` lanes."""
+        self.states = np.zeros((n_lanes, self.width), dtype=np.int64)
+        self.actions = np.zeros((n_lanes, self.width), dtype=np.int64)
+        self.count = np.zeros(n_lanes, dtype=np.int64)
+
+    @property
+    def n_lanes(self) -> int:
+        return len(self.count)
+
+    def reset_lanes(self, lanes: np.ndarray) -> None:
+        self.count[lanes] = 0
+
+    def compact(self, keep: np.ndarray) -> None:
+        """Keep only the lanes selected by ``keep``, in order."""
+        self.states, self.actions, self.count = self.states[keep], self.actions[keep], self.count[keep]
+
+
+class NStepReturns(_LaneHistory):
+    """n-step Q-learning: Q(s_t, a_t) moves toward r_t + γ r_t+1 + ... + γ^(n-1) r_t+n-1 + γ^n max_a Q(s_t+n, a).
+
+    Transitions wait until n more rewards are known; when an episode ends the
+    pending ones are updated with the shorter returns available. Like the
+    one-step update in forex_game, returns bootstrap from the last next state
+    even at the $50 restart. With n=1 this is exactly the one-step update.
+    """
+
+    def __init__(self, n: int = 4):
+        if n < 1:
+            raise ValueError("n must be at least 1")
+        self.n = n
+        super().__init__(n)
+
+    def start(self, n_lanes: int) -> None:
+        super().start(n_lanes)
+        self.rewards = np.zeros((n_lanes, self.n), dtype=np.float64)
+        self.last_next = np.zeros(n_lanes, dtype=np.int64)
+
+    def compact(self, keep: np.ndarray) -> None:
+        super().compact(keep)
+        self.rewards, self.last_next = self.rewards[keep], self.last_next[keep]
+
+    def _returns(self, agent, lanes: np.ndarray) -> np.ndarray:
+        """[lane, slot] n-step (or truncated) returns of every pending transition of ``lanes``."""
+        q_values = agent.q_table.values
+        gamma = agent.discount_factor
+        count = self.count[lanes]
+        rewards = self.rewards[lanes]
+        g = q_values[self.last_next[lanes]].max(axis=1)
+        returns = np.zeros((len(lanes), self.n))
+        for j in range(self.n - 1, -1, -1):
+            g = np.where(j < count, rewards[:, j] + gamma * g, g)
+            returns[:, j] = g
+        return returns
+
+    def _apply(self, agent, states: np.ndarray, actions: np.ndarray, targets: np.ndarray) -> None:
+        # Lanes that share a (state, action) move it by their mean step, like the one-step update
+        agent.q_table.add_mean(states, actions, agent.learning_rate * (targets - agent.q_table.values[states, actions]))
+
+    def update_batch(self, agent, lanes: np.ndarray, states: np.ndarray, actions: np.ndarray, rewards: np.ndarray,
+                     next_states: np.ndarray, greedy: np.ndarray) -> None:
+        """Record one step of each lane and update the transitions that now have n rewards."""
+        slot = self.count[lanes]
+        self.states[lanes, slot] = states
+        self.actions[lanes, slot] = actions
+        self.rewards[lanes, slot] = rewards
+        self.count[lanes] = slot + 1
+        self.last_next[lanes] = next_states
+        full = lanes[slot + 1 == self.n]
+        if full.size:
+            self._apply(agent, self.states[full, 0], self.actions[full, 0], self._returns(agent, full)[:, 0])
+            for array in (self.states, self.actions, self.rewards):
+                array[full, :-1] = array[full, 1:]
+            self.count[full] -= 1
+
+    def end_lanes(self, agent, lanes: np.ndarray) -> None:
+        """Update every pending transition of episodes that just ended, then clear them."""
+        lanes = lanes[self.count[lanes] > 0]
+        if lanes.size:
+            pending = np.arange(self.n) < self.count[lanes, None]
+            targets = self._returns(agent, lanes)[pending]
+            self._apply(agent, self.states[lanes][pending], self.actions[lanes][pending], targets)
+        self.count[lanes] = 0
+
+
+class WatkinsTraces(_LaneHistory):
+    """Watkins Q(λ) with accumulating eligibility traces.
+
+    Every step's TD error is applied to the lane's recent (state, action)
+    pairs weighted by (γλ)^age. An exploratory (non-greedy) action cuts the
+    trace, since later rewards say nothing about the greedy policy before it.
+    Traces are truncated once (γλ)^age drops below ``threshold``, which keeps
+    the history a fixed [lane, max_age] array; with trace_decay=0 this is the
+    one-step update.
+    """
+
+    def __init__(self, trace_decay: float = 0.8, threshold: float = 0.01):
+        self.trace_decay = trace_decay
+        self.threshold = threshold
+        self._discount = None
+        super().__init__(1)
+
+    def _resize(self, discount_factor: float) -> None:
+        """Size the history for the agent's discount; histories restart empty."""
+        decay = discount_factor * self.trace_decay
+        self.width = max(1, math.ceil(math.log(self.threshold) / math.log(decay))) if 0 < decay < 1 else 1
+        self.weights = decay ** np.arange(self.width)
+        self._discount = discount_factor
+        self.start(self.n_lanes)
+
+    def update_batch(self, agent, lanes: np.ndarray, states: np.ndarray, actions: np.ndarray, rewards: np.ndarray,
+                     next_states: np.ndarray, greedy: np.ndarray) -> None:
+        """Apply one step of each lane's TD error along its trace."""
+        if agent.discount_factor != self._discount:
+            self._resize(agent.discount_factor)
+        q_values = agent.q_table.values
+        td_error = rewards + agent.discount_factor * q_values[next_states].max(axis=1) - q_values[states, actions]
+
+        # Newest pair goes to age 0; a non-greedy action drops everything older
+        for array, newest in ((self.states, states), (self.actions, actions)):
+            array[lanes, 1:] = array[lanes, :-1]
+            array[lanes, 0] = newest
+        self.count[lanes] = np.where(greedy, np.minimum(self.count[lanes] + 1, self.width), 1)
+
+        live = np.arange(self.width) < self.count[lanes, None]
+        steps = agent.learning_rate * td_error[:, None] * self.weights[None, :]
+        # A pair's trace accumulates within a lane; lanes that share it move it by their mean
+        lane_of = np.broadcast_to(np.arange(len(lanes))[:, None], live.shape)
+        agent.q_table.add_mean(self.states[lanes][live], self.actions[lanes][live], steps[live], lane_of[live])
+
+    def end_lanes(self, agent, lanes: np.ndarray) -> None:
+        self.count[lanes] = 0
@@ -0,0 +1,413 @@
+import json
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+from market_data import append_npy
+
+NO_OUTCOME = "No TP or SL"
+
+# First window scanned for TP/SL; most trades resolve within a few dozen bars
+_SCAN_BLOCK = 64
+
+
+def scan_outcome(prices: np.ndarray, start_index: int, trade_action: str, tp: float, sl: float) -> Tuple[str, int]:
+    """Find the first bar after start_index where TP or SL is hit.
+
+    Scans the price array in doubling blocks instead of one bar at a time. TP wins
+    when both levels are crossed on the same bar, exactly like the original loop.
+    """
+    n = len(prices)
+    if trade_action not in ("BUY", "SELL"):
+        return NO_OUTCOME, n - 1
+    begin = start_index + 1
+    block = _SCAN_BLOCK
+    while begin < n:
+        window = prices[begin:begin + block]
+        if trade_action == "BUY":
+            tp_hit = window >= tp
+            sl_hit = window <= sl
+        else:
+            tp_hit = window <= tp
+            sl_hit = window >= sl
+        hits = np.flatnonzero(tp_hit | sl_hit)
+        if hits.size:
+            first = int(hits[0])
+            return ("TP" if tp_hit[first] else "SL"), begin + first
+        begin += block
+        block *= 2
+    return NO_OUTCOME, n - 1
+
+
+class FirstPassageIndex:
+    """Segment tree of running max/min over a price series.
+
+    Answers "first index j >= start where price >= upper or price <= lower" in
+    O(log n), which is all check_outcome needs: for a BUY the TP is the upper
+    barrier and the SL the lower one, for a SELL it is the other way round.
+    """
+
+    def __init__(self, prices: np.ndarray):
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.n = len(self.prices)
+        size = 1
+        while size < self.n:
+            size <<= 1
+        self.size = size
+        # Padding and NaN leaves can never trigger a barrier, matching the scalar comparisons
+        self._max = np.full(2 * size, -np.inf)
+        self._min = np.full(2 * size, np.inf)
+        valid = ~np.isnan(self.prices)
+        self._max[size:size + self.n] = np.where(valid, self.prices, -np.inf)
+        self._min[size:size + self.n] = np.where(valid, self.prices, np.inf)
+        level = size >> 1
+        while level >= 1:
+            np.maximum(self._max[2 * level:4 * level:2], self._max[2 * level + 1:4 * level:2], out=self._max[level:2 * level])
+            np.minimum(self._min[2 * level:4 * level:2], self._min[2 * level + 1:4 * level:2], out=self._min[level:2 * level])
+            level >>= 1
+
+    def extend(self, data) -> "FirstPassageIndex":
+        """Take in the bars of ``data`` past the current end, updating only their ancestors.
+
+        The tree is rebuilt when it runs out of leaves, which doubles its capacity,
+        so appending stays O(new bars + log n) amortized.
+        """
+        prices = np.asarray(data.price, dtype=np.float64)
+        n_old, n = self.n, len(prices)
+        if n > self.size:
+            self.__init__(prices)
+            return self
+        self.prices, self.n = prices, n
+        if n == n_old:
+            return self
+        new = prices[n_old:]
+        valid = ~np.isnan(new)
+        size = self.size
+        self._max[size + n_old:size + n] = np.where(valid, new, -np.inf)
+        self._min[size + n_old:size + n] = np.where(valid, new, np.inf)
+        lo, hi = (size + n_old) >> 1, (size + n - 1) >> 1
+        while lo >= 1:
+            np.maximum(self._max[2 * lo:2 * hi + 2:2], self._max[2 * lo + 1:2 * hi + 2:2], out=self._max[lo:hi + 1])
+            np.minimum(self._min[2 * lo:2 * hi + 2:2], self._min[2 * lo + 1:2 * hi + 2:2], out=self._min[lo:hi + 1])
+            lo, hi = lo >> 1, hi >> 1
+        return self
+
+    def first_hit(self, start: int, upper: float, lower: float) -> int:
+        """First index >= start whose price is >= upper or <= lower, or n if there is none."""
+        n = self.n
+        if start >= n:
+            return n
+        mx, mn, size = self._max, self._min, self.size
+        node = start + size
+        while True:
+            while node % 2 == 0:
+                node >>= 1
+            if mx[node] >= upper or mn[node] <= lower:
+                while node < size:
+                    node <<= 1
+                    if not (mx[node] >= upper or mn[node] <= lower):
+                        node += 1
+                return min(node - size, n)
+            node += 1
+            if node & -node == node:
+                return n
+
+    def outcome(self, start_index: int, trade_action: str, tp: float, sl: float) -> Tuple[str, int]:
+        """Same (result, index) pair as scan_outcome, found by tree descent instead of a scan."""
+        n = self.n
+        if trade_action == "BUY":
+            hit = self.first_hit(start_index + 1, tp, sl)
+        elif trade_action == "SELL":
+            hit = self.first_hit(start_index + 1, sl, tp)
+        else:
+            return NO_OUTCOME, n - 1
+        if hit >= n:
+            return NO_OUTCOME, n - 1
+        price = self.prices[hit]
+        tp_hit = price >= tp if trade_action == "BUY" else price <= tp
+        return ("TP" if tp_hit else "SL"), hit
+
+
+def first_passage_index(data) -> FirstPassageIndex:
+    """Return the FirstPassageIndex of a MarketData, building it on first use."""
+    index = data.indexes.get("first_passage")
+    if index is None:
+        index = data.indexes["first_passage"] = FirstPassageIndex(data.price)
+    return index
+
+
+def find_outcome(data, start_index: int, trade_action: str, tp: float, sl: float) -> Tuple[str, int]:
+    """Resolve a trade opened at start_index against the data's first-passage index."""
+    return first_passage_index(data).outcome(start_index, trade_action, tp, sl)
+
+
+# ---------------------------------------------------------------------------
+# Precomputed outcome tables: result and resolution index for every bar x direction x RRR
+# ---------------------------------------------------------------------------
+
+TRADE_ACTIONS = ("BUY", "SELL")
+RESULT_NAMES = (NO_OUTCOME, "TP", "SL")  # Indexed by the int8 result codes stored in OutcomeTable.codes
+RRR_MULTIPLIERS = (2, 4, 6)  # TP distances in ATRs for 1:1, 1:2 and 1:3 (TradeSettings.rrr_multipliers)
+SL_MULTIPLIER = 2  # TradeSettings.default_sl_multiplier
+
+
+def round_to_4_decimals(values: np.ndarray) -> np.ndarray:
+    """Elementwise round(value, 4) with Python's correctly-rounded semantics.
+
+    np.round only disagrees with the builtin when value * 1e4 lands next to a
+    .5 boundary, so those few elements are redone with the builtin.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.round(values, 4)
+    scaled = values * 1e4
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) <= np.maximum(1e-6, np.abs(scaled) * 1e-12)
+    for i in np.flatnonzero(near_half):
+        rounded[i] = round(float(values[i]), 4)
+    return rounded
+
+
+def first_hits(index: FirstPassageIndex, starts: np.ndarray, upper: np.ndarray, lower: np.ndarray) -> np.ndarray:
+    """Vectorized FirstPassageIndex.first_hit over many (start, upper, lower) queries at once."""
+    n, size, mx, mn = index.n, index.size, index._max, index._min
+    starts = np.asarray(starts, dtype=np.int64)
+    upper = np.broadcast_to(np.asarray(upper, dtype=np.float64), starts.shape)
+    lower = np.broadcast_to(np.asarray(lower, dtype=np.float64), starts.shape)
+    result = np.full(starts.shape, n, dtype=np.int64)
+
+    # Climb: move right over clean aligned blocks until one contains a hit
+    query = np.flatnonzero(starts < n)
+    node = starts[query] + size
+    found_query, found_node = [], []
+    while query.size:
+        node = node // (node & -node)
+        hit = (mx[node] >= upper[query]) | (mn[node] <= lower[query])
+        found_query.append(query[hit])
+        found_node.append(node[hit])
+        query, node = query[~hit], node[~hit] + 1
+        open_ended = (node & -node) != node
+        query, node = query[open_ended], node[open_ended]
+    if not found_query:
+        return result
+
+    # Descend: inside the hit block, prefer the left child whenever it still contains a hit
+    query = np.concatenate(found_query)
+    node = np.concatenate(found_node)
+    inner = node < size
+    while inner.any():
+        child = node[inner] << 1
+        q = query[inner]
+        clean = ~((mx[child] >= upper[q]) | (mn[child] <= lower[q]))
+        node[inner] = child + clean
+        inner = node < size
+    result[query] = np.minimum(node - size, n)
+    return result
+
+
+class OutcomeTable:
+    """Result code and resolution index of a BUY/SELL at every bar for each RRR multiplier.
+
+    Outcomes only depend on price, ATR and the TP/SL multipliers, so they can be
+    computed once per dataset and looked up in O(1) by the game and training loops.
+    The arrays are stored bar-major so bars appended to the data append to the
+    files; ``codes``/``indexes`` are [action, rrr, bar] views of them.
+    """
+
+    def __init__(self, bar_codes: np.ndarray, bar_indexes: np.ndarray, rrr_multipliers, sl_multiplier,
+                 open_from: Optional[int] = None):
+        self.bar_codes = bar_codes  # int8 [bar, action, rrr], see RESULT_NAMES
+        self.bar_indexes = bar_indexes  # int64 [bar, action, rrr], same convention as check_outcome
+        self.codes = bar_codes.transpose(1, 2, 0)
+        self.indexes = bar_indexes.transpose(1, 2, 0)
+        self.rrr_multipliers = tuple(rrr_multipliers)
+        self.sl_multiplier = sl_multiplier
+        self._rrr_slot = {multiplier: slot for slot, multiplier in enumerate(self.rrr_multipliers)}
+        self._open_from = open_from
+
+    @property
+    def n_bars(self) -> int:
+        return len(self.bar_codes)
+
+    @property
+    def open_from(self) -> int:
+        """First bar with a trade that is still open at the end of the data (n_bars if none)."""
+        if self._open_from is None:
+            still_open = (np.asarray(self.bar_codes) == 0).any(axis=(1, 2))
+            self._open_from = int(np.argmax(still_open)) if still_open.any() else self.n_bars
+        return self._open_from
+
+    @classmethod
+    def build(cls, prices: np.ndarray, atr: np.ndarray, rrr_multipliers=RRR_MULTIPLIERS,
+              sl_multiplier=SL_MULTIPLIER, index: FirstPassageIndex = None) -> "OutcomeTable":
+        prices = np.asarray(prices, dtype=np.float64)
+        atr = np.asarray(atr, dtype=np.float64)
+        if index is None:
+            index = FirstPassageIndex(prices)
+        n = len(prices)
+        codes = np.zeros((n, len(TRADE_ACTIONS), len(rrr_multipliers)), dtype=np.int8)
+        indexes = np.full(codes.shape, n - 1, dtype=np.int64)
+        starts = np.arange(1, n + 1, dtype=np.int64)
+        for slot, multiplier in enumerate(rrr_multipliers):
+            for action in range(len(TRADE_ACTIONS)):
+                codes[:, action, slot], indexes[:, action, slot] = _resolve(
+                    index, starts, prices, atr, action, multiplier, sl_multiplier)
+        return cls(codes, indexes, rrr_multipliers, sl_multiplier)
+
+    def appended_outcomes(self, prices: np.ndarray, atr: np.ndarray):
+        """What changes when the data grows from n_bars to len(prices) bars.
+
+        Returns (rows, row_codes, row_indexes, new_codes, new_indexes): the updated
+        entries for the earlier ``rows`` whose trades were still open, and the
+        entries of the new bars. Only the new bars are searched, since an open
+        trade can only resolve there.
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        atr = np.asarray(atr, dtype=np.float64)
+        n_old, n = self.n_bars, len(prices)
+        suffix_index = FirstPassageIndex(prices[n_old:])
+        suffix = OutcomeTable.build(prices[n_old:], atr[n_old:], self.rrr_multipliers, self.sl_multiplier, suffix_index)
+        new_codes, new_indexes = suffix.bar_codes, suffix.bar_indexes + n_old
+
+        window = np.asarray(self.bar_codes[self.open_from:])
+        rows = self.open_from + np.flatnonzero((window == 0).any(axis=(1, 2)))
+        row_codes = np.array(self.bar_codes[rows])
+        row_indexes = np.array(self.bar_indexes[rows])
+        starts = np.zeros(len(rows), dtype=np.int64)
+        for slot, multiplier in enumerate(self.rrr_multipliers):
+            for action in range(len(TRADE_ACTIONS)):
+                still_open = row_codes[:, action, slot] == 0
+                codes, hits = _resolve(suffix_index, starts, prices[rows], atr[rows], action, multiplier,
+                                       self.sl_multiplier, prices[n_old:])
+                row_codes[:, action, slot] = np.where(still_open, codes, row_codes[:, action, slot])
+                row_indexes[:, action, slot] = np.where(still_open, np.where(codes > 0, hits + n_old, n - 1),
+                                                        row_indexes[:, action, slot])
+        return rows, row_codes, row_indexes, new_codes, new_indexes
+
+    def extend(self, data) -> "OutcomeTable":
+        """The table for ``data``, whose first n_bars bars are the ones this table covers."""
+        if data.cache_dir is not None:
+            table = _load_outcome_table(data, self.rrr_multipliers, self.sl_multiplier)
+            if table is not None:
+                return table
+        rows, row_codes, row_indexes, new_codes, new_indexes = self.appended_outcomes(data.price, data.atr)
+        codes = np.concatenate([self.bar_codes, new_codes])
+        indexes = np.concatenate([self.bar_indexes, new_indexes])
+        codes[rows] = row_codes
+        indexes[rows] = row_indexes
+        return OutcomeTable(codes, indexes, self.rrr_multipliers, self.sl_multiplier)
+
+    def lookup(self, start_index: int, trade_action: str, rrr_multiplier) -> Tuple[str, int]:
+        """(result, index) for a trade opened at start_index, exactly as check_outcome would return it."""
+        action = 0 if trade_action == "BUY" else 1
+        slot = self._rrr_slot[rrr_multiplier]
+        return RESULT_NAMES[self.bar_codes[start_index, action, slot]], int(self.bar_indexes[start_index, action, slot])
+
+
+def _resolve(index: FirstPassageIndex, starts: np.ndarray, prices: np.ndarray, atr: np.ndarray, action: int,
+             multiplier, sl_multiplier, searched: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Result codes and hit indexes (into ``searched``, the indexed prices) of trades entered at ``prices``."""
+    searched = prices if searched is None else searched
+    n = len(searched)
+    if action == 0:
+        tp = upper = round_to_4_decimals(prices + multiplier * atr)
+        lower = round_to_4_decimals(prices - sl_multiplier * atr)
+    else:
+        tp = lower = round_to_4_decimals(prices - multiplier * atr)
+        upper = round_to_4_decimals(prices + sl_multiplier * atr)
+    hits = first_hits(index, starts, upper, lower)
+    resolved = hits < n
+    hit_price = searched[np.minimum(hits, n - 1)] if n else np.zeros(len(hits))
+    tp_hit = hit_price >= tp if action == 0 else hit_price <= tp
+    codes = np.where(resolved, np.where(tp_hit, 1, 2), 0).astype(np.int8)
+    return codes, np.where(resolved, hits, n - 1)
+
+
+# Bump when the saved outcome table layout changes
+OUTCOME_CACHE_VERSION = 2
+
+
+def _outcome_files(cache_dir: str, rrr_multipliers, sl_multiplier) -> Tuple[str, str, str]:
+    tag = "-".join(str(m) for m in rrr_multipliers) + f"_sl{sl_multiplier}"
+    stem = os.path.join(cache_dir, f"outcomes_{tag}")
+    return f"{stem}.json", f"{stem}.codes.npy", f"{stem}.index.npy"
+
+
+def _write_outcome_meta(meta_path: str, data, table: OutcomeTable) -> None:
+    tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump({"version": OUTCOME_CACHE_VERSION, "data_key": data.cache_key, "rows": len(data),
+                   "open_from": table.open_from}, file)
+    os.replace(tmp_path, meta_path)
+
+
+def _load_outcome_table(data, rrr_multipliers, sl_multiplier) -> Optional[OutcomeTable]:
+    """Memory-map the saved table of ``data``; a table saved for an earlier, shorter
+    version of the CSV is brought up to date by appending the new bars."""
+    meta_path, codes_path, index_path = _outcome_files(data.cache_dir, rrr_multipliers, sl_multiplier)
+    try:
+        with open(meta_path) as file:
+            meta = json.load(file)
+        if meta.get("version") != OUTCOME_CACHE_VERSION:
+            return None
+        current = meta.get("data_key") == data.cache_key and meta.get("rows") == len(data)
+        if not current and data.cache_prefixes.get(meta.get("data_key")) != meta.get("rows"):
+            return None
+        table = OutcomeTable(np.load(codes_path, mmap_mode='r'), np.load(index_path, mmap_mode='r'),
+                             rrr_multipliers, sl_multiplier, meta.get("open_from"))
+        if table.n_bars != meta["rows"]:
+            return None
+        if current:
+            return table
+        rows, row_codes, row_indexes, new_codes, new_indexes = table.appended_outcomes(data.price, data.atr)
+        del table
+        os.remove(meta_path)
+        if not (append_npy(codes_path, new_codes) and append_npy(index_path, new_indexes)):
+            return None
+        for path, values in ((codes_path, row_codes), (index_path, row_indexes)):
+            patched = np.load(path, mmap_mode='r+')
+            patched[rows] = values
+            patched.flush()
+            del patched
+        table = OutcomeTable(np.load(codes_path, mmap_mode='r'), np.load(index_path, mmap_mode='r'),
+                             rrr_multipliers, sl_multiplier)
+        _write_outcome_meta(meta_path, data, table)
+    except (OSError, ValueError):
+        return None
+    return table
+
+
+def _save_outcome_table(data, table: OutcomeTable) -> None:
+    meta_path, codes_path, index_path = _outcome_files(data.cache_dir, table.rrr_multipliers, table.sl_multiplier)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    for path, values in ((codes_path, table.bar_codes), (index_path, table.bar_indexes)):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            np.save(file, values)
+        os.replace(tmp_path, path)
+    _write_outcome_meta(meta_path, data, table)
+
+
+def outcome_table(data, rrr_multipliers=RRR_MULTIPLIERS, sl_multiplier=SL_MULTIPLIER) -> OutcomeTable:
+    """Return the OutcomeTable of a MarketData.
+
+    Tables are kept in data.indexes and, when the data came from the sidecar
+    cache, persisted next to it so later runs just memory-map them (or extend
+    them over the new bars when the CSV has grown).
+    """
+    rrr_multipliers = tuple(rrr_multipliers)
+    key = ("outcomes", rrr_multipliers, sl_multiplier)
+    table = data.indexes.get(key)
+    if table is not None:
+        return table
+    if data.cache_dir is not None:
+        table = _load_outcome_table(data, rrr_multipliers, sl_multiplier)
+    if table is None:
+        table = OutcomeTable.build(data.price, data.atr, rrr_multipliers, sl_multiplier, first_passage_index(data))
+        if data.cache_dir is not None:
+            try:
+                _save_outcome_table(data, table)
+            except OSError:
+                pass
+    data.indexes[key] = table
+    return table
@@ -0,0 +1,177 @@
+from typing import Optional
+
+import numpy as np
+
+import instrumentation
+from replay_buffer import replay_minibatch
+from trade_outcomes import outcome_table
+
+STARTING_BALANCE = 100
+RESTART_BALANCE = 50
+TRADE_RRR_MULTIPLIER = 2  # forex_game trades with TP and SL both 2×ATR away
+
+
+class VectorizedForexGame:
+    """Runs many forex_game episodes in lockstep for a BinnedQLearningAgent.
+
+    Every lane follows the per-episode rules of forex_game: start at row 0 with
+    $100, skip rows with ATR == 0, resolve BUY/SELL through the outcome table,
+    move one row on PASS, end the episode at $50 or at the last row, and decay
+    exploration once per surviving step. All lanes share the agent's Q array.
+    A seeded agent's explore/exploit draws come from its own ExplorationStream,
+    in the order forex_game would consume them, otherwise from the game's rng.
+    When several lanes update the same (state, action) in one step, their TD
+    errors are computed from the same old value and averaged, so the pair moves
+    by one learning-rate step however many lanes share it.
+    """
+
+    def __init__(self, data, agent, n_envs: int = 64, seed: Optional[int] = None, sampler=None):
+        self.data = data
+        self.agent = agent
+        self.n_envs = n_envs
+        self.sampler = sampler  # episodes.EpisodeSampler for start rows and horizons; None starts every episode at row 0
+        self.rng = np.random.default_rng(seed)
+        n = len(data)
+        self.n_rows = n
+
+        # First row at or after i whose ATR is non-zero (n when there is none)
+        positions = np.where(data.atr != 0, np.arange(n), n)
+        self.next_valid = np.minimum.accumulate(positions[::-1])[::-1] if n else positions
+
+        # Reward and next row for every (action, row), in the agent's action order
+        table = outcome_table(data)
+        slot = table.rrr_multipliers.index(TRADE_RRR_MULTIPLIER)
+        self.rewards = np.zeros((len(agent.actions), n), dtype=np.int64)
+        self.next_rows = np.empty((len(agent.actions), n), dtype=np.int64)
+        for a, action in enumerate(agent.actions):
+            if action in ("BUY", "SELL"):
+                codes = table.codes[0 if action == "BUY" else 1, slot]
+                self.rewards[a] = np.where(codes == 1, 1, np.where(codes == 2, -1, 0))
+                self.next_rows[a] = table.indexes[0 if action == "BUY" else 1, slot]
+            else:
+                self.next_rows[a] = np.arange(1, n + 1)
+        self.is_trade = np.array([action in ("BUY", "SELL") for action in agent.actions])
+
+    def step(self, rows: np.ndarray, balances: np.ndarray, lanes: Optional[np.ndarray] = None):
+        """Advance every lane by one decision; returns (next_rows, new_balances, finished mask).
+
+        ``lanes`` are the lane slots of ``rows`` in the agent's traces, if it has any.
+        """
+        agent = self.agent
+        q_values = agent.q_table.values if agent.q_table is not None else None
+        encoder = agent.encoder
+        rec = instrumentation.active()
+        if rec:
+            rec.tick(len(rows))
+
+        states = encoder.encode_many(self.data, rows, balances)
+        if rec:
+            rec.lap("get_state")
+        approximate = agent.q_table is None  # e.g. TileCodingAgent: states are feature arrays, updates go through the agent
+        best = agent.best_actions(states) if approximate else agent.q_table.best_actions(states)
+        actions = best.copy()
+        if agent.exploration is not None:
+            draws = agent.exploration.draw_many(agent.exploration_rate, len(rows))  # The agent's seeded stream
+            explore = draws >= 0
+            actions[explore] = draws[explore]
+        else:
+            explore = self.rng.random(len(rows)) < agent.exploration_rate
+            actions[explore] = self.rng.integers(0, len(agent.actions), int(explore.sum()))
+        if rec:
+            rec.lap("choose_action")
+
+        rewards = self.rewards[actions, rows]
+        next_rows = self.next_rows[actions, rows]
+        new_balances = balances + rewards
+        if rec:
+            rec.lap("check_outcome")
+            traded = self.is_trade[actions]
+            tp, sl = int(np.count_nonzero(rewards > 0)), int(np.count_nonzero(rewards < 0))
+            rec.trades(tp, sl, int(np.count_nonzero(traded)) - tp - sl, int((next_rows - rows)[traded].sum()))
+        next_states = encoder.encode_many(self.data, next_rows, new_balances)
+        if rec:
+            rec.lap("get_state")
+
+        traces = getattr(agent, "traces", None)
+        if approximate:
+            agent.update_batch(states, actions, rewards, next_states)
+        elif traces is not None:
+            traces.update_batch(agent, np.arange(len(rows)) if lanes is None else lanes, states, actions, rewards,
+                                next_states, actions == best)
+            if agent.q_table.visits is not None:
+                np.add.at(agent.q_table.visits, (states, actions), 1)
+        else:
+            td_error = rewards + agent.discount_factor * q_values[next_states].max(axis=1) - q_values[states, actions]
+            agent.q_table.add_mean(states, actions, agent.learning_rate * td_error)
+            if agent.q_table.visits is not None:
+                np.add.at(agent.q_table.visits, (states, actions), 1)
+
+        if rec:
+            rec.lap("update_q_value")
+
+        broke = new_balances <= RESTART_BALANCE
+        replay = getattr(agent, "replay", None)
+        if replay is not None:
+            # Restarts at $50 are stored as terminal so replayed targets don't bootstrap past them
+            replay.add_batch(states, actions, rewards, next_states, broke)
+            replay_minibatch(agent, replay, agent.replay_batch_size)
+            if rec:
+                rec.lap("replay")
+        agent.advance_exploration(int(len(rows) - broke.sum()))
+        return next_rows, new_balances, broke
+
+    def run(self, n_episodes: int) -> np.ndarray:
+        """Play n_episodes episodes, refilling lanes as episodes end; returns final balances in episode order."""
+        final_balances = np.zeros(n_episodes, dtype=np.int64)
+        rec = instrumentation.active()
+        if rec and self.agent.q_table is not None:
+            rec.watch("q_table_size", lambda: len(self.agent.q_table))
+        lanes = min(self.n_envs, n_episodes)
+        episode_ids = np.arange(lanes)
+        rows = np.zeros(lanes, dtype=np.int64)
+        balances = np.full(lanes, STARTING_BALANCE, dtype=np.int64)
+        next_episode = lanes
+        last_row = self.n_rows - 1
+        ends = np.full(lanes, last_row, dtype=np.int64)  # Row at which each lane's episode is over
+        if self.sampler is not None:
+            rows, ends = self.sampler.sample(episode_ids, self.rng)
+        traces = getattr(self.agent, "traces", None)
+        if traces is not None:
+            traces.start(lanes)
+
+        while episode_ids.size:
+            rows = self.next_valid[np.minimum(rows, last_row)] if self.n_rows else rows
+            at_end = rows >= ends
+            live = ~at_end
+            ended = at_end.copy()
+            if live.any():
+                next_rows, new_balances, broke = self.step(rows[live], balances[live], np.flatnonzero(live))
+                rows[live] = next_rows
+                balances[live] = new_balances
+                ended[np.flatnonzero(live)[broke]] = True
+            final_balances[episode_ids[ended]] = balances[ended]
+
+            # Start fresh episodes in the lanes that just finished
+            if ended.any():
+                if traces is not None:
+                    traces.end_lanes(self.agent, np.flatnonzero(ended))
+                refill = np.flatnonzero(ended)[:max(0, n_episodes - next_episode)]
+                keep = ~ended
+                keep[refill] = True
+                episode_ids[refill] = np.arange(next_episode, next_episode + len(refill))
+                if self.sampler is not None:
+                    rows[refill], ends[refill] = self.sampler.sample(episode_ids[refill], self.rng)
+                else:
+                    rows[refill] = 0
+                balances[refill] = STARTING_BALANCE
+                next_episode += len(refill)
+                episode_ids, rows, balances, ends = episode_ids[keep], rows[keep], balances[keep], ends[keep]
+                if traces is not None:
+                    traces.compact(keep)
+        return final_balances
+
+
+def train_vectorized(data, agent, n_episodes: int, n_envs: int = 64, seed: Optional[int] = None,
+                     sampler=None) -> np.ndarray:
+    """Train ``agent`` for n_episodes episodes, n_envs at a time; returns each episode's final balance."""
+    return VectorizedForexGame(data, agent, n_envs, seed, sampler).run(n_episodes)
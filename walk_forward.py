@@ -0,0 +1,219 @@
+"""Walk-forward evaluation: train on one window, score greedily on the next.
+
+    python walk_forward.py --file audusd.csv --folds 5 --episodes 2000 --workers 4
+"""
+import argparse
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from multiprocessing import Pool
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from exploration import spawn_streams
+from market_data import attach_shared_market_data, load_market_data, share_market_data
+from qlearning_shandis_6 import BinnedQLearningAgent
+from reporting import logger
+from state_encoding import StateEncoder
+from trade_outcomes import outcome_table
+from vectorized_training import RESTART_BALANCE, STARTING_BALANCE, TRADE_RRR_MULTIPLIER, train_vectorized
+
+ACTIONS = ["BUY", "SELL", "PASS"]
+
+# Per-process state set up once by the pool initializer
+_worker: Dict = {}
+
+
+@dataclass
+class Fold:
+    index: int
+    train_start: int
+    train_stop: int
+    test_start: int
+    test_stop: int
+
+
+@dataclass
+class FoldResult:
+    fold: Fold
+    final_balance: int
+    trades: int
+    wins: int
+    losses: int
+    max_drawdown: float
+    busted: bool  # Balance hit $50 before the end of the test window
+    bars_covered: int
+    train_seconds: float
+    train_mean_balance: float
+
+    @property
+    def hit_rate(self) -> float:
+        decided = self.wins + self.losses
+        return self.wins / decided if decided else 0.0
+
+
+def walk_forward_folds(n_bars: int, n_folds: int, train_size: Optional[int] = None, test_size: Optional[int] = None,
+                       expanding: bool = False, gap: int = 0) -> List[Fold]:
+    """Consecutive (train, test) windows; each test window directly follows its training window plus ``gap`` bars.
+
+    By default the series is cut into n_folds + 1 equal blocks and fold k trains
+    on block k (or on blocks 0..k when ``expanding``) and tests on block k + 1.
+    """
+    block = n_bars // (n_folds + 1)
+    train_size = train_size or block
+    test_size = test_size or block
+    if block == 0 or train_size + gap + test_size > n_bars:
+        raise ValueError(f"{n_bars} bars are not enough for {n_folds} folds")
+    last_test_start = n_bars - test_size
+    first_test_start = train_size + gap
+    starts = np.linspace(first_test_start, last_test_start, n_folds).astype(int) if n_folds > 1 else [last_test_start]
+    folds = []
+    for k, test_start in enumerate(starts):
+        train_stop = int(test_start) - gap
+        train_start = 0 if expanding else max(0, train_stop - train_size)
+        folds.append(Fold(k, train_start, train_stop, int(test_start), int(test_start) + test_size))
+    return folds
+
+
+def evaluate_greedy(data, agent) -> Dict:
+    """Play one forex_game episode over ``data`` with exploration 0 and no learning."""
+    table = outcome_table(data)
+    atr = np.asarray(data.atr)
+    q_values = agent.q_table.values
+    encoder = agent.encoder
+    n = len(data)
+    balance = peak = STARTING_BALANCE
+    trades = wins = losses = 0
+    max_drawdown = 0.0
+    i = 0
+    while i < n - 1:
+        if atr[i] == 0:
+            i += 1
+            continue
+        action = agent.actions[int(np.argmax(q_values[encoder.encode(data, i, balance)]))]
+        if action in ("BUY", "SELL"):
+            result, next_index = table.lookup(i, action, TRADE_RRR_MULTIPLIER)
+            reward = 1 if result == "TP" else -1 if result == "SL" else 0
+            trades += 1
+            wins += result == "TP"
+            losses += result == "SL"
+        else:
+            reward = 0
+            next_index = i + 1
+        balance += reward
+        peak = max(peak, balance)
+        max_drawdown = max(max_drawdown, (peak - balance) / peak)
+        if balance <= RESTART_BALANCE:
+            break
+        i = next_index
+    return {
+        "final_balance": balance,
+        "trades": trades,
+        "wins": wins,
+        "losses": losses,
+        "max_drawdown": max_drawdown,
+        "busted": balance <= RESTART_BALANCE,
+        "bars_covered": min(i, n - 1) + 1 if n else 0,
+    }
+
+
+def _init_worker(data_spec: Dict) -> None:
+    shm, data = attach_shared_market_data(data_spec)
+    _worker["handle"] = shm
+    _worker["data"] = data
+
+
+def _run_fold(task: Dict) -> FoldResult:
+    """Fit the encoder and train a fresh agent on the training window, then score it on the test window."""
+    data = _worker["data"]
+    fold = task["fold"]
+    train = data[fold.train_start:fold.train_stop]
+    test = data[fold.test_start:fold.test_stop]
+    encoder = StateEncoder(**task["encoder_kwargs"]).fit(train)  # Bin edges from training data only
+    agent = BinnedQLearningAgent(ACTIONS, encoder, **task["agent_kwargs"])
+    agent.exploration = task["exploration"]
+    begin = time.perf_counter()
+    balances = train_vectorized(train, agent, task["episodes"], task["n_envs"])
+    train_seconds = time.perf_counter() - begin
+    agent.exploration_rate = 0.0
+    stats = evaluate_greedy(test, agent)
+    return FoldResult(fold, train_seconds=train_seconds, train_mean_balance=float(balances.mean()), **stats)
+
+
+def run_walk_forward(data, folds: List[Fold], episodes: int = 1000, n_workers: Optional[int] = None, n_envs: int = 64,
+                     seed: Optional[int] = None, agent_kwargs: Optional[Dict] = None,
+                     encoder_kwargs: Optional[Dict] = None) -> List[FoldResult]:
+    """Train and evaluate every fold in a process pool over one shared copy of ``data``.
+
+    Workers attach to the shared block and take zero-copy slices of it, so the
+    series is never pickled or duplicated per fold.
+    """
+    n_workers = min(n_workers or os.cpu_count() or 1, len(folds))
+    tasks = [
+        {
+            "fold": fold,
+            "episodes": episodes,
+            "n_envs": n_envs,
+            "exploration": stream,
+            "agent_kwargs": dict(agent_kwargs or {}),
+            "encoder_kwargs": dict(encoder_kwargs or {}),
+        }
+        for fold, stream in zip(folds, spawn_streams(len(ACTIONS), seed, len(folds)))
+    ]
+    shm, spec = share_market_data(data)
+    try:
+        with Pool(n_workers, initializer=_init_worker, initargs=(spec,)) as pool:
+            return pool.map(_run_fold, tasks)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def summarize(results: List[FoldResult]) -> Dict:
+    """Aggregate test statistics over folds."""
+    balances = np.array([r.final_balance for r in results], dtype=np.float64)
+    return {
+        "folds": len(results),
+        "mean_final_balance": float(balances.mean()) if len(results) else 0.0,
+        "std_final_balance": float(balances.std()) if len(results) else 0.0,
+        "profitable_folds": int(np.count_nonzero(balances > STARTING_BALANCE)),
+        "busted_folds": sum(r.busted for r in results),
+        "mean_hit_rate": float(np.mean([r.hit_rate for r in results])) if results else 0.0,
+        "total_trades": sum(r.trades for r in results),
+        "worst_drawdown": max((r.max_drawdown for r in results), default=0.0),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", default="audusd-h1-bid-2003-08-03T21-2024-05-27.csv")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--train-size", type=int, default=None, help="bars per training window")
+    parser.add_argument("--test-size", type=int, default=None, help="bars per test window")
+    parser.add_argument("--expanding", action="store_true", help="train on all bars before each test window")
+    parser.add_argument("--gap", type=int, default=0, help="bars skipped between train and test")
+    parser.add_argument("--episodes", type=int, default=1000, help="training episodes per fold")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write per-fold results and the summary as JSON")
+    args = parser.parse_args(argv)
+
+    data = load_market_data(args.file)
+    folds = walk_forward_folds(len(data), args.folds, args.train_size, args.test_size, args.expanding, args.gap)
+    results = run_walk_forward(data, folds, args.episodes, args.workers, seed=args.seed)
+    for r in results:
+        f = r.fold
+        logger.info(f"Fold {f.index}: train [{f.train_start}, {f.train_stop}) test [{f.test_start}, {f.test_stop}) "
+                    f"-> balance ${r.final_balance}, trades {r.trades}, hit rate {r.hit_rate:.1%}, "
+                    f"max drawdown {r.max_drawdown:.1%}{' (busted)' if r.busted else ''}")
+    summary = summarize(results)
+    logger.info(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"folds": [asdict(r) for r in results], "summary": summary}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()